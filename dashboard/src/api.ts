@@ -70,9 +70,23 @@ export async function fetchForecast(token: string, metric: string): Promise<Fore
   return response.data;
 }
 
-export async function fetchAggregate(metric: string, window: "live" | "standard"): Promise<AggregateWindow[]> {
-  const response = await api.get("/api/aggregate", {
-    params: { site_id: siteId, metric, window },
-  });
-  return response.data.windows ?? [];
+// Daily windows rolled up by the reducer; long chart ranges read one row per day.
+export const DAILY_RESOLUTION_SECONDS = 86400;
+
+export async function fetchAggregate(
+  metric: string,
+  window: "live" | "standard",
+  resolution?: number
+): Promise<AggregateWindow[]> {
+  const windows: AggregateWindow[] = [];
+  let cursor: string | undefined;
+  // Standard ranges are paged; follow next_cursor until the last page.
+  do {
+    const response = await api.get("/api/aggregate", {
+      params: { site_id: siteId, metric, window, resolution, cursor },
+    });
+    windows.push(...(response.data.windows ?? []));
+    cursor = response.data.next_cursor ?? undefined;
+  } while (cursor);
+  return windows;
 }
@@ -12,6 +12,7 @@ import {
 } from "recharts";
 import {
   AggregateWindow,
+  DAILY_RESOLUTION_SECONDS,
   fetchAggregate,
   fetchForecast,
   fetchMetrics,
@@ -288,7 +289,7 @@ const Overview: React.FC = () => {
     const metricsToFetch = metricOptions.map((metric) => metric.key);
     Promise.all(
       metricsToFetch.map((metric) =>
-        fetchAggregate(metric, "standard").then((data) => ({
+        fetchAggregate(metric, "standard", DAILY_RESOLUTION_SECONDS).then((data) => ({
           metric,
           data,
         }))
@@ -0,0 +1,37 @@
+"""cover served dp window columns in the series index
+
+Revision ID: 2026_10_17_dp_window_covering_index
+Revises: 2026_10_17_partition_raw_reports
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+
+revision = "2026_10_17_dp_window_covering_index"
+down_revision = "2026_10_17_partition_raw_reports"
+branch_labels = None
+depends_on = None
+
+SERIES_COLUMNS = ["site_id", "metric", "plan", "resolution_seconds", "window_start"]
+SERVED_COLUMNS = ["window_end", "value", "variance", "ci80_low", "ci80_high", "ci95_low", "ci95_high"]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # INCLUDE columns only exist on Postgres; elsewhere the plain series index stays.
+    op.drop_index("ix_dp_windows_series", table_name="dp_windows")
+    op.create_index(
+        "ix_dp_windows_series",
+        "dp_windows",
+        SERIES_COLUMNS,
+        postgresql_include=SERVED_COLUMNS,
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_dp_windows_series", table_name="dp_windows")
+    op.create_index("ix_dp_windows_series", "dp_windows", SERIES_COLUMNS)
@@ -0,0 +1,26 @@
+"""index dp windows by series and resolution
+
+Revision ID: 2026_10_17_dp_window_series_index
+Revises: 2026_10_17_window_resolutions
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+
+revision = "2026_10_17_dp_window_series_index"
+down_revision = "2026_10_17_window_resolutions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_dp_windows_series",
+        "dp_windows",
+        ["site_id", "metric", "plan", "resolution_seconds", "window_start"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_dp_windows_series", table_name="dp_windows")
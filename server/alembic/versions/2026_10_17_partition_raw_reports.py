@@ -0,0 +1,58 @@
+"""partition raw_reports by day
+
+Revision ID: 2026_10_17_partition_raw_reports
+Revises: 2026_10_17_report_typed_columns
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+
+revision = "2026_10_17_partition_raw_reports"
+down_revision = "2026_10_17_report_typed_columns"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # The existing table becomes the DEFAULT partition of a new range-partitioned
+    # raw_reports, so no rows are copied. The partition manager pre-creates day or week
+    # partitions from here on, and retention drains the legacy partition with batched deletes.
+    op.execute("ALTER TABLE raw_reports RENAME TO raw_reports_legacy")
+    op.execute("ALTER TABLE raw_reports_legacy RENAME CONSTRAINT raw_reports_pkey TO raw_reports_legacy_pkey")
+    op.execute("ALTER INDEX ix_raw_reports_site_kind_day RENAME TO ix_raw_reports_legacy_site_kind_day")
+    op.execute("ALTER INDEX ix_raw_reports_received RENAME TO ix_raw_reports_legacy_received")
+    op.execute(
+        "CREATE TABLE raw_reports (LIKE raw_reports_legacy INCLUDING DEFAULTS INCLUDING IDENTITY) "
+        "PARTITION BY RANGE (day)"
+    )
+    op.execute("ALTER TABLE raw_reports ADD PRIMARY KEY (id, day)")
+    op.create_index("ix_raw_reports_site_kind_day", "raw_reports", ["site_id", "kind", "day"])
+    op.create_index("ix_raw_reports_received", "raw_reports", ["server_received_at"])
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('raw_reports', 'id'), "
+        "COALESCE((SELECT max(id) FROM raw_reports_legacy), 0) + 1, false)"
+    )
+    op.execute("ALTER TABLE raw_reports_legacy ALTER COLUMN id DROP IDENTITY IF EXISTS")
+    op.execute("ALTER TABLE raw_reports ATTACH PARTITION raw_reports_legacy DEFAULT")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE raw_reports RENAME TO raw_reports_partitioned")
+    op.execute("ALTER INDEX ix_raw_reports_site_kind_day RENAME TO ix_raw_reports_partitioned_site_kind_day")
+    op.execute("ALTER INDEX ix_raw_reports_received RENAME TO ix_raw_reports_partitioned_received")
+    op.execute("ALTER TABLE raw_reports_partitioned RENAME CONSTRAINT raw_reports_pkey TO raw_reports_partitioned_pkey")
+    op.execute("CREATE TABLE raw_reports (LIKE raw_reports_partitioned INCLUDING DEFAULTS INCLUDING IDENTITY)")
+    op.execute("INSERT INTO raw_reports SELECT * FROM raw_reports_partitioned")
+    op.execute("ALTER TABLE raw_reports ADD PRIMARY KEY (id)")
+    op.create_index("ix_raw_reports_site_kind_day", "raw_reports", ["site_id", "kind", "day"])
+    op.create_index("ix_raw_reports_received", "raw_reports", ["server_received_at"])
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('raw_reports', 'id'), "
+        "COALESCE((SELECT max(id) FROM raw_reports), 0) + 1, false)"
+    )
+    op.execute("DROP TABLE raw_reports_partitioned CASCADE")
@@ -0,0 +1,28 @@
+"""index the versions behind read endpoint ETags
+
+Revision ID: 2026_10_17_read_cache_indexes
+Revises: 2026_10_17_dp_window_covering_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+
+revision = "2026_10_17_read_cache_indexes"
+down_revision = "2026_10_17_dp_window_covering_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_dp_windows_published",
+        "dp_windows",
+        ["site_id", "metric", "plan", "resolution_seconds", "published_at"],
+    )
+    op.create_index("ix_forecasts_site_metric_model", "forecasts", ["site_id", "metric", "plan", "model_id"])
+
+
+def downgrade():
+    op.drop_index("ix_forecasts_site_metric_model", table_name="forecasts")
+    op.drop_index("ix_dp_windows_published", table_name="dp_windows")
@@ -0,0 +1,35 @@
+"""checkpoints for resumable streaming reduces
+
+Revision ID: 2026_10_17_reducer_checkpoints
+Revises: 2026_10_17_reducer_watermarks
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "2026_10_17_reducer_checkpoints"
+down_revision = "2026_10_17_reducer_watermarks"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "reducer_checkpoints",
+        sa.Column("run_key", sa.Text, primary_key=True),
+        sa.Column("site_id", sa.Text, nullable=False),
+        sa.Column("kind", sa.Text, nullable=False),
+        sa.Column("window_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table("reducer_checkpoints")
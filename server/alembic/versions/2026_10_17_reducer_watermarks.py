@@ -0,0 +1,38 @@
+"""reducer watermarks and received-at indexes for incremental reduction
+
+Revision ID: 2026_10_17_reducer_watermarks
+Revises: 2026_10_17_upload_token_exp_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "2026_10_17_reducer_watermarks"
+down_revision = "2026_10_17_upload_token_exp_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "reducer_watermarks",
+        sa.Column("table_name", sa.Text, primary_key=True),
+        sa.Column("received_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_id", sa.Integer, nullable=False, server_default=sa.text("0")),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text("CURRENT_TIMESTAMP"),
+        ),
+    )
+    op.create_index("ix_ldp_reports_received", "ldp_reports", ["server_received_at"])
+    op.create_index("ix_raw_reports_received", "raw_reports", ["server_received_at"])
+
+
+def downgrade():
+    op.drop_index("ix_raw_reports_received", table_name="raw_reports")
+    op.drop_index("ix_ldp_reports_received", table_name="ldp_reports")
+    op.drop_table("reducer_watermarks")
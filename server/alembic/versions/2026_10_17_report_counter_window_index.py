@@ -0,0 +1,22 @@
+"""index report counters by source and minute
+
+Revision ID: 2026_10_17_report_counter_window_index
+Revises: 2026_10_17_read_cache_indexes
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+
+revision = "2026_10_17_report_counter_window_index"
+down_revision = "2026_10_17_read_cache_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_report_counters_source_window", "report_counters", ["source", "window_start"])
+
+
+def downgrade():
+    op.drop_index("ix_report_counters_source_window", table_name="report_counters")
@@ -0,0 +1,49 @@
+"""ingest-time per-minute report counters
+
+Revision ID: 2026_10_17_report_counters
+Revises: 2026_10_17_reducer_checkpoints
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "2026_10_17_report_counters"
+down_revision = "2026_10_17_reducer_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "report_counters",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("source", sa.Text, nullable=False),
+        sa.Column("site_id", sa.Text, nullable=False),
+        sa.Column("kind", sa.Text, nullable=False),
+        sa.Column("day", sa.Date, nullable=False),
+        sa.Column("window_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("epsilon_used", sa.Float, nullable=False),
+        sa.Column("sampling_rate", sa.Float, nullable=False),
+        sa.Column("count", sa.Integer, nullable=False, server_default=sa.text("0")),
+        sa.Column("sum_value", sa.Float, nullable=False, server_default=sa.text("0")),
+        sa.Column("sum_randomized_bit", sa.Integer, nullable=False, server_default=sa.text("0")),
+        sa.Column("historical_count", sa.Integer, nullable=False, server_default=sa.text("0")),
+        sa.UniqueConstraint(
+            "source",
+            "site_id",
+            "kind",
+            "day",
+            "window_start",
+            "epsilon_used",
+            "sampling_rate",
+            name="uq_report_counter",
+        ),
+    )
+    op.create_index("ix_report_counters_site_day", "report_counters", ["site_id", "day"])
+
+
+def downgrade():
+    op.drop_index("ix_report_counters_site_day", table_name="report_counters")
+    op.drop_table("report_counters")
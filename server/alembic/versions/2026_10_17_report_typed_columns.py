@@ -0,0 +1,74 @@
+"""typed hot columns on report tables
+
+Revision ID: 2026_10_17_report_typed_columns
+Revises: 2026_10_17_dp_window_series_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "2026_10_17_report_typed_columns"
+down_revision = "2026_10_17_dp_window_series_index"
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ("raw_reports", "ldp_reports")
+BACKFILL_BATCH_ROWS = 50000
+
+
+def _backfill(table_name: str) -> None:
+    """Copy the payload fields into the typed columns one id range per transaction."""
+    payload = sa.column("payload", sa.JSON)
+    report_id = sa.column("id", sa.Integer)
+    table = sa.table(
+        table_name,
+        report_id,
+        payload,
+        sa.column("randomized_bit"),
+        sa.column("value"),
+        sa.column("is_historical"),
+    )
+    historical = sa.func.coalesce(payload["historical_import"].as_boolean(), sa.false())
+    import_value = sa.func.coalesce(payload["value"].as_float(), 0.0)
+
+    bind = op.get_bind()
+    low, high = bind.execute(sa.select(sa.func.min(report_id), sa.func.max(report_id)).select_from(table)).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH_ROWS):
+        with op.get_context().autocommit_block():
+            op.execute(
+                table.update()
+                .where(report_id >= start, report_id < start + BACKFILL_BATCH_ROWS)
+                .values(
+                    randomized_bit=sa.func.coalesce(payload["randomized_bit"].as_integer(), 0),
+                    is_historical=historical,
+                    value=sa.case(
+                        (historical, sa.case((import_value > 0, import_value), else_=0.0)),
+                        else_=1.0,
+                    ),
+                )
+            )
+
+
+def upgrade():
+    # Constant defaults keep ADD COLUMN a metadata-only change; defaults match live events.
+    for table_name in REPORT_TABLES:
+        op.add_column(
+            table_name, sa.Column("randomized_bit", sa.SmallInteger, nullable=False, server_default=sa.text("0"))
+        )
+        op.add_column(table_name, sa.Column("value", sa.Float, nullable=False, server_default=sa.text("1")))
+        op.add_column(
+            table_name, sa.Column("is_historical", sa.Boolean, nullable=False, server_default=sa.text("false"))
+        )
+    for table_name in REPORT_TABLES:
+        _backfill(table_name)
+
+
+def downgrade():
+    for table_name in REPORT_TABLES:
+        op.drop_column(table_name, "is_historical")
+        op.drop_column(table_name, "value")
+        op.drop_column(table_name, "randomized_bit")
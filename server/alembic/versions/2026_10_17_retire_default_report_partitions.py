@@ -0,0 +1,92 @@
+"""move report rows out of the default partitions
+
+Revision ID: 2026_10_17_retire_default_report_partitions
+Revises: 2026_10_17_report_counter_window_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+import re
+
+from alembic import op
+from sqlalchemy import text
+
+
+revision = "2026_10_17_retire_default_report_partitions"
+down_revision = "2026_10_17_report_counter_window_index"
+branch_labels = None
+depends_on = None
+
+REPORT_TABLES = ("raw_reports", "ldp_reports")
+_RANGE_BOUND = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+def _partitions(bind, table_name):
+    rows = bind.execute(
+        text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table_name"
+        ),
+        {"table_name": table_name},
+    )
+    default, ranges = None, []
+    for name, bound in rows:
+        if bound == "DEFAULT":
+            default = name
+            continue
+        match = _RANGE_BOUND.search(bound or "")
+        if match:
+            ranges.append((match[1], match[2]))
+    return default, ranges
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    # raw_reports_legacy (and any history in ldp_reports_default) sits in the DEFAULT
+    # partition, so every partition the manager creates scans it for stray rows and Postgres
+    # re-validates it under an ACCESS EXCLUSIVE lock. Move those rows into day partitions
+    # and leave an empty default behind.
+    for table_name in REPORT_TABLES:
+        default, ranges = _partitions(bind, table_name)
+        if default is None:
+            continue
+        retired = f"{table_name}_retired_default"
+        op.execute(f"ALTER TABLE {table_name} DETACH PARTITION {default}")
+        op.execute(f"ALTER TABLE {default} RENAME TO {retired}")
+        op.execute(f"CREATE TABLE {table_name}_default PARTITION OF {table_name} DEFAULT")
+        days = bind.execute(text(f"SELECT DISTINCT day FROM {retired} ORDER BY day")).scalars().all()
+        for day in days:
+            start = day.isoformat()
+            if any(low <= start < high for low, high in ranges):
+                continue
+            end = day.fromordinal(day.toordinal() + 1).isoformat()
+            op.execute(
+                f"CREATE TABLE {table_name}_p{day:%Y%m%d} PARTITION OF {table_name} "
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+            ranges.append((start, end))
+        columns = ", ".join(
+            bind.execute(
+                text(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_name = :table_name ORDER BY ordinal_position"
+                ),
+                {"table_name": table_name},
+            ).scalars()
+        )
+        # ldp_reports.id is GENERATED ALWAYS; the moved rows keep their ids.
+        op.execute(
+            f"INSERT INTO {table_name} ({columns}) OVERRIDING SYSTEM VALUE "
+            f"SELECT {columns} FROM {retired}"
+        )
+        op.execute(f"DROP TABLE {retired}")
+
+
+def downgrade():
+    # The rows stay in their range partitions; the partitioning migration's downgrade
+    # copies every partition back into a plain table.
+    pass
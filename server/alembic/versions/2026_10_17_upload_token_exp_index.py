@@ -0,0 +1,22 @@
+"""index upload token expiry for the sweeper
+
+Revision ID: 2026_10_17_upload_token_exp_index
+Revises: 2026_02_13_tier_rollout_raw_reports
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+
+revision = "2026_10_17_upload_token_exp_index"
+down_revision = "2026_02_13_tier_rollout_raw_reports"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_upload_tokens_exp", "upload_tokens", ["exp"])
+
+
+def downgrade():
+    op.drop_index("ix_upload_tokens_exp", table_name="upload_tokens")
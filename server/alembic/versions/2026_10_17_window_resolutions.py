@@ -0,0 +1,34 @@
+"""multi-resolution dp windows
+
+Revision ID: 2026_10_17_window_resolutions
+Revises: 2026_10_17_report_counters
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "2026_10_17_window_resolutions"
+down_revision = "2026_10_17_report_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing windows are one-minute buckets.
+    op.add_column(
+        "dp_windows",
+        sa.Column("resolution_seconds", sa.Integer, nullable=False, server_default=sa.text("60")),
+    )
+    op.drop_constraint("uq_window", "dp_windows", type_="unique")
+    op.create_unique_constraint(
+        "uq_window", "dp_windows", ["site_id", "window_start", "metric", "plan", "resolution_seconds"]
+    )
+
+
+def downgrade():
+    op.execute("DELETE FROM dp_windows WHERE resolution_seconds <> 60")
+    op.drop_constraint("uq_window", "dp_windows", type_="unique")
+    op.create_unique_constraint("uq_window", "dp_windows", ["site_id", "window_start", "metric", "plan"])
+    op.drop_column("dp_windows", "resolution_seconds")
@@ -0,0 +1,195 @@
+"""Compact binary batch format for ``/api/shuffle/batch`` and ``/api/collect/batch``.
+
+All integers are little-endian. A batch is a header followed by segments::
+
+    magic   4s   b"LDPB"
+    version u8   1
+    token   u16 length + utf-8   (empty for /collect)
+    nonce   u16 length + utf-8   (empty for /collect)
+    site_id u16 length + utf-8
+    server_received_at_ms i64    (0 lets the server stamp the batch)
+    segment_count u16
+
+    segment:
+      kind u8 (index into EVENT_KINDS)
+      epsilon_used f64
+      sampling_rate f64
+      base_timestamp_ms i64
+      count u32
+      timestamp offsets   count x u32 milliseconds after base_timestamp_ms
+      randomized bits     ceil(count / 8) bytes, least significant bit first
+
+Everything a JSON ``PrivatizedEvent`` repeats per event (site, kind, epsilon, sampling
+rate) lives once per segment; each event costs four bytes of timestamp and one bit.
+Events whose payload carries more than ``randomized_bit`` must use the JSON endpoints.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import struct
+from dataclasses import dataclass, field
+
+from .schemas import EVENT_KINDS
+
+MEDIA_TYPE = "application/x-ldp-batch"
+MAGIC = b"LDPB"
+VERSION = 1
+
+_HEADER_TAIL = struct.Struct("<qH")
+_SEGMENT_HEADER = struct.Struct("<BddqI")
+_STRING_LENGTH = struct.Struct("<H")
+
+
+class BatchDecodeError(ValueError):
+    pass
+
+
+@dataclass
+class BatchSegment:
+    kind: str
+    epsilon_used: float
+    sampling_rate: float
+    base_timestamp_ms: int
+    offsets_ms: tuple[int, ...]
+    bits: list[int]
+
+    def __len__(self) -> int:
+        return len(self.offsets_ms)
+
+    def timestamps(self) -> list[dt.datetime]:
+        base = self.base_timestamp_ms
+        return [
+            dt.datetime.fromtimestamp((base + offset) / 1000.0, dt.timezone.utc) for offset in self.offsets_ms
+        ]
+
+
+@dataclass
+class DecodedBatch:
+    site_id: str
+    token: str = ""
+    nonce: str = ""
+    server_received_at: dt.datetime | None = None
+    segments: list[BatchSegment] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+
+def _pack_bits(bits: list[int]) -> bytes:
+    packed = bytearray((len(bits) + 7) // 8)
+    for index, bit in enumerate(bits):
+        if bit:
+            packed[index >> 3] |= 1 << (index & 7)
+    return bytes(packed)
+
+
+# Byte value -> its eight bits, least significant first.
+_BYTE_BITS = [tuple((value >> shift) & 1 for shift in range(8)) for value in range(256)]
+
+
+def _unpack_bits(data: bytes, count: int) -> list[int]:
+    bits: list[int] = []
+    for byte in data:
+        bits.extend(_BYTE_BITS[byte])
+    del bits[count:]
+    return bits
+
+
+def _pack_string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    if len(encoded) > 0xFFFF:
+        raise ValueError("String field exceeds 65535 bytes")
+    return _STRING_LENGTH.pack(len(encoded)) + encoded
+
+
+def encode_batch(batch: DecodedBatch) -> bytes:
+    received_ms = 0
+    if batch.server_received_at is not None:
+        received_ms = int(batch.server_received_at.timestamp() * 1000)
+    parts = [
+        MAGIC,
+        bytes([VERSION]),
+        _pack_string(batch.token),
+        _pack_string(batch.nonce),
+        _pack_string(batch.site_id),
+        _HEADER_TAIL.pack(received_ms, len(batch.segments)),
+    ]
+    for segment in batch.segments:
+        count = len(segment.offsets_ms)
+        if len(segment.bits) != count:
+            raise ValueError("Segment bits and timestamps differ in length")
+        parts.append(
+            _SEGMENT_HEADER.pack(
+                EVENT_KINDS.index(segment.kind),
+                segment.epsilon_used,
+                segment.sampling_rate,
+                segment.base_timestamp_ms,
+                count,
+            )
+        )
+        parts.append(struct.pack(f"<{count}I", *segment.offsets_ms))
+        parts.append(_pack_bits(segment.bits))
+    return b"".join(parts)
+
+
+def decode_batch(data: bytes) -> DecodedBatch:
+    try:
+        return _decode(memoryview(data))
+    except (struct.error, IndexError, UnicodeDecodeError) as exc:
+        raise BatchDecodeError("Truncated or malformed batch") from exc
+
+
+def _decode(view: memoryview) -> DecodedBatch:
+    if bytes(view[:4]) != MAGIC:
+        raise BatchDecodeError("Bad magic")
+    if view[4] != VERSION:
+        raise BatchDecodeError(f"Unsupported batch version {view[4]}")
+    offset = 5
+    strings = []
+    for _ in range(3):
+        (length,) = _STRING_LENGTH.unpack_from(view, offset)
+        offset += _STRING_LENGTH.size
+        if offset + length > len(view):
+            raise BatchDecodeError("Truncated string field")
+        strings.append(bytes(view[offset : offset + length]).decode("utf-8"))
+        offset += length
+    received_ms, segment_count = _HEADER_TAIL.unpack_from(view, offset)
+    offset += _HEADER_TAIL.size
+
+    segments: list[BatchSegment] = []
+    for _ in range(segment_count):
+        kind_index, epsilon, sampling, base_ms, count = _SEGMENT_HEADER.unpack_from(view, offset)
+        offset += _SEGMENT_HEADER.size
+        if kind_index >= len(EVENT_KINDS):
+            raise BatchDecodeError(f"Unknown event kind {kind_index}")
+        offsets_ms = struct.unpack_from(f"<{count}I", view, offset)
+        offset += 4 * count
+        bit_bytes = (count + 7) // 8
+        if offset + bit_bytes > len(view):
+            raise BatchDecodeError("Truncated bit vector")
+        bits = _unpack_bits(bytes(view[offset : offset + bit_bytes]), count)
+        offset += bit_bytes
+        segments.append(
+            BatchSegment(
+                kind=EVENT_KINDS[kind_index],
+                epsilon_used=epsilon,
+                sampling_rate=sampling,
+                base_timestamp_ms=base_ms,
+                offsets_ms=offsets_ms,
+                bits=bits,
+            )
+        )
+    if offset != len(view):
+        raise BatchDecodeError("Trailing bytes after last segment")
+
+    token, nonce, site_id = strings
+    return DecodedBatch(
+        site_id=site_id,
+        token=token,
+        nonce=nonce,
+        server_received_at=(
+            dt.datetime.fromtimestamp(received_ms / 1000.0, dt.timezone.utc) if received_ms else None
+        ),
+        segments=segments,
+    )
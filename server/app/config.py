@@ -8,6 +8,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
   DATABASE_URL: str = Field(default="sqlite+aiosqlite:///./marketing.db")
   UPLOAD_TOKEN_SECRET: str = Field(default="change-me")
+  REDUCER_NOISE_SECRET: str | None = None
   STRIPE_SECRET_KEY: str | None = None
   STRIPE_WEBHOOK_SECRET: str | None = None
   STRIPE_STANDARD_PRICE_ID: str | None = None
@@ -15,11 +16,47 @@ class Settings(BaseSettings):
   STRIPE_CHECKOUT_SUCCESS_URL: str = Field(default="https://app.validanalytics.io/billing/success")
   STRIPE_CHECKOUT_CANCEL_URL: str = Field(default="https://app.validanalytics.io/billing/cancel")
   UPLOAD_TOKEN_TTL_SECONDS: int = Field(default=900)
+  TOKEN_CACHE_MAX_ENTRIES: int = Field(default=10000)
+  TOKEN_CACHE_TTL_SECONDS: int = Field(default=60)
+  SITE_PLAN_CACHE_TTL_SECONDS: float = Field(default=30.0)
+  SITE_PLAN_CACHE_MAX_ENTRIES: int = Field(default=50000)
+  TOKEN_SWEEP_BATCH_SIZE: int = Field(default=1000)
+  TOKEN_SWEEP_GRACE_SECONDS: int = Field(default=86400)
+  TOKEN_SWEEP_INTERVAL_MINUTES: int = Field(default=60)
   MIN_REPORTS_PER_WINDOW: int = Field(default=40)
   LIVE_WATERMARK_SECONDS: int = Field(default=120)
+  LIVE_AGGREGATOR_ENABLED: bool = Field(default=True)
+  LIVE_AGGREGATOR_WINDOW_MINUTES: int = Field(default=3)
+  LIVE_AGGREGATOR_MAX_SERIES: int = Field(default=100000)
+  # Web worker processes (uvicorn/gunicorn read the same variable).
+  WEB_CONCURRENCY: int = Field(default=1)
+  AGGREGATE_PAGE_SIZE: int = Field(default=1000)
+  AGGREGATE_MAX_PAGE_SIZE: int = Field(default=10000)
+  HTTP_CACHE_MAX_AGE_SECONDS: int = Field(default=30)
   MAX_OUT_OF_ORDER_SECONDS: int = Field(default=300)
+  NONCE_RETENTION_SECONDS: int = Field(default=900)
+  NONCE_BUCKET_SECONDS: int = Field(default=60)
+  NONCE_SYNC_SECONDS: float = Field(default=5.0)
+  NONCE_PURGE_INTERVAL_SECONDS: int = Field(default=60)
+  SHUFFLE_MAX_DELAY_SECONDS: int = Field(default=120)
+  SHUFFLE_QUEUE_MAX_BATCHES: int = Field(default=10000)
+  SHUFFLE_WRITER_TASKS: int = Field(default=2)
+  SHUFFLE_SPOOL_DIR: str | None = None
   RATE_LIMIT_BUCKET_PER_MIN: int = Field(default=200)
+  RATE_LIMIT_BACKEND: str = Field(default="local")
   ALPHA_SMOOTHING: float = Field(default=0.5)
+  REDUCER_MODE: str = Field(default="python")
+  INCREMENTAL_REDUCER_INTERVAL_SECONDS: int = Field(default=0)
+  REDUCER_STREAM_CHUNK_ROWS: int = Field(default=50000)
+  REDUCER_WORKERS: int = Field(default=1)
+  WINDOW_RESOLUTIONS_SECONDS: list[int] = Field(default=[60, 180, 900, 3600, 86400])
+  REPORT_COUNTERS_ENABLED: bool = Field(default=False)
+  STORE_REPORT_ROWS: bool = Field(default=True)
+  REPORT_RETENTION_DAYS: int = Field(default=0)
+  REPORT_RETENTION_DAYS_BY_PLAN: dict[str, int] = Field(default_factory=dict)
+  REPORT_RETENTION_BATCH_SIZE: int = Field(default=5000)
+  REPORT_PARTITION_INTERVAL: str = Field(default="day")
+  REPORT_PARTITIONS_AHEAD: int = Field(default=7)
   MAX_EVENTS_PER_MINUTE: int = Field(default=60)
   AGGREGATE_DP_EPSILON: float = Field(default=1.0)
   ENABLE_PRO_INGEST: bool = Field(default=False)
@@ -57,6 +94,26 @@ class Settings(BaseSettings):
     self.cors_origins = normalized
     return self
 
+  @model_validator(mode="after")
+  def ensure_window_resolutions(self):
+    # Windows are rolled up from one-minute buckets, so every resolution is whole minutes.
+    resolutions = sorted(set(self.WINDOW_RESOLUTIONS_SECONDS))
+    if not resolutions or any(seconds <= 0 or seconds % 60 for seconds in resolutions):
+      raise ValueError("WINDOW_RESOLUTIONS_SECONDS must be positive multiples of 60")
+    if any(resolutions[-1] % seconds for seconds in resolutions):
+      raise ValueError("WINDOW_RESOLUTIONS_SECONDS must each divide the coarsest resolution")
+    self.WINDOW_RESOLUTIONS_SECONDS = resolutions
+    return self
+
+  @model_validator(mode="after")
+  def ensure_reports_are_recorded(self):
+    if not self.STORE_REPORT_ROWS and not self.REPORT_COUNTERS_ENABLED:
+      raise ValueError("STORE_REPORT_ROWS=false requires REPORT_COUNTERS_ENABLED=true")
+    # Every other reducer mode reads report rows and would silently publish nothing.
+    if not self.STORE_REPORT_ROWS and self.REDUCER_MODE != "counters":
+      raise ValueError("STORE_REPORT_ROWS=false requires REDUCER_MODE=counters")
+    return self
+
 
 @lru_cache(1)
 def get_settings() -> Settings:
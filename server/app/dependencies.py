@@ -3,11 +3,9 @@ from __future__ import annotations
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import SitePlan, get_session
+from .models import get_session
+from .plan_cache import site_plans
 
 
 async def get_site_plan(site_id: str, session: AsyncSession = Depends(get_session)) -> str:
-    record = await session.get(SitePlan, site_id)
-    if not record:
-        return "free"
-    return record.plan
+    return await site_plans.get(session, site_id)
@@ -0,0 +1,115 @@
+"""Conditional GET support for the dashboard read endpoints.
+
+Published data only changes when the reducer or the forecaster writes, so each endpoint
+derives a version from one index probe (the newest ``DpWindow.published_at`` or
+``Forecast.model_id`` of the series it serves) and answers ``If-None-Match`` /
+``If-Modified-Since`` with a bare 304 before running its query or building a response.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable
+
+from fastapi import Request, Response, status
+from sqlalchemy import func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import get_settings
+from .models import DpWindow
+
+settings = get_settings()
+
+
+def make_etag(*parts: object) -> str:
+    """Weak ETag over ``parts``; responses are equivalent, not byte-identical, per version."""
+    digest = hashlib.blake2b("\x1f".join(str(part) for part in parts).encode("utf-8"), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+async def windows_published_at(
+    session: AsyncSession,
+    site_id: str,
+    plan: str,
+    metrics: Iterable[str],
+    resolution_seconds: int,
+) -> dt.datetime | None:
+    """Newest ``published_at`` over the given metrics' windows at one resolution.
+
+    One ``max()`` per metric, each answered from ``ix_dp_windows_published`` without
+    touching the table.
+    """
+    branches = [
+        select(func.max(DpWindow.published_at).label("published_at")).where(
+            DpWindow.site_id == site_id,
+            DpWindow.metric == metric,
+            DpWindow.plan == plan,
+            DpWindow.resolution_seconds == resolution_seconds,
+        )
+        for metric in metrics
+    ]
+    if not branches:
+        return None
+    published = union_all(*branches).subquery()
+    latest = (await session.execute(select(func.max(published.c.published_at)))).scalar_one_or_none()
+    return _as_utc(latest) if latest is not None else None
+
+
+def _as_utc(value: dt.datetime) -> dt.datetime:
+    # SQLite hands back naive datetimes for timezone-aware columns.
+    return value.replace(tzinfo=dt.timezone.utc) if value.tzinfo is None else value.astimezone(dt.timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2).
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def _unmodified_since(header: str, last_modified: dt.datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=dt.timezone.utc)
+    # HTTP dates have whole seconds.
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: dt.datetime | None = None,
+) -> Response | None:
+    """Put the validators and ``Cache-Control`` on ``response``; return a 304 if the client is current.
+
+    ``If-None-Match`` wins over ``If-Modified-Since`` when both are sent.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max(0, settings.HTTP_CACHE_MAX_AGE_SECONDS)}, must-revalidate",
+    }
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        current = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        current = (
+            if_modified_since is not None
+            and last_modified is not None
+            and _unmodified_since(if_modified_since, last_modified)
+        )
+    if current:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
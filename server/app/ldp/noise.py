@@ -0,0 +1,133 @@
+"""Keyed, counter-based Laplace noise for the reducer.
+
+Every noise value is a pure function of a server secret, a stream label (site and
+metric) and a counter (the window start), computed with the Philox4x32-10 block cipher.
+The same window gets the same noise in every worker process and on every rerun, so a
+reduce can be repeated or sharded without changing published values, and rerunning it
+cannot be used to average the noise away. All draws for a batch of windows are one
+vectorized pass over NumPy arrays.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+from typing import Sequence
+
+import numpy as np
+
+from ..config import get_settings
+
+settings = get_settings()
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+_PHILOX_M0 = np.uint64(0xD2511F53)
+_PHILOX_M1 = np.uint64(0xCD9E8D57)
+_PHILOX_W0 = 0x9E3779B9
+_PHILOX_W1 = 0xBB67AE85
+_PHILOX_ROUNDS = 10
+
+
+def philox4x32(counters: np.ndarray, key: tuple[int, int]) -> np.ndarray:
+    """Philox4x32-10 of each row of ``counters`` (shape ``(n, 4)``, 32-bit words) under ``key``."""
+    c0, c1, c2, c3 = (counters[:, index].astype(np.uint64) & _MASK32 for index in range(4))
+    k0, k1 = key
+    for _ in range(_PHILOX_ROUNDS):
+        product0 = _PHILOX_M0 * c0
+        product1 = _PHILOX_M1 * c2
+        c0, c1, c2, c3 = (
+            (product1 >> np.uint64(32)) ^ c1 ^ np.uint64(k0),
+            product1 & _MASK32,
+            (product0 >> np.uint64(32)) ^ c3 ^ np.uint64(k1),
+            product0 & _MASK32,
+        )
+        k0 = (k0 + _PHILOX_W0) & 0xFFFFFFFF
+        k1 = (k1 + _PHILOX_W1) & 0xFFFFFFFF
+    return np.stack([c0, c1, c2, c3], axis=1).astype(np.uint32)
+
+
+def _philox4x32_one(counter: tuple[int, int, int, int], key: tuple[int, int]) -> tuple[int, int, int, int]:
+    """``philox4x32`` of a single counter in plain integers; cheaper than NumPy for one block."""
+    c0, c1, c2, c3 = counter
+    k0, k1 = key
+    for _ in range(_PHILOX_ROUNDS):
+        product0 = 0xD2511F53 * c0
+        product1 = 0xCD9E8D57 * c2
+        c0, c1, c2, c3 = (
+            (product1 >> 32) ^ c1 ^ k0,
+            product1 & 0xFFFFFFFF,
+            (product0 >> 32) ^ c3 ^ k1,
+            product0 & 0xFFFFFFFF,
+        )
+        k0 = (k0 + _PHILOX_W0) & 0xFFFFFFFF
+        k1 = (k1 + _PHILOX_W1) & 0xFFFFFFFF
+    return c0, c1, c2, c3
+
+
+def _digest(data: bytes, secret: bytes, person: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8, key=secret, person=person).digest(), "little")
+
+
+class LaplaceNoise:
+    """Laplace noise keyed by ``secret``; ``draw`` is deterministic per (label, counter)."""
+
+    def __init__(self, secret: str | bytes):
+        raw = secret.encode("utf-8") if isinstance(secret, str) else secret
+        # blake2b keys are at most 64 bytes; any secret length is folded to that.
+        self._secret = hashlib.blake2b(raw).digest()
+        key = _digest(b"philox-key", self._secret, b"laplace-key")
+        self._key = (key & 0xFFFFFFFF, key >> 32)
+        self._labels: dict[str, int] = {}
+
+    def _label_id(self, label: str) -> int:
+        label_id = self._labels.get(label)
+        if label_id is None:
+            label_id = self._labels[label] = _digest(label.encode("utf-8"), self._secret, b"laplace-label")
+        return label_id
+
+    def uniform(self, labels: Sequence[str], counters: np.ndarray) -> np.ndarray:
+        """Uniform draws in the open interval (0, 1), one per (label, counter) pair."""
+        counters = np.asarray(counters, dtype=np.int64).astype(np.uint64)
+        label_ids = np.fromiter((self._label_id(label) for label in labels), dtype=np.uint64, count=len(labels))
+        words = np.stack(
+            [counters & _MASK32, counters >> np.uint64(32), label_ids & _MASK32, label_ids >> np.uint64(32)],
+            axis=1,
+        )
+        bits = philox4x32(words, self._key).astype(np.uint64)
+        mantissa = ((bits[:, 0] >> np.uint64(5)) << np.uint64(26)) | (bits[:, 1] >> np.uint64(6))
+        return (mantissa.astype(np.float64) + 0.5) / float(1 << 53)
+
+    def draw_one(self, label: str, counter: int, scale: float) -> float:
+        """``draw`` for a single (label, counter) pair, bit-for-bit equal to the vectorized path."""
+        label_id = self._label_id(label)
+        counter &= 0xFFFFFFFFFFFFFFFF
+        bits = _philox4x32_one(
+            (counter & 0xFFFFFFFF, counter >> 32, label_id & 0xFFFFFFFF, label_id >> 32), self._key
+        )
+        centered = (((bits[0] >> 5) << 26 | bits[1] >> 6) + 0.5) / float(1 << 53) - 0.5
+        return float(-scale * math.copysign(1.0, centered) * np.log1p(-2.0 * abs(centered)))
+
+    def draw(self, labels: Sequence[str], counters: np.ndarray, scale: float | np.ndarray) -> np.ndarray:
+        """Laplace(0, ``scale``) noise for each (label, counter) pair."""
+        if len(labels) == 0:
+            return np.zeros(0, dtype=np.float64)
+        centered = self.uniform(labels, counters) - 0.5
+        return -np.asarray(scale, dtype=np.float64) * np.sign(centered) * np.log1p(-2.0 * np.abs(centered))
+
+
+def _noise_secret() -> str:
+    return settings.REDUCER_NOISE_SECRET or settings.UPLOAD_TOKEN_SECRET
+
+
+def reducer_noise() -> LaplaceNoise:
+    """The reducer's noise engine, keyed by ``REDUCER_NOISE_SECRET`` (or the upload-token secret)."""
+    return LaplaceNoise(_noise_secret())
+
+
+def live_noise() -> LaplaceNoise:
+    """Noise for live releases, under a key independent of the reducer's.
+
+    A live release and the reducer's publication of the same window are two separate
+    releases; sharing noise between them would let their difference cancel it.
+    """
+    return LaplaceNoise(b"live\x1f" + _noise_secret().encode("utf-8"))
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import math
-from typing import Tuple
+from typing import NamedTuple, Tuple
+
+import numpy as np
 
 from ..config import get_settings
 
@@ -52,3 +54,115 @@ def confidence_interval(estimate: float, se: float, z: float) -> Tuple[float, fl
     if math.isnan(se):
         se = 0.0
     return estimate - z * se, estimate + z * se
+
+
+Z_80 = 1.2816
+Z_95 = 1.9599
+
+
+class DecodedArrays(NamedTuple):
+    estimate: np.ndarray
+    variance: np.ndarray
+    se: np.ndarray
+    ci80_low: np.ndarray
+    ci80_high: np.ndarray
+    ci95_low: np.ndarray
+    ci95_high: np.ndarray
+
+
+def prob_true_array(epsilon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # np.exp can differ from math.exp in the last bit; windows share a handful of epsilons,
+    # so exponentiate the distinct values with math.exp to stay bit-identical to prob_true.
+    distinct, inverse = np.unique(epsilon, return_inverse=True)
+    exp = np.array([math.exp(value) for value in distinct], dtype=np.float64)[inverse].reshape(epsilon.shape)
+    p = exp / (1 + exp)
+    q = 1 - p
+    return p, q
+
+
+def adjusted_probability_array(epsilon: np.ndarray, sampling_rate: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    p, q = prob_true_array(epsilon)
+    baseline = 0.5
+    p_adj = sampling_rate * p + (1 - sampling_rate) * baseline
+    q_adj = sampling_rate * q + (1 - sampling_rate) * baseline
+    return p_adj, q_adj
+
+
+def interval_arrays(estimate: np.ndarray, variance: np.ndarray) -> DecodedArrays:
+    """Standard errors and 80%/95% intervals, element-wise equal to the scalar helpers."""
+    estimate = np.asarray(estimate, dtype=np.float64)
+    variance = np.asarray(variance, dtype=np.float64)
+    se = np.sqrt(np.maximum(variance, 0.0))
+    safe_se = np.where(np.isnan(se), 0.0, se)
+    return DecodedArrays(
+        estimate=estimate,
+        variance=variance,
+        se=se,
+        ci80_low=estimate - Z_80 * safe_se,
+        ci80_high=estimate + Z_80 * safe_se,
+        ci95_low=estimate - Z_95 * safe_se,
+        ci95_high=estimate + Z_95 * safe_se,
+    )
+
+
+def rr_decode_arrays(
+    ones: np.ndarray,
+    total: np.ndarray,
+    epsilon: np.ndarray,
+    sampling_rate: np.ndarray,
+    alpha: float | None = None,
+) -> DecodedArrays:
+    """Vectorized ``rr_unbiased_estimate`` plus SE and intervals for many windows at once.
+
+    Each element matches the scalar functions exactly; use those for single windows.
+    """
+    alpha = alpha if alpha is not None else settings.ALPHA_SMOOTHING
+    ones = np.asarray(ones, dtype=np.float64)
+    total = np.asarray(total, dtype=np.float64)
+    epsilon = np.asarray(epsilon, dtype=np.float64)
+    sampling_rate = np.asarray(sampling_rate, dtype=np.float64)
+    p_adj, q_adj = adjusted_probability_array(epsilon, sampling_rate)
+    denominator = p_adj - q_adj
+    degenerate = denominator == 0
+    safe_denominator = np.where(degenerate, 1.0, denominator)
+    estimate = (ones - total * q_adj) / safe_denominator
+    estimate += alpha
+    estimate = np.maximum(0.0, np.minimum(total / np.maximum(sampling_rate, 1e-9), estimate))
+    variance = (
+        total * (1 - p_adj) * p_adj + (np.maximum(total, 1.0) - total) * (1 - q_adj) * q_adj
+    ) / (safe_denominator**2)
+    estimate = np.where(degenerate, 0.0, estimate)
+    variance = np.where(degenerate, 0.0, variance)
+    return interval_arrays(estimate, variance)
+
+
+def combine_rr_groups(
+    window_index: np.ndarray,
+    windows: int,
+    ones: np.ndarray,
+    total: np.ndarray,
+    epsilon: np.ndarray,
+    sampling: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Decode every (epsilon, sampling_rate) group and pool the groups of each window.
+
+    Groups count different reports, so they are pooled on the per-report rate: each group's
+    rate (its estimate over its report count) is weighted by its inverse variance, and the
+    pooled rate is scaled back to the window's report count. A window with a single group
+    decodes as ``rr_unbiased_estimate`` would, up to rounding.
+    """
+    decoded = rr_decode_arrays(ones, total, epsilon, sampling)
+    # Degenerate groups (no reports, or parameters that carry no signal) have no usable variance.
+    usable = (decoded.variance > 0) & (total > 0)
+    safe_total = np.where(usable, total, 1.0)
+    rate = decoded.estimate / safe_total
+    weight = np.where(usable, safe_total**2 / np.where(usable, decoded.variance, 1.0), 0.0)
+
+    weight_sum = np.bincount(window_index, weights=weight, minlength=windows)
+    weighted_rate = np.bincount(window_index, weights=weight * rate, minlength=windows)
+    reports = np.bincount(window_index, weights=np.where(usable, total, 0.0), minlength=windows)
+    has_signal = weight_sum > 0
+    safe_weight_sum = np.where(has_signal, weight_sum, 1.0)
+    estimate = np.where(has_signal, weighted_rate / safe_weight_sum * reports, 0.0)
+    variance = np.where(has_signal, reports**2 / safe_weight_sum, 0.0)
+    return estimate, variance
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+import numpy as np
+from prometheus_client import Gauge
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import get_settings
+from .ldp.noise import live_noise
+from .ldp.rr_decoder import combine_rr_groups, interval_arrays
+from .models import SiteEpsilonLog, dialect_insert
+
+settings = get_settings()
+
+live_aggregator_series = Gauge("live_aggregator_series", "Series held in the in-process live aggregator")
+
+SeriesKey = tuple[str, str, str]
+
+# SiteEpsilonLog plan under which live Standard releases are charged; the reducer owns "standard".
+LIVE_EPSILON_PLAN = "standard-live"
+
+
+@dataclass
+class _MinuteSlot:
+    minute: int = -1
+    count: int = 0
+    value: float = 0.0
+    # (epsilon, sampling_rate) -> [reports, ones]; only filled for Pro
+    groups: dict[tuple[float, float], list[float]] = field(default_factory=dict)
+    # Noised Standard value once released; the minute takes no further writes after that.
+    released: float | None = None
+
+    def reset(self, minute: int) -> None:
+        self.minute = minute
+        self.count = 0
+        self.value = 0.0
+        self.groups = {}
+        self.released = None
+
+
+@dataclass
+class LiveWindow:
+    window_start: dt.datetime
+    window_end: dt.datetime
+    value: float
+    variance: float
+    ci80: tuple[float, float]
+    ci95: tuple[float, float]
+
+
+class LiveAggregator:
+    """Rolling one-minute counters per (site, plan, metric), fed by ingest.
+
+    Each series is a ring buffer of minute slots covering the live window plus the
+    watermark, so memory stays fixed per series; the least recently written series is
+    evicted past ``max_series``. Estimates are made at read time the way the reducer
+    makes them: raw counts for Free, Laplace noise for Standard, and a randomized-response
+    decode for Pro. Counters are per process; with several workers each sees its share.
+
+    A Standard minute is released once, after it is final (``LIVE_WATERMARK_SECONDS``
+    after it closes): its noised value is frozen, later reports for it are left to the
+    reducer, and its epsilon is charged to the site's budget under ``LIVE_EPSILON_PLAN``.
+    The noise is keyed apart from the reducer's, since the reducer publishes the same
+    minute again. Standard is only served with a single web worker (``WEB_CONCURRENCY``);
+    several processes would each release their own partial count.
+    """
+
+    def __init__(self, *, window_minutes: int, max_series: int):
+        self.window_minutes = max(1, window_minutes)
+        self.max_series = max(1, max_series)
+        watermark_minutes = math.ceil(settings.LIVE_WATERMARK_SECONDS / 60)
+        self._slot_count = self.window_minutes + watermark_minutes + 1
+        self._series: OrderedDict[SeriesKey, list[_MinuteSlot]] = OrderedDict()
+        # (site_id, day) -> epsilon of Standard releases not yet written to SiteEpsilonLog
+        self._pending_epsilon: dict[tuple[str, dt.date], float] = {}
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def clear(self) -> None:
+        self._series.clear()
+        self._pending_epsilon.clear()
+
+    def serves(self, plan: str) -> bool:
+        """Whether live reads for ``plan`` may come from this process's counters."""
+        return plan != "standard" or settings.WEB_CONCURRENCY <= 1
+
+    def record(self, site_id: str, plan: str, rows: Iterable[dict[str, Any]]) -> None:
+        """Add ingested report rows (with their typed report columns) to their minute slots."""
+        for row in rows:
+            if row["is_historical"]:
+                continue
+            slot = self._slot((site_id, plan, row["kind"]), int(row["server_received_at"].timestamp()) // 60)
+            if slot is None or slot.released is not None:
+                continue
+            slot.count += 1
+            slot.value += row["value"]
+            if plan == "pro":
+                group = slot.groups.setdefault((row["epsilon_used"], row["sampling_rate"]), [0, 0])
+                group[0] += 1
+                group[1] += row["randomized_bit"]
+
+    def windows(self, site_id: str, plan: str, metric: str, now: float | None = None) -> list[LiveWindow]:
+        """Estimated one-minute windows of the live range, oldest first."""
+        series = self._series.get((site_id, plan, metric))
+        if series is None:
+            return []
+        now = time.time() if now is None else now
+        newest = int(now) // 60
+        if plan == "standard":
+            newest = int(now - settings.LIVE_WATERMARK_SECONDS) // 60 - 1
+        oldest = newest - self.window_minutes + 1
+        slots = sorted(
+            (
+                slot
+                for slot in series
+                if oldest <= slot.minute <= newest and slot.count >= settings.MIN_REPORTS_PER_WINDOW
+            ),
+            key=lambda slot: slot.minute,
+        )
+        if not slots:
+            return []
+        minutes = np.array([slot.minute for slot in slots], dtype=np.int64)
+        if plan == "pro":
+            value, variance = self._decode_pro(slots)
+            se = np.sqrt(variance)
+            keep = se != 0
+            keep[keep] = value[keep] / se[keep] >= 1.5
+        elif plan == "standard":
+            value = self._release_standard(site_id, metric, slots, minutes)
+            scale = 1.0 / max(settings.AGGREGATE_DP_EPSILON, 1e-6)
+            variance = np.full(len(slots), scale**2)
+            # Filtered on the noised value only; the true count must not decide what is shown.
+            keep = value > 0
+        else:
+            value = np.array([slot.value for slot in slots], dtype=np.float64)
+            keep = value > 0
+            variance = np.maximum(value, 1.0)
+        decoded = interval_arrays(value, variance)
+        windows = []
+        for index in np.flatnonzero(keep).tolist():
+            start = dt.datetime.fromtimestamp(int(minutes[index]) * 60, dt.timezone.utc)
+            windows.append(
+                LiveWindow(
+                    window_start=start,
+                    window_end=start + dt.timedelta(minutes=1),
+                    value=max(0.0, float(decoded.estimate[index])),
+                    variance=max(0.0, float(decoded.variance[index])),
+                    ci80=(max(0.0, float(decoded.ci80_low[index])), max(0.0, float(decoded.ci80_high[index]))),
+                    ci95=(max(0.0, float(decoded.ci95_low[index])), max(0.0, float(decoded.ci95_high[index]))),
+                )
+            )
+        return windows
+
+    def _release_standard(
+        self, site_id: str, metric: str, slots: list[_MinuteSlot], minutes: np.ndarray
+    ) -> np.ndarray:
+        """Noised values of final Standard minutes, releasing (and charging) the new ones."""
+        fresh = [index for index, slot in enumerate(slots) if slot.released is None]
+        if fresh:
+            epsilon = settings.AGGREGATE_DP_EPSILON
+            noise = live_noise().draw(
+                [f"{site_id}\x1f{metric}"] * len(fresh), minutes[fresh] * 60, 1.0 / max(epsilon, 1e-6)
+            )
+            for index, draw in zip(fresh, noise.tolist()):
+                slot = slots[index]
+                slot.released = max(0.0, slot.value + draw)
+                day = dt.datetime.fromtimestamp(slot.minute * 60, dt.timezone.utc).date()
+                self._pending_epsilon[(site_id, day)] = self._pending_epsilon.get((site_id, day), 0.0) + epsilon
+        return np.array([slot.released for slot in slots], dtype=np.float64)
+
+    async def flush_epsilon(self, session: AsyncSession) -> None:
+        """Add the epsilon of Standard releases since the last flush to ``SiteEpsilonLog``."""
+        if not self._pending_epsilon:
+            return
+        pending, self._pending_epsilon = self._pending_epsilon, {}
+        stmt = dialect_insert(SiteEpsilonLog).values(
+            [
+                {"site_id": site_id, "day": day, "plan": LIVE_EPSILON_PLAN, "epsilon_total": epsilon}
+                for (site_id, day), epsilon in pending.items()
+            ]
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["site_id", "day", "plan"],
+                set_={"epsilon_total": SiteEpsilonLog.epsilon_total + stmt.excluded.epsilon_total},
+            )
+        )
+        await session.commit()
+
+    def _slot(self, key: SeriesKey, minute: int) -> _MinuteSlot | None:
+        series = self._series.get(key)
+        if series is None:
+            while len(self._series) >= self.max_series:
+                self._series.popitem(last=False)
+            series = self._series[key] = [_MinuteSlot() for _ in range(self._slot_count)]
+        else:
+            self._series.move_to_end(key)
+        slot = series[minute % self._slot_count]
+        if slot.minute != minute:
+            if slot.minute > minute:
+                # Older than the ring covers; the reducer still counts it.
+                return None
+            slot.reset(minute)
+        return slot
+
+    @staticmethod
+    def _decode_pro(slots: list[_MinuteSlot]) -> tuple[np.ndarray, np.ndarray]:
+        window_index, ones, total, epsilon, sampling = [], [], [], [], []
+        for index, slot in enumerate(slots):
+            for (group_epsilon, group_sampling), (reports, group_ones) in slot.groups.items():
+                window_index.append(index)
+                total.append(reports)
+                ones.append(group_ones)
+                epsilon.append(group_epsilon)
+                sampling.append(group_sampling)
+        return combine_rr_groups(
+            np.array(window_index, dtype=np.intp),
+            len(slots),
+            np.array(ones, dtype=np.float64),
+            np.array(total, dtype=np.float64),
+            np.array(epsilon, dtype=np.float64),
+            np.array(sampling, dtype=np.float64),
+        )
+
+
+live_aggregator = LiveAggregator(
+    window_minutes=settings.LIVE_AGGREGATOR_WINDOW_MINUTES,
+    max_series=settings.LIVE_AGGREGATOR_MAX_SERIES,
+)
+live_aggregator_series.set_function(lambda: len(live_aggregator))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import datetime as dt
 import logging
 import os
 from typing import Annotated
@@ -13,9 +14,14 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from .config import Settings, get_settings
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from .models import async_session_factory
-from .scheduler.nightly_reduce import reduce_reports
+from .scheduler.nightly_reduce import reduce_incremental, reduce_reports
+from .scheduler.parallel_reduce import reduce_reports_parallel
+from .scheduler.report_partitions import manage_report_partitions
 from .scheduler.prophet_job import train_prophet
+from .scheduler.token_sweeper import sweep_expired_tokens
 from .models import Base, async_engine, init_db
+from .nonce_store import nonce_store
+from .shuffle_queue import ParkedReports, shuffle_queue
 from .routers import (
     admin,
     alert_webhook,
@@ -48,7 +54,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
     allow_credentials=False,
-    expose_headers=["Retry-After"],
+    expose_headers=["Retry-After", "ETag", "Last-Modified"],
 )
 
 
@@ -93,6 +99,40 @@ app.state.prometheus_counters = prometheus_counters
 app.state.prometheus_gauges = prometheus_gauges
 
 
+async def release_shuffled_batch(
+    site_id: str,
+    plan: str,
+    reports: ParkedReports,
+    server_received_at: dt.datetime,
+    accepted_at: dt.datetime,
+):
+    async with async_session_factory() as session:
+        await shuffle.write_parked_batch(
+            site_id, plan, reports, server_received_at, session, prometheus_counters, accepted_at=accepted_at
+        )
+
+
+async def run_token_sweep_once():
+    async with async_session_factory() as session:
+        deleted = await sweep_expired_tokens(session)
+    if deleted:
+        logger.info("Swept expired upload tokens", extra={"deleted": deleted})
+
+
+async def run_report_partitions_once():
+    async with async_session_factory() as session:
+        summary = await manage_report_partitions(session)
+    if summary.created or summary.dropped or summary.rows_deleted:
+        logger.info(
+            "Maintained report partitions",
+            extra={
+                "created": summary.created,
+                "dropped": summary.dropped,
+                "rows_deleted": summary.rows_deleted,
+            },
+        )
+
+
 async def run_forecast_training_once():
     metrics = ("pageviews", "sessions", "uniques", "conversions", "revenue")
     async with async_session_factory() as session:
@@ -121,6 +161,8 @@ async def on_startup():
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     await init_db()
+    await nonce_store.start(async_session_factory)
+    await shuffle_queue.start(release_shuffled_batch)
     # Enable a lightweight reducer loop in dev if requested
     if os.environ.get("ENABLE_DEV_SCHEDULER", "").lower() in {"1", "true", "yes"}:
         try:
@@ -128,9 +170,16 @@ async def on_startup():
 
             async def job():
                 async with async_session_factory() as session:
-                    await reduce_reports(session)
+                    await reduce_incremental(session)
 
             scheduler.add_job(job, "interval", seconds=60, id="dev_reducer", replace_existing=True)
+            scheduler.add_job(
+                run_token_sweep_once,
+                "interval",
+                minutes=settings.TOKEN_SWEEP_INTERVAL_MINUTES,
+                id="dev_token_sweeper",
+                replace_existing=True,
+            )
             scheduler.start()
             app.state.dev_scheduler = scheduler
             logger.info("Started dev reducer scheduler (every 60s)")
@@ -143,6 +192,17 @@ async def on_startup():
             prod_scheduler = AsyncIOScheduler(timezone="UTC")
 
             async def reduce_job():
+                if settings.REDUCER_WORKERS > 1:
+                    summary = await reduce_reports_parallel(settings.REDUCER_WORKERS)
+                    logger.info(
+                        "Parallel reduce finished",
+                        extra={
+                            "seconds": round(summary.seconds, 1),
+                            "shard_seconds": [round(shard.seconds, 1) for shard in summary.shards],
+                            "reports_scanned": summary.stats.reports_scanned,
+                        },
+                    )
+                    return
                 async with async_session_factory() as session:
                     await reduce_reports(session)
 
@@ -154,6 +214,21 @@ async def on_startup():
                 id="prod_reducer_daily",
                 replace_existing=True,
             )
+            if settings.INCREMENTAL_REDUCER_INTERVAL_SECONDS > 0:
+
+                async def incremental_reduce_job():
+                    async with async_session_factory() as session:
+                        await reduce_incremental(session)
+
+                prod_scheduler.add_job(
+                    incremental_reduce_job,
+                    "interval",
+                    seconds=settings.INCREMENTAL_REDUCER_INTERVAL_SECONDS,
+                    id="prod_reducer_incremental",
+                    max_instances=1,
+                    coalesce=True,
+                    replace_existing=True,
+                )
             prod_scheduler.add_job(
                 run_forecast_training_once,
                 "cron",
@@ -162,6 +237,22 @@ async def on_startup():
                 id="prod_forecast_daily",
                 replace_existing=True,
             )
+            prod_scheduler.add_job(
+                run_token_sweep_once,
+                "interval",
+                minutes=settings.TOKEN_SWEEP_INTERVAL_MINUTES,
+                id="prod_token_sweeper",
+                replace_existing=True,
+            )
+            # Partitions are created ahead of ingest, so this runs even without a retention.
+            prod_scheduler.add_job(
+                run_report_partitions_once,
+                "cron",
+                hour=settings.PROD_SCHEDULER_HOUR_UTC,
+                minute=30,
+                id="prod_report_partitions",
+                replace_existing=True,
+            )
             prod_scheduler.start()
             app.state.prod_scheduler = prod_scheduler
             logger.info(
@@ -174,6 +265,8 @@ async def on_startup():
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    await shuffle_queue.drain()
+    await nonce_store.stop(async_session_factory)
     scheduler = getattr(app.state, "dev_scheduler", None)
     if scheduler:
         scheduler.shutdown(wait=False)
@@ -12,11 +12,14 @@ from sqlalchemy import (
     Index,
     Integer,
     JSON,
+    SmallInteger,
     String,
     UniqueConstraint,
     text,
 )
 from sqlalchemy import Identity
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -29,13 +32,23 @@ IS_POSTGRES = async_engine.url.get_backend_name().startswith("postgresql")
 IDENTITY_ARGS = (Identity(),) if IS_POSTGRES else ()
 
 
+def dialect_insert(model):
+    """Backend-specific INSERT so callers can use ``on_conflict_do_*`` on Postgres and SQLite."""
+    if IS_POSTGRES:
+        return postgresql_insert(model)
+    return sqlite_insert(model)
+
+
 class Base(DeclarativeBase):
     pass
 
 
 class LdpReport(Base):
     __tablename__ = "ldp_reports"
-    __table_args__ = (Index("ix_ldp_reports_site_kind_day", "site_id", "kind", "day"),)
+    __table_args__ = (
+        Index("ix_ldp_reports_site_kind_day", "site_id", "kind", "day"),
+        Index("ix_ldp_reports_received", "server_received_at"),
+    )
     if IS_POSTGRES:
         __table_args__ = __table_args__ + ({"postgresql_partition_by": "RANGE (day)"},)
 
@@ -54,11 +67,20 @@ class LdpReport(Base):
     server_received_at: Mapped[dt.datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP")
     )
+    # Hot payload fields, written at ingest so the reducer never decodes ``payload``.
+    randomized_bit: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0, server_default=text("0"))
+    value: Mapped[float] = mapped_column(Float, nullable=False, default=1.0, server_default=text("1"))
+    is_historical: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=text("false"))
 
 
 class RawReport(Base):
     __tablename__ = "raw_reports"
-    __table_args__ = (Index("ix_raw_reports_site_kind_day", "site_id", "kind", "day"),)
+    __table_args__ = (
+        Index("ix_raw_reports_site_kind_day", "site_id", "kind", "day"),
+        Index("ix_raw_reports_received", "server_received_at"),
+    )
+    if IS_POSTGRES:
+        __table_args__ = __table_args__ + ({"postgresql_partition_by": "RANGE (day)"},)
 
     id: Mapped[int] = mapped_column(
         Integer,
@@ -68,20 +90,39 @@ class RawReport(Base):
     )
     site_id: Mapped[str] = mapped_column(String, nullable=False)
     kind: Mapped[str] = mapped_column(String, nullable=False)
-    day: Mapped[dt.date] = mapped_column(Date, nullable=False)
+    day: Mapped[dt.date] = mapped_column(Date, nullable=False, primary_key=IS_POSTGRES)
     payload: Mapped[dict] = mapped_column(JSON, nullable=False)
     epsilon_used: Mapped[float] = mapped_column(Float, nullable=False)
     sampling_rate: Mapped[float] = mapped_column(Float, nullable=False)
     server_received_at: Mapped[dt.datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP")
     )
+    # Hot payload fields, written at ingest so the reducer never decodes ``payload``.
+    randomized_bit: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0, server_default=text("0"))
+    value: Mapped[float] = mapped_column(Float, nullable=False, default=1.0, server_default=text("1"))
+    is_historical: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default=text("false"))
 
 
 class DpWindow(Base):
     __tablename__ = "dp_windows"
     __table_args__ = (
-        UniqueConstraint("site_id", "window_start", "metric", "plan", name="uq_window"),
+        UniqueConstraint("site_id", "window_start", "metric", "plan", "resolution_seconds", name="uq_window"),
         Index("ix_dp_windows_site_metric", "site_id", "metric", "plan"),
+        # Range reads of one series at one resolution (charts, /api/aggregate pages, Prophet
+        # training). The served columns ride along so those scans are index-only on Postgres.
+        Index(
+            "ix_dp_windows_series",
+            "site_id",
+            "metric",
+            "plan",
+            "resolution_seconds",
+            "window_start",
+            postgresql_include=[
+                "window_end", "value", "variance", "ci80_low", "ci80_high", "ci95_low", "ci95_high"
+            ],
+        ),
+        # max(published_at) per series versions the read endpoints' ETags.
+        Index("ix_dp_windows_published", "site_id", "metric", "plan", "resolution_seconds", "published_at"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -89,6 +130,10 @@ class DpWindow(Base):
     plan: Mapped[str] = mapped_column(String, nullable=False, default="free")
     window_start: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     window_end: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # Length of the tumbling window; one row per configured resolution covers the same events.
+    resolution_seconds: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=60, server_default=text("60")
+    )
     metric: Mapped[str] = mapped_column(String, nullable=False)
     value: Mapped[float] = mapped_column(Float, nullable=False)
     variance: Mapped[float] = mapped_column(Float, nullable=False)
@@ -101,6 +146,68 @@ class DpWindow(Base):
     )
 
 
+class ReportCounter(Base):
+    """Per-minute sufficient statistics of accepted reports, incremented at ingest."""
+
+    __tablename__ = "report_counters"
+    __table_args__ = (
+        UniqueConstraint(
+            "source",
+            "site_id",
+            "kind",
+            "day",
+            "window_start",
+            "epsilon_used",
+            "sampling_rate",
+            name="uq_report_counter",
+        ),
+        Index("ix_report_counters_site_day", "site_id", "day"),
+        # Minutes touched since the incremental reducer's mark.
+        Index("ix_report_counters_source_window", "source", "window_start"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # "raw" for raw_reports (Free/Standard), "ldp" for ldp_reports (Pro)
+    source: Mapped[str] = mapped_column(String, nullable=False)
+    site_id: Mapped[str] = mapped_column(String, nullable=False)
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    day: Mapped[dt.date] = mapped_column(Date, nullable=False)
+    window_start: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    epsilon_used: Mapped[float] = mapped_column(Float, nullable=False)
+    sampling_rate: Mapped[float] = mapped_column(Float, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sum_value: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    sum_randomized_bit: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    historical_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class ReducerWatermark(Base):
+    """How far the incremental reducer has consumed a report table, as (server_received_at, id)."""
+
+    __tablename__ = "reducer_watermarks"
+
+    table_name: Mapped[str] = mapped_column(String, primary_key=True)
+    received_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    updated_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP")
+    )
+
+
+class ReducerCheckpoint(Base):
+    """Resume point of an interrupted streaming reduce: the first window not yet committed."""
+
+    __tablename__ = "reducer_checkpoints"
+
+    run_key: Mapped[str] = mapped_column(String, primary_key=True)
+    site_id: Mapped[str] = mapped_column(String, nullable=False)
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    window_start: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[dt.datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=text("CURRENT_TIMESTAMP")
+    )
+
+
 class DailyUnique(Base):
     __tablename__ = "daily_uniques"
     __table_args__ = (UniqueConstraint("site_id", "day", name="uq_daily_uniques"),)
@@ -114,7 +221,11 @@ class DailyUnique(Base):
 
 class Forecast(Base):
     __tablename__ = "forecasts"
-    __table_args__ = (Index("ix_forecasts_site_metric_day", "site_id", "metric", "day", "plan"),)
+    __table_args__ = (
+        Index("ix_forecasts_site_metric_day", "site_id", "metric", "day", "plan"),
+        # max(model_id) per series versions the forecast ETag.
+        Index("ix_forecasts_site_metric_model", "site_id", "metric", "plan", "model_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     site_id: Mapped[str] = mapped_column(String, nullable=False)
@@ -134,7 +245,10 @@ class Forecast(Base):
 
 class UploadToken(Base):
     __tablename__ = "upload_tokens"
-    __table_args__ = (Index("ix_upload_tokens_site", "site_id"),)
+    __table_args__ = (
+        Index("ix_upload_tokens_site", "site_id"),
+        Index("ix_upload_tokens_exp", "exp"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     site_id: Mapped[str] = mapped_column(String, nullable=False)
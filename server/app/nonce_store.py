@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+import time
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .config import get_settings
+from .models import TokenNonce, dialect_insert
+
+settings = get_settings()
+logger = logging.getLogger("marketing-analytics.nonces")
+
+
+def _as_utc(value: dt.datetime) -> dt.datetime:
+    return value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+
+
+class NonceStore:
+    """Replay guard for shuffle nonces held in rotating time buckets.
+
+    Lookups and inserts touch only in-memory sets. Newly seen nonces are written to
+    ``token_nonce`` in batches by a background sync, which also pulls nonces recorded by
+    other workers, so replays across workers are caught within ``sync_interval_seconds``.
+    """
+
+    def __init__(
+        self,
+        *,
+        retention_seconds: int,
+        bucket_seconds: int,
+        sync_interval_seconds: float,
+        purge_interval_seconds: int,
+    ):
+        self.retention_seconds = max(1, retention_seconds)
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.sync_interval_seconds = max(0.1, sync_interval_seconds)
+        self.purge_interval_seconds = max(1, purge_interval_seconds)
+        self._buckets: dict[int, set[str]] = {}
+        self._pending: list[dict[str, Any]] = []
+        self._last_sync: dt.datetime | None = None
+        self._task: asyncio.Task | None = None
+
+    def __contains__(self, nonce: str) -> bool:
+        return any(nonce in bucket for bucket in self._buckets.values())
+
+    def check_and_add(self, site_id: str, nonce: str, now: float | None = None) -> bool:
+        """Record ``nonce`` and return True, or return False if it was already seen."""
+        now = time.time() if now is None else now
+        self._rotate(now)
+        if nonce in self:
+            return False
+        self._remember(nonce, now, now)
+        self._pending.append(
+            {
+                "site_id": site_id,
+                "jti": nonce,
+                "seen_at": dt.datetime.fromtimestamp(now, dt.timezone.utc),
+            }
+        )
+        return True
+
+    async def sync(self, session: AsyncSession) -> None:
+        """Flush pending nonces to ``token_nonce`` and load nonces other workers recorded."""
+        now = dt.datetime.now(dt.timezone.utc)
+        since = self._last_sync or now - dt.timedelta(seconds=self.retention_seconds)
+        pending, self._pending = self._pending, []
+        try:
+            if pending:
+                stmt = dialect_insert(TokenNonce).on_conflict_do_nothing(index_elements=["jti"])
+                await session.execute(stmt, pending)
+            rows = (
+                await session.execute(
+                    select(TokenNonce.jti, TokenNonce.seen_at).where(
+                        TokenNonce.seen_at >= since - dt.timedelta(seconds=2 * self.sync_interval_seconds)
+                    )
+                )
+            ).all()
+            await session.commit()
+        except Exception:
+            self._pending = pending + self._pending
+            raise
+        current = time.time()
+        for jti, seen_at in rows:
+            self._remember(jti, _as_utc(seen_at).timestamp(), current)
+        self._last_sync = now
+
+    async def purge(self, session: AsyncSession) -> None:
+        cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=self.retention_seconds)
+        await session.execute(delete(TokenNonce).where(TokenNonce.seen_at < cutoff))
+        await session.commit()
+
+    async def start(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        async with session_factory() as session:
+            await self.sync(session)
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._pending:
+            async with session_factory() as session:
+                await self.sync(session)
+
+    async def _run(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(self.sync_interval_seconds)
+            try:
+                async with session_factory() as session:
+                    await self.sync(session)
+                    if time.monotonic() - last_purge >= self.purge_interval_seconds:
+                        await self.purge(session)
+                        last_purge = time.monotonic()
+            except Exception:
+                logger.exception("Nonce store sync failed")
+
+    def _remember(self, nonce: str, seen_at: float, now: float) -> None:
+        index = int(seen_at // self.bucket_seconds)
+        if index < self._oldest_live_bucket(now):
+            return
+        self._buckets.setdefault(index, set()).add(nonce)
+
+    def _rotate(self, now: float) -> None:
+        oldest = self._oldest_live_bucket(now)
+        for index in [index for index in self._buckets if index < oldest]:
+            del self._buckets[index]
+
+    def _oldest_live_bucket(self, now: float) -> int:
+        return int((now - self.retention_seconds) // self.bucket_seconds)
+
+
+nonce_store = NonceStore(
+    retention_seconds=settings.NONCE_RETENTION_SECONDS,
+    bucket_seconds=settings.NONCE_BUCKET_SECONDS,
+    sync_interval_seconds=settings.NONCE_SYNC_SECONDS,
+    purge_interval_seconds=settings.NONCE_PURGE_INTERVAL_SECONDS,
+)
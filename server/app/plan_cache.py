@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import time
+from typing import Generic, Iterable, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import get_settings
+from .models import SiteConfig, SitePlan
+
+settings = get_settings()
+
+DEFAULT_PLAN = "free"
+_LOOKUP_CHUNK = 500
+
+V = TypeVar("V")
+
+
+class _SiteCache(Generic[V]):
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self.max_entries = max(1, max_entries)
+        self._entries: dict[str, tuple[V, float]] = {}
+
+    def invalidate(self, site_id: str) -> None:
+        self._entries.pop(site_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _store(self, site_id: str, value: V, now: float) -> None:
+        if self.ttl_seconds == 0:
+            return
+        if len(self._entries) >= self.max_entries:
+            self._entries = {key: entry for key, entry in self._entries.items() if entry[1] > now}
+            while len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        self._entries[site_id] = (value, now + self.ttl_seconds)
+
+
+class SitePlanCache(_SiteCache[str]):
+    """Short-lived cache of ``site_plan.plan`` keyed by site_id.
+
+    Sites without a ``site_plan`` row are cached as the free default too. Billing writes
+    invalidate entries explicitly; other workers pick the change up within ``ttl_seconds``.
+    """
+
+    async def get(self, session: AsyncSession, site_id: str) -> str:
+        return (await self.get_many(session, [site_id]))[site_id]
+
+    async def get_many(self, session: AsyncSession, site_ids: Iterable[str]) -> dict[str, str]:
+        now = time.monotonic()
+        plans: dict[str, str] = {}
+        missing: list[str] = []
+        for site_id in set(site_ids):
+            entry = self._entries.get(site_id)
+            if entry and entry[1] > now:
+                plans[site_id] = entry[0]
+            else:
+                missing.append(site_id)
+        loaded: dict[str, str] = {}
+        for offset in range(0, len(missing), _LOOKUP_CHUNK):
+            chunk = missing[offset : offset + _LOOKUP_CHUNK]
+            rows = (
+                await session.execute(select(SitePlan.site_id, SitePlan.plan).where(SitePlan.site_id.in_(chunk)))
+            ).all()
+            loaded.update({site_id: plan for site_id, plan in rows})
+        for site_id in missing:
+            plan = loaded.get(site_id, DEFAULT_PLAN)
+            plans[site_id] = plan
+            self._store(site_id, plan, now)
+        return plans
+
+
+class SiteQuotaCache(_SiteCache[int | None]):
+    """Short-lived cache of ``site_config.max_events_per_minute`` keyed by site_id.
+
+    Sites without a ``site_config`` row have no event quota and are cached as ``None``.
+    """
+
+    async def get(self, session: AsyncSession, site_id: str) -> int | None:
+        now = time.monotonic()
+        entry = self._entries.get(site_id)
+        if entry and entry[1] > now:
+            return entry[0]
+        quota = (
+            await session.execute(select(SiteConfig.max_events_per_minute).where(SiteConfig.site_id == site_id))
+        ).scalar_one_or_none()
+        self._store(site_id, quota, now)
+        return quota
+
+
+site_plans = SitePlanCache(
+    ttl_seconds=settings.SITE_PLAN_CACHE_TTL_SECONDS,
+    max_entries=settings.SITE_PLAN_CACHE_MAX_ENTRIES,
+)
+site_quotas = SiteQuotaCache(
+    ttl_seconds=settings.SITE_PLAN_CACHE_TTL_SECONDS,
+    max_entries=settings.SITE_PLAN_CACHE_MAX_ENTRIES,
+)
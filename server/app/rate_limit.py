@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import importlib
+import math
+import time
+from typing import Protocol
+
+from .config import get_settings
+
+settings = get_settings()
+
+
+class RateLimitBackend(Protocol):
+    async def hit(self, key: str, cost: int, limit: int, window_seconds: float) -> bool:
+        """Record ``cost`` units against ``key`` and return False if that exceeds ``limit``."""
+
+
+class LocalRateLimitBackend:
+    """In-process sliding-window counter.
+
+    Each key keeps only the current and previous fixed-window counts, so state is O(1) per
+    key. The rate is estimated as ``previous * overlap + current``. Keys idle for two full
+    windows are evicted on a periodic sweep.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        # key -> [window_index, current_count, previous_count]
+        self._state: dict[str, list[float]] = {}
+        self._last_sweep = clock()
+
+    async def hit(self, key: str, cost: int, limit: int, window_seconds: float) -> bool:
+        now = self._clock()
+        self._maybe_sweep(now, window_seconds)
+        window_index = math.floor(now / window_seconds)
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = [window_index, 0, 0]
+        elif state[0] != window_index:
+            state[2] = state[1] if state[0] == window_index - 1 else 0
+            state[1] = 0
+            state[0] = window_index
+        elapsed = (now / window_seconds) - window_index
+        estimate = state[2] * (1.0 - elapsed) + state[1]
+        if estimate + cost > limit:
+            return False
+        state[1] += cost
+        return True
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def _maybe_sweep(self, now: float, window_seconds: float) -> None:
+        if now - self._last_sweep < window_seconds:
+            return
+        self._last_sweep = now
+        stale_before = math.floor(now / window_seconds) - 1
+        for key in [key for key, state in self._state.items() if state[0] < stale_before]:
+            del self._state[key]
+
+
+def load_backend(spec: str) -> RateLimitBackend:
+    """Resolve ``RATE_LIMIT_BACKEND``: ``local`` or a ``module:factory`` path for a shared store."""
+    if spec == "local":
+        return LocalRateLimitBackend()
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"RATE_LIMIT_BACKEND must be 'local' or 'module:factory', got {spec!r}")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory()
+
+
+rate_limit_backend: RateLimitBackend = load_backend(settings.RATE_LIMIT_BACKEND)
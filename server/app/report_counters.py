@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import ReportCounter, dialect_insert
+from .scheduler.window_writer import MAX_BIND_PARAMS
+
+SOURCE_RAW = "raw"
+SOURCE_LDP = "ldp"
+
+_COUNTER_KEY = ("source", "site_id", "kind", "day", "window_start", "epsilon_used", "sampling_rate")
+_COUNTER_SUMS = ("count", "sum_value", "sum_randomized_bit", "historical_count")
+
+
+def is_historical(payload: Any) -> bool:
+    return isinstance(payload, dict) and bool(payload.get("historical_import"))
+
+
+def report_value(payload: Any) -> float:
+    """What one raw report adds to its window: 1 for live events, the row value for imports."""
+    if is_historical(payload):
+        try:
+            return max(0.0, float(payload.get("value", 0.0)))
+        except (TypeError, ValueError):
+            return 0.0
+    return 1.0
+
+
+def report_columns(payload: Any) -> dict[str, Any]:
+    """The typed report columns for ``payload``; the reducer reads these instead of the JSON."""
+    randomized_bit = payload.get("randomized_bit", 0) if isinstance(payload, dict) else 0
+    return {
+        "randomized_bit": int(randomized_bit or 0),
+        "value": report_value(payload),
+        "is_historical": is_historical(payload),
+    }
+
+
+def _as_minute(value: dt.datetime) -> dt.datetime:
+    value = value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+    return value.replace(second=0, microsecond=0)
+
+
+def counter_deltas(source: str, rows: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Fold report rows (with their ``report_columns``) into one increment per counter key.
+
+    Counters are keyed by (site, kind, day, minute, epsilon, sampling rate).
+    """
+    deltas: dict[tuple, dict[str, Any]] = {}
+    for row in rows:
+        key = (
+            source,
+            row["site_id"],
+            row["kind"],
+            row["day"],
+            _as_minute(row["server_received_at"]),
+            row["epsilon_used"],
+            row["sampling_rate"],
+        )
+        delta = deltas.get(key)
+        if delta is None:
+            delta = dict(zip(_COUNTER_KEY, key))
+            delta.update(count=0, sum_value=0.0, sum_randomized_bit=0, historical_count=0)
+            deltas[key] = delta
+        delta["count"] += 1
+        delta["sum_value"] += row["value"]
+        delta["sum_randomized_bit"] += row["randomized_bit"]
+        delta["historical_count"] += int(row["is_historical"])
+    return list(deltas.values())
+
+
+async def _upsert_counters(session: AsyncSession, counters: list[dict[str, Any]], set_) -> None:
+    # One statement per chunk keeps large batches under the driver's bind-parameter limit.
+    chunk_size = max(1, MAX_BIND_PARAMS // len(counters[0]))
+    for offset in range(0, len(counters), chunk_size):
+        stmt = dialect_insert(ReportCounter).values(counters[offset : offset + chunk_size])
+        await session.execute(stmt.on_conflict_do_update(index_elements=list(_COUNTER_KEY), set_=set_(stmt)))
+
+
+async def increment_report_counters(session: AsyncSession, source: str, rows: list[dict[str, Any]]) -> None:
+    """Add ``rows`` to their minute counters with chunked ``INSERT ... ON CONFLICT DO UPDATE``.
+
+    Runs in the caller's transaction so counters and any stored report rows commit together.
+    """
+    deltas = counter_deltas(source, rows)
+    if not deltas:
+        return
+    await _upsert_counters(
+        session,
+        deltas,
+        lambda stmt: {column: getattr(ReportCounter, column) + stmt.excluded[column] for column in _COUNTER_SUMS},
+    )
+
+
+async def replace_report_counters(session: AsyncSession, counters: list[dict[str, Any]]) -> None:
+    """Overwrite counters with totals recomputed from stored reports, inserting missing ones.
+
+    Used by the reducers to record the minutes they reduced when ingest does not keep
+    counters. Runs in the caller's transaction.
+    """
+    if not counters:
+        return
+    await _upsert_counters(session, counters, lambda stmt: {column: stmt.excluded[column] for column in _COUNTER_SUMS})
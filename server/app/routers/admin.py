@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import UploadToken, get_session
 from ..schemas import RevokeTokenRequest, RevokeTokensRequest
+from ..token_cache import verified_tokens
 
 router = APIRouter(tags=["admin"])
 
@@ -28,6 +29,7 @@ async def revoke_token(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Token not found")
     token.revoked_at = dt.datetime.now(dt.timezone.utc)
     await session.commit()
+    verified_tokens.invalidate_jti(token.jti)
     counters = request.app.state.prometheus_counters
     counters["tokens_revoked_total"].labels(site_id=token.site_id).inc()
 
@@ -45,5 +47,6 @@ async def revoke_tokens(
         .values(revoked_at=now)
     )
     await session.commit()
+    verified_tokens.invalidate_site(payload.site_id)
     counters = request.app.state.prometheus_counters
     counters["tokens_revoked_total"].labels(site_id=payload.site_id).inc()
@@ -1,40 +1,199 @@
 from __future__ import annotations
 
+import base64
+import binascii
 import datetime as dt
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import BigInteger, ColumnElement, cast, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import DpWindow, get_session
+from ..config import get_settings
+from ..live_aggregator import live_aggregator
+from ..models import IS_POSTGRES, DpWindow, get_session
 from ..dependencies import get_site_plan
+from ..http_cache import conditional_response, make_etag, windows_published_at
+from ..ldp.rr_decoder import interval_arrays
 from ..schemas import AggregateResponse, WindowAggregate
+from ..windows import finest_resolution, resolutions
 
 router = APIRouter(tags=["metrics"])
+settings = get_settings()
+
+
+def _encode_cursor(window_start: dt.datetime) -> str:
+    return base64.urlsafe_b64encode(window_start.isoformat().encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dt.datetime:
+    try:
+        value = dt.datetime.fromisoformat(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+    return value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+
+
+def _as_utc(value: dt.datetime) -> dt.datetime:
+    # SQLite hands back naive datetimes for timezone-aware columns.
+    return value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+
+
+def _window_aggregate(row: DpWindow) -> WindowAggregate:
+    return WindowAggregate(
+        window_start=row.window_start,
+        window_end=row.window_end,
+        value=row.value,
+        variance=row.variance,
+        ci80={"low": row.ci80_low, "high": row.ci80_high},
+        ci95={"low": row.ci95_low, "high": row.ci95_high},
+    )
+
+
+def _epoch_seconds(column):
+    if IS_POSTGRES:
+        return cast(func.extract("epoch", column), BigInteger)
+    return cast(func.strftime("%s", column), BigInteger)
+
+
+async def _bucket_means(
+    session: AsyncSession,
+    conditions: list[ColumnElement[bool]],
+    first_start: dt.datetime,
+    last_end: dt.datetime,
+    max_points: int,
+    resolution: int,
+) -> list[WindowAggregate]:
+    """Average consecutive windows into at most ``max_points`` equal-length time buckets.
+
+    The database groups the windows and returns one row of sums per bucket. Each point is
+    the mean of the windows in its bucket. Window noise is independent, so the mean's
+    variance is the summed variance over ``n**2`` and its intervals narrow accordingly.
+    Buckets without windows are left out.
+    """
+    origin = int(first_start.timestamp())
+    span = last_end.timestamp() - origin
+    width = max(1, int(np.ceil(span / max_points / resolution))) * resolution
+    bucket = (_epoch_seconds(DpWindow.window_start) - origin) // width
+    rows = (
+        await session.execute(
+            select(
+                func.min(DpWindow.window_start),
+                func.max(DpWindow.window_end),
+                func.sum(DpWindow.value),
+                func.sum(DpWindow.variance),
+                func.count(),
+            )
+            .where(*conditions)
+            .group_by(bucket)
+            .order_by(func.min(DpWindow.window_start))
+        )
+    ).all()
+    counts = np.array([row[4] for row in rows], dtype=np.float64)
+    value = np.array([row[2] for row in rows], dtype=np.float64) / counts
+    variance = np.array([row[3] for row in rows], dtype=np.float64) / counts**2
+    decoded = interval_arrays(value, variance)
+    return [
+        WindowAggregate(
+            window_start=_as_utc(row[0]),
+            window_end=_as_utc(row[1]),
+            value=max(0.0, float(value[index])),
+            variance=max(0.0, float(variance[index])),
+            ci80={"low": max(0.0, float(decoded.ci80_low[index])), "high": max(0.0, float(decoded.ci80_high[index]))},
+            ci95={"low": max(0.0, float(decoded.ci95_low[index])), "high": max(0.0, float(decoded.ci95_high[index]))},
+        )
+        for index, row in enumerate(rows)
+    ]
 
 
 @router.get("/aggregate", response_model=AggregateResponse)
 async def aggregate(
     site_id: str,
     metric: str,
+    request: Request,
+    response: Response,
     window: str = Query(default="standard", regex="^(live|standard)$"),
+    resolution: int | None = Query(default=None, description="Window length in seconds; defaults to the finest"),
+    start: dt.datetime | None = Query(default=None, description="Earliest window_start returned (inclusive)"),
+    end: dt.datetime | None = Query(default=None, description="Latest window_start returned (exclusive)"),
+    limit: int | None = Query(default=None, ge=1, description="Page size; defaults to AGGREGATE_PAGE_SIZE"),
+    cursor: str | None = Query(default=None, description="next_cursor of the previous page"),
+    max_points: int | None = Query(
+        default=None, ge=1, description="Downsample the whole range to at most this many bucket means"
+    ),
     plan: str = Depends(get_site_plan),
     session: AsyncSession = Depends(get_session),
 ):
-    stmt = select(DpWindow).where(DpWindow.site_id == site_id, DpWindow.metric == metric, DpWindow.plan == plan)
+    resolution = resolution or finest_resolution()
+    if resolution not in resolutions():
+        raise HTTPException(status_code=400, detail=f"Unsupported resolution; expected one of {resolutions()}")
     if window == "live":
-        cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=3)
-        stmt = stmt.where(DpWindow.window_start >= cutoff)
-    rows = (await session.execute(stmt)).scalars().all()
-    windows = [
-        WindowAggregate(
-            window_start=row.window_start,
-            window_end=row.window_end,
-            value=row.value,
-            variance=row.variance,
-            ci80={"low": row.ci80_low, "high": row.ci80_high},
-            ci95={"low": row.ci95_low, "high": row.ci95_high},
+        # The live range moves with the clock, not only when windows are published.
+        response.headers["Cache-Control"] = "no-store"
+    else:
+        published_at = await windows_published_at(session, site_id, plan, [metric], resolution)
+        not_modified = conditional_response(
+            request, response, make_etag(plan, resolution, published_at), published_at
         )
-        for row in rows
+        if not_modified is not None:
+            return not_modified
+    if window == "live" and resolution == 60 and settings.LIVE_AGGREGATOR_ENABLED and live_aggregator.serves(plan):
+        # Served from the ingest-fed counters in memory, without waiting for a reducer run.
+        live = live_aggregator.windows(site_id, plan, metric)
+        await live_aggregator.flush_epsilon(session)
+        windows = [
+            WindowAggregate(
+                window_start=row.window_start,
+                window_end=row.window_end,
+                value=row.value,
+                variance=row.variance,
+                ci80={"low": row.ci80[0], "high": row.ci80[1]},
+                ci95={"low": row.ci95[0], "high": row.ci95[1]},
+            )
+            for row in live
+        ]
+        return AggregateResponse(site_id=site_id, metric=metric, windows=windows)
+    conditions = [
+        DpWindow.site_id == site_id,
+        DpWindow.metric == metric,
+        DpWindow.plan == plan,
+        DpWindow.resolution_seconds == resolution,
     ]
-    return AggregateResponse(site_id=site_id, metric=metric, windows=windows)
+    if window == "live":
+        cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=3)
+        conditions.append(DpWindow.window_start >= cutoff)
+    if start is not None:
+        conditions.append(DpWindow.window_start >= _as_utc(start))
+    if end is not None:
+        conditions.append(DpWindow.window_start < _as_utc(end))
+    stmt = select(DpWindow).where(*conditions).order_by(DpWindow.window_start)
+
+    if max_points is not None:
+        # Downsampling covers the whole range in one response, so it is not paged. Only
+        # ranges that already fit are loaded as windows; wider ones are bucketed in SQL.
+        max_points = min(max_points, settings.AGGREGATE_MAX_PAGE_SIZE)
+        count, first_start, last_end = (
+            await session.execute(
+                select(func.count(), func.min(DpWindow.window_start), func.max(DpWindow.window_end)).where(
+                    *conditions
+                )
+            )
+        ).one()
+        if count > max_points:
+            windows = await _bucket_means(
+                session, conditions, _as_utc(first_start), _as_utc(last_end), max_points, resolution
+            )
+            return AggregateResponse(site_id=site_id, metric=metric, windows=windows)
+        rows = (await session.execute(stmt)).scalars().all()
+        return AggregateResponse(site_id=site_id, metric=metric, windows=[_window_aggregate(row) for row in rows])
+
+    page_size = min(limit or settings.AGGREGATE_PAGE_SIZE, settings.AGGREGATE_MAX_PAGE_SIZE)
+    if cursor is not None:
+        stmt = stmt.where(DpWindow.window_start > _decode_cursor(cursor))
+    rows = (await session.execute(stmt.limit(page_size + 1))).scalars().all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_cursor(_as_utc(rows[-1].window_start))
+    windows = [_window_aggregate(row) for row in rows]
+    return AggregateResponse(site_id=site_id, metric=metric, windows=windows, next_cursor=next_cursor)
@@ -3,10 +3,11 @@ from __future__ import annotations
 import datetime as dt
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..dependencies import get_site_plan
+from ..http_cache import conditional_response, make_etag
 from ..models import Forecast, ModelStore, get_session
 from ..schemas import ForecastResponse, ForecastPoint
 
@@ -14,8 +15,32 @@ router = APIRouter(tags=["forecast"])
 
 
 @router.get("/forecast/{metric}", response_model=ForecastResponse, status_code=status.HTTP_200_OK)
-async def forecast(metric: str, site_id: str, request: Request, session: AsyncSession = Depends(get_session)):
+async def forecast(
+    metric: str,
+    site_id: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+):
     plan = await get_site_plan(site_id, session)
+    # Every training run writes its rows under a new model id.
+    latest_model = select(func.max(Forecast.model_id)).where(
+        Forecast.site_id == site_id, Forecast.metric == metric, Forecast.plan == plan
+    )
+    model = (
+        await session.execute(
+            select(ModelStore.id, ModelStore.created_at).where(ModelStore.id == latest_model.scalar_subquery())
+        )
+    ).first()
+    not_modified = conditional_response(
+        request,
+        response,
+        make_etag(plan, model.id if model else None),
+        model.created_at if model else None,
+    )
+    if not_modified is not None:
+        return not_modified
+
     stmt = (
         select(Forecast)
         .where(Forecast.site_id == site_id, Forecast.metric == metric, Forecast.plan == plan)
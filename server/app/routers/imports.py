@@ -7,13 +7,17 @@ import io
 from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import RawReport, SitePlan, get_session
+from ..config import get_settings
+from ..models import RawReport, get_session
+from ..plan_cache import site_plans
+from ..report_counters import SOURCE_RAW, increment_report_counters, report_columns
 from .shuffle import decode_token, resolve_plan, validate_token
 from ..scheduler.nightly_reduce import reduce_reports
 from ..scheduler.prophet_job import train_prophet
 from ..schemas import HistoricalCsvImportRequest, HistoricalImportRequest, HistoricalImportResponse
 
 router = APIRouter(tags=["imports"])
+settings = get_settings()
 
 
 async def _authorize_import(site_id: str, import_token: str | None, session: AsyncSession) -> str:
@@ -36,20 +40,27 @@ async def _import_rows(
 
     inserted = 0
     touched_days: set[dt.date] = set()
+    report_rows = []
     for row in payload.rows:
         touched_days.add(row.day)
-        session.add(
-            RawReport(
-                site_id=payload.site_id,
-                kind=row.metric,
-                day=row.day,
-                payload={"historical_import": True, "value": row.value},
-                epsilon_used=0.0,
-                sampling_rate=1.0,
-                server_received_at=dt.datetime.combine(row.day, dt.time(12, 0), tzinfo=dt.timezone.utc),
-            )
+        report_payload = {"historical_import": True, "value": row.value}
+        report_rows.append(
+            {
+                "site_id": payload.site_id,
+                "kind": row.metric,
+                "day": row.day,
+                "payload": report_payload,
+                "epsilon_used": 0.0,
+                "sampling_rate": 1.0,
+                "server_received_at": dt.datetime.combine(row.day, dt.time(12, 0), tzinfo=dt.timezone.utc),
+                **report_columns(report_payload),
+            }
         )
         inserted += 1
+    if settings.STORE_REPORT_ROWS:
+        session.add_all(RawReport(**report_row) for report_row in report_rows)
+    if settings.REPORT_COUNTERS_ENABLED:
+        await increment_report_counters(session, SOURCE_RAW, report_rows)
     await session.commit()
 
     if touched_days:
@@ -68,8 +79,7 @@ async def import_historical(
     x_upload_token: str | None = Header(default=None, alias="X-Upload-Token"),
     session: AsyncSession = Depends(get_session),
 ):
-    plan_record = await session.get(SitePlan, payload.site_id)
-    target_plan = plan_record.plan if plan_record else "free"
+    target_plan = await site_plans.get(session, payload.site_id)
     if target_plan == "pro":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pro imports are not supported")
     await _authorize_import(payload.site_id, x_upload_token, session)
@@ -102,8 +112,7 @@ async def import_historical_csv(
             ) from exc
 
     parsed_payload = HistoricalImportRequest(site_id=payload.site_id, rows=rows)
-    plan_record = await session.get(SitePlan, payload.site_id)
-    target_plan = plan_record.plan if plan_record else "free"
+    target_plan = await site_plans.get(session, payload.site_id)
     if target_plan == "pro":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pro imports are not supported")
     await _authorize_import(payload.site_id, x_upload_token, session)
@@ -5,7 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..schemas import CollectRequest
 from ..models import get_session
-from .shuffle import ingest_reports
+from .shuffle import ingest_reports, read_batch_body, write_decoded_batch
 
 router = APIRouter(tags=["ingest"])
 
@@ -17,3 +17,9 @@ async def collect(
     session: AsyncSession = Depends(get_session),  # type: ignore
 ):
     await ingest_reports(payload, request, session)
+
+
+@router.post("/collect/batch", status_code=status.HTTP_202_ACCEPTED)
+async def collect_batch(request: Request, session: AsyncSession = Depends(get_session)):
+    batch = await read_batch_body(request)
+    await write_decoded_batch(batch, session, request.app.state.prometheus_counters)
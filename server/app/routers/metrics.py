@@ -1,58 +1,100 @@
 from __future__ import annotations
 
+import datetime as dt
 import math
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import Select, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import get_settings
 from ..dependencies import get_site_plan
+from ..http_cache import conditional_response, make_etag, windows_published_at
 from ..ldp.rr_decoder import confidence_interval, standard_error
 from ..models import DailyUnique, DpWindow, get_session
-from ..schemas import MetricsResponse, MetricStatistic
+from ..schemas import EVENT_KINDS, MetricsResponse, MetricStatistic
+from ..windows import finest_resolution
 
 router = APIRouter(tags=["metrics"])
 settings = get_settings()
 
+# A window is shown once its value clears this many standard errors.
+MIN_SNR = 1.5
+
+
+def latest_windows_stmt(
+    site_id: str,
+    plan: str,
+    metrics: list[str] | tuple[str, ...],
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+) -> Select:
+    """Newest window per metric whose value clears ``MIN_SNR``, one row per metric.
+
+    Each metric is its own ``ORDER BY window_start DESC LIMIT 1`` branch of a UNION ALL,
+    so both backends walk ``ix_dp_windows_series`` backwards from the newest window and
+    stop at the first that qualifies instead of reading the whole series. The SNR test
+    ``value / sqrt(variance) >= MIN_SNR`` is written without a square root, which SQLite
+    lacks: ``value > 0 AND value * value >= MIN_SNR**2 * variance``.
+    """
+    branches = []
+    for metric in metrics:
+        stmt = select(DpWindow).where(
+            DpWindow.site_id == site_id,
+            DpWindow.metric == metric,
+            DpWindow.plan == plan,
+            DpWindow.resolution_seconds == finest_resolution(),
+            DpWindow.value > 0,
+            DpWindow.variance > 0,
+            DpWindow.value * DpWindow.value >= MIN_SNR**2 * DpWindow.variance,
+        )
+        if start is not None:
+            stmt = stmt.where(DpWindow.window_start >= start)
+        if end is not None:
+            stmt = stmt.where(DpWindow.window_end <= end)
+        # Wrapped so each branch keeps its own ORDER BY/LIMIT inside the UNION on SQLite.
+        branches.append(select(stmt.order_by(DpWindow.window_start.desc()).limit(1).subquery()))
+    return select(DpWindow).from_statement(union_all(*branches))
+
 
 @router.get("/metrics", response_model=MetricsResponse)
 async def get_metrics(
     site_id: str,
-    start: str | None = None,
-    end: str | None = None,
+    request: Request,
+    response: Response,
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
     metrics: list[str] | None = Query(default=None),
     plan: str = Depends(get_site_plan),
     session: AsyncSession = Depends(get_session),
 ):
-    stmt = select(DpWindow).where(DpWindow.site_id == site_id, DpWindow.plan == plan)
-    if start:
-        stmt = stmt.where(DpWindow.window_start >= start)
-    if end:
-        stmt = stmt.where(DpWindow.window_end <= end)
-    if metrics:
-        stmt = stmt.where(DpWindow.metric.in_(metrics))
-    rows = (await session.execute(stmt)).scalars().all()
-
-    metric_map: dict[str, MetricStatistic] = {}
-    for row in rows:
+    requested = tuple(dict.fromkeys(metrics)) if metrics else EVENT_KINDS
+    published_at = await windows_published_at(session, site_id, plan, requested, finest_resolution())
+    not_modified = conditional_response(
+        request, response, make_etag(plan, finest_resolution(), published_at), published_at
+    )
+    if not_modified is not None:
+        return not_modified
+    rows = (await session.execute(latest_windows_stmt(site_id, plan, requested, start, end))).scalars().all()
+
+    statistics = []
+    for row in sorted(rows, key=lambda row: requested.index(row.metric)):
         se = standard_error(row.variance)
-        snr = row.value / se if se > 0 else 0
-        if snr < 1.5 or row.value <= 0:
-            continue
-        metric_map[row.metric] = MetricStatistic(
-            metric=row.metric,
-            value=row.value,
-            variance=row.variance,
-            standard_error=se,
-            snr=snr,
-            published_at=row.published_at,
-            ci80=_ci(row.value, se, 1.2816),
-            ci95=_ci(row.value, se, 1.9599),
-            has_anomaly=False,
+        statistics.append(
+            MetricStatistic(
+                metric=row.metric,
+                value=row.value,
+                variance=row.variance,
+                standard_error=se,
+                snr=row.value / se,
+                published_at=row.published_at,
+                ci80=_ci(row.value, se, 1.2816),
+                ci95=_ci(row.value, se, 1.9599),
+                has_anomaly=False,
+            )
         )
 
-    return MetricsResponse(site_id=site_id, metrics=list(metric_map.values()))
+    return MetricsResponse(site_id=site_id, metrics=statistics)
 
 
 def _ci(value: float, se: float, z: float):
@@ -1,27 +1,31 @@
 from __future__ import annotations
 
-import asyncio
 import base64
 import datetime as dt
 import hashlib
 import hmac
 import json
-import secrets
-from collections import defaultdict
 from fnmatch import fnmatch
-from typing import DefaultDict
+from typing import Any
 
 from argon2 import PasswordHasher, exceptions as argon_exceptions
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import delete, select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..batch_codec import MEDIA_TYPE as BATCH_MEDIA_TYPE, BatchDecodeError, DecodedBatch, decode_batch
 from ..config import TokenClaims, get_settings
-from ..models import LdpReport, RawReport, SitePlan, TokenNonce, UploadToken, get_session
+from ..live_aggregator import live_aggregator
+from ..models import IS_POSTGRES, LdpReport, RawReport, UploadToken, get_session
+from ..nonce_store import nonce_store
+from ..plan_cache import site_plans, site_quotas
+from ..rate_limit import rate_limit_backend
+from ..report_counters import SOURCE_LDP, SOURCE_RAW, increment_report_counters, report_columns
 from ..schemas import CollectRequest, ShuffleRequest
+from ..shuffle_queue import ParkedReports, ShuffleQueueFull, shuffle_queue
+from ..token_cache import verified_tokens
 
 router = APIRouter(tags=["ingest"])
-rate_limiter: DefaultDict[tuple[str, str], list[float]] = defaultdict(list)
 password_hasher = PasswordHasher()
 settings = get_settings()
 
@@ -42,32 +46,38 @@ def decode_token(token: str) -> TokenClaims:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from exc
 
 
+def _as_utc(value: dt.datetime) -> dt.datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns.
+    return value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+
+
 async def validate_token(claims: TokenClaims, token: str, session: AsyncSession):
     now = dt.datetime.now(dt.timezone.utc)
     if now.timestamp() > claims.exp:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
 
-    stmt = select(UploadToken).where(UploadToken.site_id == claims.site_id)
-    tokens = (await session.execute(stmt)).scalars().all()
-    if not tokens:
+    cached = verified_tokens.get(token)
+    if cached and cached.site_id == claims.site_id:
+        return
+
+    record = (
+        await session.execute(select(UploadToken).where(UploadToken.jti == claims.jti))
+    ).scalar_one_or_none()
+    if not record or record.site_id != claims.site_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token not registered")
-    verified = False
-    for record in tokens:
-        if record.revoked_at:
-            continue
-        try:
-            password_hasher.verify(record.token_hash, token)
-            verified = True
-            break
-        except argon_exceptions.VerifyMismatchError:
-            continue
-    if not verified:
+    if record.revoked_at:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    if _as_utc(record.exp) < now:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
+    try:
+        password_hasher.verify(record.token_hash, token)
+    except argon_exceptions.VerificationError as exc:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from exc
+    verified_tokens.put(token, site_id=claims.site_id, jti=claims.jti, exp=claims.exp)
 
 
 async def resolve_plan(site_id: str, claims_plan: str, session: AsyncSession) -> str:
-    record = await session.get(SitePlan, site_id)
-    db_plan = record.plan if record else "free"
+    db_plan = await site_plans.get(session, site_id)
     token_plan = claims_plan or db_plan
     if token_plan != db_plan:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token plan mismatch")
@@ -84,106 +94,273 @@ def _rate_limit_bucket_for_plan(plan: str) -> int:
     return settings.FREE_RATE_LIMIT_BUCKET_PER_MIN
 
 
-def apply_rate_limit(site_id: str, ip: str, request: Request, plan: str):
-    now = dt.datetime.now(dt.timezone.utc).timestamp()
-    key = (site_id, ip)
-    events = rate_limiter[key]
-    events.append(now)
-    one_minute = now - 60
-    rate_limiter[key] = [ts for ts in events if ts >= one_minute]
-    bucket_size = _rate_limit_bucket_for_plan(plan)
-    if len(rate_limiter[key]) > bucket_size:
+async def apply_rate_limit(
+    site_id: str,
+    ip: str,
+    request: Request,
+    plan: str,
+    events: int = 0,
+    site_quota: int | None = None,
+):
+    # The site quota goes first so a request it rejects does not count against the IP.
+    allowed = True
+    if site_quota is not None and events:
+        allowed = await rate_limit_backend.hit(f"events:{site_id}", events, site_quota, 60.0)
+    if allowed:
+        allowed = await rate_limit_backend.hit(
+            f"req:{site_id}:{ip}", 1, _rate_limit_bucket_for_plan(plan), 60.0
+        )
+    if not allowed:
         counters = request.app.state.prometheus_counters
         counters["requests_rate_limited_total"].labels(site_id=site_id, ip=ip).inc()
         raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Rate limited")
 
 
-@router.post("/shuffle", status_code=status.HTTP_202_ACCEPTED)
-async def shuffle_ingest(
-    payload: ShuffleRequest,
+async def _accept_shuffle(
+    token: str,
+    nonce: str,
+    event_count: int,
     request: Request,
-    session: AsyncSession = Depends(get_session),
-):
-    claims = decode_token(payload.token)
+    session: AsyncSession,
+) -> tuple[TokenClaims, str, bool]:
+    claims = decode_token(token)
     origin = request.headers.get("Origin")
     if origin and not fnmatch(origin, claims.allowed_origin):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Origin mismatch")
-    await validate_token(claims, payload.token, session)
+    await validate_token(claims, token, session)
     plan = await resolve_plan(claims.site_id, claims.plan, session)
-    apply_rate_limit(claims.site_id, request.client.host if request.client else "unknown", request, plan)
-
-    nonce_exists = await session.execute(
-        select(TokenNonce).where(TokenNonce.jti == payload.nonce)
+    await apply_rate_limit(
+        claims.site_id,
+        request.client.host if request.client else "unknown",
+        request,
+        plan,
+        events=event_count,
+        site_quota=await site_quotas.get(session, claims.site_id),
     )
-    if nonce_exists.scalar_one_or_none():
+
+    bypass_delay = bool(request.headers.get("X-Bypass-Delay"))
+    if not bypass_delay and shuffle_queue.full():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Shuffle queue is full")
+
+    if not nonce_store.check_and_add(claims.site_id, nonce):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Replay detected")
+    return claims, plan, bypass_delay
 
-    session.add(
-        TokenNonce(
-            site_id=claims.site_id,
-            jti=payload.nonce,
+
+async def _park(site_id: str, plan: str, reports: ParkedReports) -> None:
+    try:
+        await shuffle_queue.put(site_id, plan, reports)
+    except ShuffleQueueFull as exc:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Shuffle queue is full") from exc
+
+
+async def read_batch_body(request: Request) -> DecodedBatch:
+    content_type = request.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+    if content_type != BATCH_MEDIA_TYPE:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=f"Expected {BATCH_MEDIA_TYPE}"
         )
-    )
-    await session.commit()
+    try:
+        return decode_batch(await request.body())
+    except BatchDecodeError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
-    delay = secrets.randbelow(121)
-    if not request.headers.get("X-Bypass-Delay"):
-        await asyncio.sleep(delay)
 
-    server_received_at = dt.datetime.now(dt.timezone.utc)
-    collect_payload = CollectRequest(
-        site_id=claims.site_id,
-        server_received_at=server_received_at,
-        reports=payload.batch,
+@router.post("/shuffle", status_code=status.HTTP_202_ACCEPTED)
+async def shuffle_ingest(
+    payload: ShuffleRequest,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+):
+    claims, plan, bypass_delay = await _accept_shuffle(
+        payload.token, payload.nonce, len(payload.batch), request, session
     )
-    await ingest_reports(collect_payload, request, session, plan)
-    await purge_old_nonces(session)
+    if bypass_delay:
+        collect_payload = CollectRequest(
+            site_id=claims.site_id,
+            server_received_at=dt.datetime.now(dt.timezone.utc),
+            reports=payload.batch,
+        )
+        await ingest_reports(collect_payload, request, session, plan)
+    else:
+        await _park(claims.site_id, plan, payload.batch)
+
+
+@router.post("/shuffle/batch", status_code=status.HTTP_202_ACCEPTED)
+async def shuffle_ingest_batch(request: Request, session: AsyncSession = Depends(get_session)):
+    batch = await read_batch_body(request)
+    claims, plan, bypass_delay = await _accept_shuffle(batch.token, batch.nonce, len(batch), request, session)
+    if batch.site_id != claims.site_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token site mismatch")
+    if bypass_delay:
+        # The header time is client-supplied; stamp server time like the JSON endpoint.
+        await write_decoded_batch(
+            batch,
+            session,
+            request.app.state.prometheus_counters,
+            plan,
+            server_received_at=dt.datetime.now(dt.timezone.utc),
+        )
+    else:
+        await _park(claims.site_id, plan, batch)
 
 
 async def ingest_reports(collect: CollectRequest, request: Request, session: AsyncSession, plan: str | None = None):
-    counters = request.app.state.prometheus_counters
+    await write_reports(collect, session, request.app.state.prometheus_counters, plan)
+
+
+async def _effective_plan(session: AsyncSession, site_id: str, plan: str | None) -> str:
     effective_plan = plan
     if effective_plan is None:
-        record = await session.get(SitePlan, collect.site_id)
-        effective_plan = record.plan if record else "free"
+        effective_plan = await site_plans.get(session, site_id)
     if effective_plan == "pro" and not settings.ENABLE_PRO_INGEST:
         effective_plan = "standard"
+    return effective_plan
 
+
+async def write_reports(
+    collect: CollectRequest,
+    session: AsyncSession,
+    counters: dict[str, Any],
+    plan: str | None = None,
+    accepted_at: dt.datetime | None = None,
+):
+    """Turn JSON reports into report rows.
+
+    Late events are measured against ``accepted_at``, which defaults to the receive time.
+    """
+    effective_plan = await _effective_plan(session, collect.site_id, plan)
+    accepted_at = accepted_at or collect.server_received_at
+
+    rows: list[dict[str, Any]] = []
+    dropped_late = 0
     for report in collect.reports:
         if report.site_id != collect.site_id:
             continue
         payload_time = report.client_timestamp
-        delta = (collect.server_received_at - payload_time).total_seconds()
+        delta = (accepted_at - payload_time).total_seconds()
         if delta > settings.MAX_OUT_OF_ORDER_SECONDS:
-            counters["events_dropped_late_total"].labels(site_id=collect.site_id).inc()
+            dropped_late += 1
             continue
+        rows.append(
+            {
+                "site_id": collect.site_id,
+                "kind": report.kind,
+                "day": payload_time.date(),
+                "payload": report.payload,
+                "epsilon_used": report.epsilon_used,
+                "sampling_rate": report.sampling_rate,
+                "server_received_at": collect.server_received_at,
+                **report_columns(report.payload),
+            }
+        )
+    await _store_report_rows(session, counters, collect.site_id, effective_plan, rows, dropped_late)
 
-        if effective_plan == "pro":
-            record = LdpReport(
-                site_id=collect.site_id,
-                kind=report.kind,
-                day=payload_time.date(),
-                payload=report.payload,
-                epsilon_used=report.epsilon_used,
-                sampling_rate=report.sampling_rate,
-                server_received_at=collect.server_received_at,
-            )
-        else:
-            record = RawReport(
-                site_id=collect.site_id,
-                kind=report.kind,
-                day=payload_time.date(),
-                payload=report.payload,
-                epsilon_used=report.epsilon_used,
-                sampling_rate=report.sampling_rate,
-                server_received_at=collect.server_received_at,
+
+async def write_decoded_batch(
+    batch: DecodedBatch,
+    session: AsyncSession,
+    counters: dict[str, Any],
+    plan: str | None = None,
+    server_received_at: dt.datetime | None = None,
+    accepted_at: dt.datetime | None = None,
+):
+    """Turn a binary batch straight into report rows without per-event pydantic models.
+
+    Late events are measured against ``accepted_at``, which defaults to the receive time.
+    """
+    effective_plan = await _effective_plan(session, batch.site_id, plan)
+    received_at = server_received_at or batch.server_received_at or dt.datetime.now(dt.timezone.utc)
+    accepted_at = accepted_at or received_at
+    cutoff_ms = int(accepted_at.timestamp() * 1000) - settings.MAX_OUT_OF_ORDER_SECONDS * 1000
+
+    rows: list[dict[str, Any]] = []
+    dropped_late = 0
+    for segment in batch.segments:
+        base_ms = segment.base_timestamp_ms
+        for offset_ms, bit in zip(segment.offsets_ms, segment.bits):
+            timestamp_ms = base_ms + offset_ms
+            if timestamp_ms < cutoff_ms:
+                dropped_late += 1
+                continue
+            rows.append(
+                {
+                    "site_id": batch.site_id,
+                    "kind": segment.kind,
+                    "day": dt.datetime.fromtimestamp(timestamp_ms / 1000.0, dt.timezone.utc).date(),
+                    "payload": {"randomized_bit": bit},
+                    "epsilon_used": segment.epsilon_used,
+                    "sampling_rate": segment.sampling_rate,
+                    "server_received_at": received_at,
+                    "randomized_bit": bit,
+                    "value": 1.0,
+                    "is_historical": False,
+                }
             )
-        session.add(record)
-        counters["events_received_total"].labels(site_id=collect.site_id).inc()
-    await session.commit()
+    await _store_report_rows(session, counters, batch.site_id, effective_plan, rows, dropped_late)
 
 
-async def purge_old_nonces(session: AsyncSession):
-    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=15)
-    await session.execute(delete(TokenNonce).where(TokenNonce.seen_at < cutoff))
+async def write_parked_batch(
+    site_id: str,
+    plan: str,
+    reports: ParkedReports,
+    server_received_at: dt.datetime,
+    session: AsyncSession,
+    counters: dict[str, Any],
+    accepted_at: dt.datetime | None = None,
+):
+    if isinstance(reports, DecodedBatch):
+        await write_decoded_batch(reports, session, counters, plan, server_received_at, accepted_at)
+        return
+    collect = CollectRequest(site_id=site_id, server_received_at=server_received_at, reports=reports)
+    await write_reports(collect, session, counters, plan, accepted_at)
+
+
+async def _store_report_rows(
+    session: AsyncSession,
+    counters: dict[str, Any],
+    site_id: str,
+    plan: str,
+    rows: list[dict[str, Any]],
+    dropped_late: int,
+):
+    model = LdpReport if plan == "pro" else RawReport
+    if settings.STORE_REPORT_ROWS:
+        await bulk_insert_reports(session, model, rows)
+    if settings.REPORT_COUNTERS_ENABLED:
+        await increment_report_counters(session, SOURCE_LDP if plan == "pro" else SOURCE_RAW, rows)
     await session.commit()
+    if settings.LIVE_AGGREGATOR_ENABLED:
+        live_aggregator.record(site_id, plan, rows)
+
+    if dropped_late:
+        counters["events_dropped_late_total"].labels(site_id=site_id).inc(dropped_late)
+    if rows:
+        counters["events_received_total"].labels(site_id=site_id).inc(len(rows))
+
+
+async def bulk_insert_reports(
+    session: AsyncSession,
+    model: type[LdpReport] | type[RawReport],
+    rows: list[dict[str, Any]],
+) -> None:
+    """Write a batch of report rows with one multi-row statement.
+
+    Postgres goes through asyncpg's binary COPY on the session's own connection so the
+    rows share the caller's transaction; other backends use a Core executemany insert.
+    """
+    if not rows:
+        return
+    if IS_POSTGRES:
+        columns = list(rows[0].keys())
+        records = [
+            tuple(json.dumps(row[column]) if column == "payload" else row[column] for column in columns)
+            for row in rows
+        ]
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            model.__tablename__, records=records, columns=columns
+        )
+        return
+    await session.execute(insert(model), rows)
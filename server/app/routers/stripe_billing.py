@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import Settings, get_settings
 from ..models import SitePlan, get_session
+from ..plan_cache import site_plans
 from ..schemas import CheckoutSessionRequest, CheckoutSessionResponse
 
 router = APIRouter(tags=["billing"])
@@ -84,6 +85,7 @@ async def _upsert_site_plan(
         ).scalar_one_or_none()
 
     now = dt.datetime.now(dt.timezone.utc)
+    touched_site_id = record.site_id if record else site_id
     if record:
         if plan:
             record.plan = plan
@@ -104,6 +106,8 @@ async def _upsert_site_plan(
             )
         )
     await session.commit()
+    if touched_site_id:
+        site_plans.invalidate(touched_site_id)
 
 
 @router.post("/checkout/session", response_model=CheckoutSessionResponse, status_code=status.HTTP_200_OK)
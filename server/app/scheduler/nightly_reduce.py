@@ -1,17 +1,93 @@
 from __future__ import annotations
 
 import datetime as dt
+import zlib
 from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable
 
-from sqlalchemy import select
+import numpy as np
+from sqlalchemy import ColumnElement, case, delete, func, literal, or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import get_settings
-from ..ldp.rr_decoder import confidence_interval, rr_unbiased_estimate, standard_error
-from ..models import DpWindow, LdpReport, RawReport, SiteEpsilonLog, SitePlan
+from ..ldp.noise import reducer_noise
+from ..ldp.rr_decoder import combine_rr_groups
+from ..models import (
+    IS_POSTGRES,
+    LdpReport,
+    RawReport,
+    ReducerCheckpoint,
+    ReducerWatermark,
+    ReportCounter,
+    dialect_insert,
+)
+from ..plan_cache import site_plans
+from ..report_counters import SOURCE_LDP, SOURCE_RAW, replace_report_counters
+from ..windows import coarsest_resolution, resolutions, window_floor
+from .window_writer import WindowWriter, WriteStats
 
 settings = get_settings()
 
+REDUCER_MODES = ("python", "sql", "stream", "counters")
+_STREAM_YIELD_PER = 1000
+
+WindowKey = tuple[str, str, dt.datetime]
+
+
+@dataclass
+class _RawBucket:
+    count: int = 0
+    value: float = 0.0
+    historical: bool = False
+    # Standard-plan noise summed over the minutes folded into the window, and their number.
+    noise: float = 0.0
+    minutes: int = 0
+
+
+@dataclass
+class _RrGroup:
+    total: int = 0
+    ones: float = 0.0
+
+
+@dataclass
+class _ReportAggregates:
+    """Per-window sufficient statistics; everything the publish step needs from reports."""
+
+    # (site_id, kind, window_start) -> counts for the Free/Standard raw path
+    raw: dict[tuple[str, str, dt.datetime], _RawBucket] = field(default_factory=lambda: defaultdict(_RawBucket))
+    # (site_id, kind, window_start) -> (epsilon, sampling_rate) -> randomized-response tallies
+    pro: dict[tuple[str, str, dt.datetime], dict[tuple[float, float], _RrGroup]] = field(
+        default_factory=lambda: defaultdict(lambda: defaultdict(_RrGroup))
+    )
+    # (site_id, day) -> clamped epsilon spent by raw reports
+    epsilon: dict[tuple[str, dt.date], float] = field(default_factory=lambda: defaultdict(float))
+
+    def site_ids(self) -> set[str]:
+        return {key[0] for key in self.raw} | {key[0] for key in self.pro} | {key[0] for key in self.epsilon}
+
+
+@dataclass(frozen=True)
+class _ReportScope:
+    """Which reports a full reduce covers: a day range, optionally limited to some sites."""
+
+    start: dt.date
+    end: dt.date
+    site_ids: tuple[str, ...] | None = None
+
+    def conditions(self, model) -> list[ColumnElement[bool]]:
+        conditions = [model.day >= self.start, model.day <= self.end]
+        if self.site_ids is not None:
+            conditions.append(model.site_id.in_(self.site_ids))
+        return conditions
+
+    def run_key(self, model) -> str:
+        key = f"{model.__tablename__}:{self.start.isoformat()}:{self.end.isoformat()}"
+        if self.site_ids is not None:
+            key += f":{zlib.crc32(chr(31).join(sorted(self.site_ids)).encode('utf-8')):08x}"
+        return key
+
 
 def _laplace_scale(epsilon: float) -> float:
     return 1.0 / max(epsilon, 1e-6)
@@ -34,183 +110,776 @@ def _resolve_day_window(
     return today - dt.timedelta(days=window_days), today
 
 
-def _raw_report_value(report: RawReport) -> float:
-    payload = report.payload if isinstance(report.payload, dict) else {}
-    if payload.get("historical_import"):
-        try:
-            return max(0.0, float(payload.get("value", 0.0)))
-        except (TypeError, ValueError):
-            return 0.0
-    return 1.0
+def _report_columns(model) -> tuple:
+    """Everything the reducer reads from a report; ``payload`` is never loaded."""
+    return (
+        model.site_id,
+        model.kind,
+        model.day,
+        model.epsilon_used,
+        model.sampling_rate,
+        model.server_received_at,
+        model.randomized_bit,
+        model.value,
+        model.is_historical,
+    )
+
+
+def _clamped_epsilon(epsilon_used: float) -> float:
+    return min(settings.AGGREGATE_DP_EPSILON, max(0.0, epsilon_used))
 
 
-async def _upsert_window(
+def _as_window_start(value: dt.datetime | str) -> dt.datetime:
+    # SQLite returns naive datetimes (or strings from strftime); windows are always UTC.
+    if isinstance(value, str):
+        value = dt.datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+
+
+def _floor_minute(value: dt.datetime) -> dt.datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+async def _aggregate_in_python(session: AsyncSession, scope: _ReportScope) -> _ReportAggregates:
+    aggregates = _ReportAggregates()
+    raw_reports = await session.execute(select(*_report_columns(RawReport)).where(*scope.conditions(RawReport)))
+    for report in raw_reports:
+        window_start = _as_window_start(report.server_received_at.replace(second=0, microsecond=0))
+        bucket = aggregates.raw[(report.site_id, report.kind, window_start)]
+        bucket.count += 1
+        bucket.value += report.value
+        bucket.historical = bucket.historical or report.is_historical
+        aggregates.epsilon[(report.site_id, report.day)] += _clamped_epsilon(report.epsilon_used)
+
+    ldp_reports = await session.execute(select(*_report_columns(LdpReport)).where(*scope.conditions(LdpReport)))
+    for report in ldp_reports:
+        window_start = _as_window_start(report.server_received_at.replace(second=0, microsecond=0))
+        group = aggregates.pro[(report.site_id, report.kind, window_start)][
+            (report.epsilon_used, report.sampling_rate)
+        ]
+        group.total += 1
+        group.ones += report.randomized_bit
+    return aggregates
+
+
+def _minute_bucket(column):
+    if IS_POSTGRES:
+        return func.date_trunc("minute", column)
+    return func.strftime("%Y-%m-%d %H:%M:00", column)
+
+
+async def _collect_counters(
     session: AsyncSession,
+    aggregates: _ReportAggregates,
+    conditions: list[ColumnElement[bool]],
     *,
-    site_id: str,
+    epsilon: bool = True,
+) -> None:
+    """Add the minute statistics held in ``report_counters`` matching ``conditions``."""
+    counters = (await session.execute(select(ReportCounter).where(*conditions))).scalars()
+    for counter in counters:
+        key = (counter.site_id, counter.kind, _as_window_start(counter.window_start))
+        if counter.source == SOURCE_RAW:
+            bucket = aggregates.raw[key]
+            bucket.count += counter.count
+            bucket.value += counter.sum_value
+            bucket.historical = bucket.historical or counter.historical_count > 0
+            if epsilon:
+                aggregates.epsilon[(counter.site_id, counter.day)] += (
+                    _clamped_epsilon(counter.epsilon_used) * counter.count
+                )
+        elif counter.source == SOURCE_LDP:
+            group = aggregates.pro[key][(counter.epsilon_used, counter.sampling_rate)]
+            group.total += counter.count
+            group.ones += counter.sum_randomized_bit
+
+
+async def _aggregate_from_counters(session: AsyncSession, scope: _ReportScope) -> _ReportAggregates:
+    """Build the window statistics from ``report_counters`` instead of individual reports.
+
+    Counters are kept at ingest while ``REPORT_COUNTERS_ENABLED`` is on; otherwise the
+    incremental reducer records them for the minutes it reduces. Minutes covered by
+    neither are not counted.
+    """
+    aggregates = _ReportAggregates()
+    await _collect_counters(session, aggregates, scope.conditions(ReportCounter))
+    return aggregates
+
+
+def _clamped_epsilon_expr(column=RawReport.epsilon_used):
+    return case(
+        (column < 0, literal(0.0)),
+        (column > settings.AGGREGATE_DP_EPSILON, literal(settings.AGGREGATE_DP_EPSILON)),
+        else_=column,
+    )
+
+
+async def _collect_counter_epsilon(
+    session: AsyncSession,
+    aggregates: _ReportAggregates,
+    conditions: list[ColumnElement[bool]],
+) -> None:
+    """Daily epsilon totals from the raw-report counters matching ``conditions``."""
+    rows = await session.execute(
+        select(
+            ReportCounter.site_id,
+            ReportCounter.day,
+            func.sum(_clamped_epsilon_expr(ReportCounter.epsilon_used) * ReportCounter.count),
+        )
+        .where(ReportCounter.source == SOURCE_RAW, *conditions)
+        .group_by(ReportCounter.site_id, ReportCounter.day)
+    )
+    for site_id, day, epsilon_total in rows:
+        aggregates.epsilon[(site_id, day)] = float(epsilon_total or 0.0)
+
+
+async def _record_minute_counters(
+    session: AsyncSession,
+    model,
+    source: str,
+    conditions: list[ColumnElement[bool]],
+) -> None:
+    """Recompute the ``report_counters`` of every minute of ``model`` reports matching ``conditions``."""
+    minute = _minute_bucket(model.server_received_at)
+    rows = await session.execute(
+        select(
+            model.site_id,
+            model.kind,
+            model.day,
+            minute,
+            model.epsilon_used,
+            model.sampling_rate,
+            func.count(),
+            func.sum(model.value),
+            func.sum(model.randomized_bit),
+            func.sum(case((model.is_historical, 1), else_=0)),
+        )
+        .where(*conditions)
+        .group_by(model.site_id, model.kind, model.day, minute, model.epsilon_used, model.sampling_rate)
+    )
+    await replace_report_counters(
+        session,
+        [
+            {
+                "source": source,
+                "site_id": site_id,
+                "kind": kind,
+                "day": day,
+                "window_start": _as_window_start(window_start),
+                "epsilon_used": epsilon,
+                "sampling_rate": sampling,
+                "count": int(count),
+                "sum_value": float(value or 0.0),
+                "sum_randomized_bit": int(ones or 0),
+                "historical_count": int(historical or 0),
+            }
+            for site_id, kind, day, window_start, epsilon, sampling, count, value, ones, historical in rows
+        ],
+    )
+
+
+async def _collect_raw_windows(
+    session: AsyncSession,
+    aggregates: _ReportAggregates,
+    conditions: list[ColumnElement[bool]],
+) -> None:
+    """Add the minute buckets of raw reports matching ``conditions``."""
+    raw_window = _minute_bucket(RawReport.server_received_at)
+    rows = await session.execute(
+        select(
+            RawReport.site_id,
+            RawReport.kind,
+            raw_window,
+            func.count(),
+            func.sum(RawReport.value),
+            func.max(case((RawReport.is_historical, 1), else_=0)),
+        )
+        .where(*conditions)
+        .group_by(RawReport.site_id, RawReport.kind, raw_window)
+    )
+    for site_id, kind, window_start, count, value, has_historical in rows:
+        aggregates.raw[(site_id, kind, _as_window_start(window_start))] = _RawBucket(
+            count=int(count), value=float(value or 0.0), historical=bool(has_historical)
+        )
+
+
+async def _collect_pro_windows(
+    session: AsyncSession,
+    aggregates: _ReportAggregates,
+    conditions: list[ColumnElement[bool]],
+) -> None:
+    """Add the minute randomized-response tallies of LDP reports matching ``conditions``."""
+    ldp_window = _minute_bucket(LdpReport.server_received_at)
+    rows = await session.execute(
+        select(
+            LdpReport.site_id,
+            LdpReport.kind,
+            ldp_window,
+            LdpReport.epsilon_used,
+            LdpReport.sampling_rate,
+            func.count(),
+            func.sum(LdpReport.randomized_bit),
+        )
+        .where(*conditions)
+        .group_by(LdpReport.site_id, LdpReport.kind, ldp_window, LdpReport.epsilon_used, LdpReport.sampling_rate)
+    )
+    for site_id, kind, window_start, epsilon, sampling, count, ones in rows:
+        aggregates.pro[(site_id, kind, _as_window_start(window_start))][(epsilon, sampling)] = _RrGroup(
+            total=int(count), ones=float(ones or 0)
+        )
+
+
+async def _collect_epsilon(
+    session: AsyncSession,
+    aggregates: _ReportAggregates,
+    conditions: list[ColumnElement[bool]],
+) -> None:
+    rows = await session.execute(
+        select(RawReport.site_id, RawReport.day, func.sum(_clamped_epsilon_expr()))
+        .where(*conditions)
+        .group_by(RawReport.site_id, RawReport.day)
+    )
+    for site_id, day, epsilon_total in rows:
+        aggregates.epsilon[(site_id, day)] = float(epsilon_total or 0.0)
+
+
+async def _aggregate_in_sql(session: AsyncSession, scope: _ReportScope) -> _ReportAggregates:
+    """Same statistics as ``_aggregate_in_python`` with the bucketing done by the database."""
+    aggregates = _ReportAggregates()
+    await _collect_raw_windows(session, aggregates, scope.conditions(RawReport))
+    await _collect_epsilon(session, aggregates, scope.conditions(RawReport))
+    await _collect_pro_windows(session, aggregates, scope.conditions(LdpReport))
+    return aggregates
+
+
+def _assign_minute_noise(minute_windows: list[tuple[WindowKey, _RawBucket]]) -> None:
+    """Draw the Standard-plan Laplace noise of every minute window in one vectorized call.
+
+    Noise is keyed by (site, metric, minute), so reruns and parallel shards reproduce it.
+    """
+    if not minute_windows:
+        return
+    noise = reducer_noise().draw(
+        [f"{site_id}\x1f{metric}" for (site_id, metric, _), _ in minute_windows],
+        np.fromiter(
+            (int(minute_start.timestamp()) for (_, _, minute_start), _ in minute_windows),
+            dtype=np.int64,
+            count=len(minute_windows),
+        ),
+        _laplace_scale(settings.AGGREGATE_DP_EPSILON),
+    )
+    for (_, bucket), value in zip(minute_windows, noise.tolist()):
+        bucket.noise = value
+
+
+def _publish_raw_window(
+    writer: WindowWriter,
     plan: str,
+    site_id: str,
     metric: str,
     window_start: dt.datetime,
-    window_end: dt.datetime,
-    value: float,
-    variance: float,
+    resolution_seconds: int,
+    bucket: _RawBucket,
 ) -> None:
-    se = standard_error(variance)
-    ci80 = confidence_interval(value, se, 1.2816)
-    ci95 = confidence_interval(value, se, 1.9599)
-    existing = (
-        await session.execute(
-            select(DpWindow).where(
-                DpWindow.site_id == site_id,
-                DpWindow.plan == plan,
-                DpWindow.metric == metric,
-                DpWindow.window_start == window_start,
-            )
-        )
-    ).scalar_one_or_none()
-    if existing:
-        existing.window_end = window_end
-        existing.value = max(0.0, value)
-        existing.variance = max(0.0, variance)
-        existing.ci80_low = max(0.0, ci80[0])
-        existing.ci80_high = max(0.0, ci80[1])
-        existing.ci95_low = max(0.0, ci95[0])
-        existing.ci95_high = max(0.0, ci95[1])
+    """Free + Standard raw path for one window."""
+    if plan == "pro":
+        return
+    if not bucket.historical and bucket.count < settings.MIN_REPORTS_PER_WINDOW:
         return
+    base_value = bucket.value
+    if base_value <= 0:
+        return
+    if plan == "standard":
+        # Noise is drawn per minute; a coarser window is the sum of its noisy minutes, so
+        # its Laplace variance is the per-minute variance times the minutes it spans.
+        value = max(0.0, base_value + bucket.noise)
+        variance = bucket.minutes * _laplace_scale(settings.AGGREGATE_DP_EPSILON) ** 2
+    else:
+        value = base_value
+        variance = max(1.0, base_value)
+
+    writer.add_window(
+        site_id=site_id,
+        plan=plan,
+        metric=metric,
+        window_start=window_start,
+        resolution_seconds=resolution_seconds,
+        value=value,
+        variance=variance,
+    )
+
+
+def _publish_pro_windows(
+    writer: WindowWriter,
+    plan_map: dict[str, str],
+    windows: list[tuple[int, tuple[str, str, dt.datetime], dict[tuple[float, float], _RrGroup]]],
+) -> None:
+    """Pro LDP path, decoding all windows and their parameter groups in one vectorized pass.
 
-    session.add(
-        DpWindow(
+    ``windows`` holds ``(resolution_seconds, key, groups)``; a coarser window carries the
+    tallies of all its minutes, which decode to the sum of the minute estimates.
+    """
+    keys = []
+    window_index, ones, total, epsilon, sampling = [], [], [], [], []
+    for resolution, key, groups in windows:
+        if plan_map.get(key[0], "free") != "pro":
+            continue
+        if sum(group.total for group in groups.values()) < settings.MIN_REPORTS_PER_WINDOW:
+            continue
+        for (group_epsilon, group_sampling), group in groups.items():
+            window_index.append(len(keys))
+            ones.append(group.ones)
+            total.append(group.total)
+            epsilon.append(group_epsilon)
+            sampling.append(group_sampling)
+        keys.append((resolution, key))
+    if not keys:
+        return
+    estimate, variance = combine_rr_groups(
+        np.array(window_index, dtype=np.intp),
+        len(keys),
+        np.array(ones, dtype=np.float64),
+        np.array(total, dtype=np.float64),
+        np.array(epsilon, dtype=np.float64),
+        np.array(sampling, dtype=np.float64),
+    )
+    se = np.sqrt(variance)
+    keep = se != 0
+    keep[keep] = estimate[keep] / se[keep] >= 1.5
+    for index in np.flatnonzero(keep).tolist():
+        resolution, (site_id, metric, window_start) = keys[index]
+        writer.add_window(
             site_id=site_id,
-            plan=plan,
-            window_start=window_start,
-            window_end=window_end,
+            plan="pro",
             metric=metric,
-            value=max(0.0, value),
-            variance=max(0.0, variance),
-            ci80_low=max(0.0, ci80[0]),
-            ci80_high=max(0.0, ci80[1]),
-            ci95_low=max(0.0, ci95[0]),
-            ci95_high=max(0.0, ci95[1]),
+            window_start=window_start,
+            resolution_seconds=resolution,
+            value=float(estimate[index]),
+            variance=float(variance[index]),
         )
-    )
 
 
-async def reduce_reports(
+class _WindowRollup:
+    """Folds minute windows into tumbling windows at every configured resolution.
+
+    Minute windows must arrive ordered by ``(site_id, kind, minute)``. One window per
+    resolution is open at a time and is emitted as soon as a minute past its end, or of
+    another site or metric, arrives, so every resolution comes out of a single pass.
+    """
+
+    def __init__(self, resolutions: list[int], emit):
+        self.resolutions = resolutions
+        self._emit = emit
+        self._open: dict[int, tuple[WindowKey, object]] = {}
+
+    def add(self, site_id: str, kind: str, minute_start: dt.datetime, minute_window) -> None:
+        for resolution in self.resolutions:
+            key = (site_id, kind, window_floor(minute_start, resolution))
+            current = self._open.get(resolution)
+            if current is None or current[0] != key:
+                if current is not None:
+                    self._emit(resolution, *current)
+                current = (key, self._new_window())
+                self._open[resolution] = current
+            self._fold(current[1], site_id, kind, minute_start, minute_window)
+
+    def close(self) -> None:
+        for resolution, (key, window) in sorted(self._open.items()):
+            self._emit(resolution, key, window)
+        self._open.clear()
+
+    def _new_window(self):
+        raise NotImplementedError
+
+    def _fold(self, window, site_id: str, kind: str, minute_start: dt.datetime, minute_window) -> None:
+        raise NotImplementedError
+
+
+class _RawRollup(_WindowRollup):
+    def _new_window(self) -> _RawBucket:
+        return _RawBucket()
+
+    def _fold(self, window: _RawBucket, site_id, kind, minute_start, minute_window: _RawBucket) -> None:
+        window.count += minute_window.count
+        window.value += minute_window.value
+        window.historical = window.historical or minute_window.historical
+        window.noise += minute_window.noise
+        window.minutes += 1
+
+
+class _ProRollup(_WindowRollup):
+    def _new_window(self) -> dict[tuple[float, float], _RrGroup]:
+        return defaultdict(_RrGroup)
+
+    def _fold(self, window, site_id, kind, minute_start, minute_window) -> None:
+        for params, group in minute_window.items():
+            window[params].total += group.total
+            window[params].ones += group.ones
+
+
+class _WindowPublisher:
+    """Routes rolled-up windows to the plan-specific publish paths.
+
+    With ``only`` set, windows are published only if ``(resolution, key)`` is in it.
+    """
+
+    def __init__(
+        self,
+        writer: WindowWriter,
+        plan_map: dict[str, str],
+        only: set[tuple[int, WindowKey]] | None = None,
+    ):
+        self.writer = writer
+        self.plan_map = plan_map
+        self.only = only
+        self.raw = _RawRollup(resolutions(), self._raw_window)
+        self.pro = _ProRollup(resolutions(), self._pro_window)
+        self._pending_pro: list = []
+
+    def finish(self) -> None:
+        """Emit every open window and decode the Pro windows collected so far."""
+        self.raw.close()
+        self.pro.close()
+        _publish_pro_windows(self.writer, self.plan_map, self._pending_pro)
+        self._pending_pro = []
+
+    def _wanted(self, resolution: int, key: WindowKey) -> bool:
+        return self.only is None or (resolution, key) in self.only
+
+    def _raw_window(self, resolution: int, key: WindowKey, bucket: _RawBucket) -> None:
+        if self._wanted(resolution, key):
+            site_id, metric, window_start = key
+            _publish_raw_window(
+                self.writer, self.plan_map.get(site_id, "free"), site_id, metric, window_start, resolution, bucket
+            )
+
+    def _pro_window(self, resolution: int, key: WindowKey, groups) -> None:
+        if self._wanted(resolution, key):
+            self._pending_pro.append((resolution, key, groups))
+
+
+async def _publish(
     session: AsyncSession,
-    days: int = 1,
-    start_day: dt.date | None = None,
-    end_day: dt.date | None = None,
-):
-    start, end = _resolve_day_window(days=days, start_day=start_day, end_day=end_day)
+    aggregates: _ReportAggregates,
+    only: set[tuple[int, WindowKey]] | None = None,
+) -> WriteStats:
+    plan_map = await site_plans.get_many(session, aggregates.site_ids())
+    writer = WindowWriter(session)
 
-    plan_map = {
-        rec.site_id: rec.plan
-        for rec in (await session.execute(select(SitePlan))).scalars().all()
-    }
+    publisher = _WindowPublisher(writer, plan_map, only)
+    raw_minutes = sorted(aggregates.raw.items())
+    _assign_minute_noise(raw_minutes)
+    for (site_id, metric, minute_start), bucket in raw_minutes:
+        publisher.raw.add(site_id, metric, minute_start, bucket)
+    for (site_id, metric, minute_start), groups in sorted(aggregates.pro.items()):
+        publisher.pro.add(site_id, metric, minute_start, groups)
+    publisher.finish()
+
+    for (site_id, day), epsilon_total in aggregates.epsilon.items():
+        if plan_map.get(site_id, "free") != "standard":
+            continue
+        writer.add_epsilon(site_id=site_id, day=day, plan="standard", epsilon_total=epsilon_total)
+
+    stats = await writer.flush()
+    stats.reports_scanned = sum(bucket.count for bucket in aggregates.raw.values()) + sum(
+        group.total for groups in aggregates.pro.values() for group in groups.values()
+    )
+    await session.commit()
+    return stats
 
-    # Free + Standard raw path
-    raw_reports = (
-        await session.execute(select(RawReport).where(RawReport.day >= start, RawReport.day <= end))
+
+async def _stream_table(session: AsyncSession, model, scope: _ReportScope) -> WriteStats:
+    """Reduce the ``model`` reports in ``scope`` window by window over a server-side cursor.
+
+    Reports arrive ordered by ``(site_id, kind, server_received_at)``, so a minute window is
+    complete as soon as the key changes. It is then noised and published at once, and
+    added to the running sums of the open window at each coarser resolution, which is
+    published when a minute past its end (or of another series) arrives. Only those open
+    windows are held, besides the published rows batched for the writer.
+
+    After roughly ``REDUCER_STREAM_CHUNK_ROWS`` reports, at the next boundary of the
+    coarsest resolution, the cursor is closed and the published windows are committed
+    together with a checkpoint; a new cursor resumes from that window. An interrupted run
+    picks up from its last checkpoint.
+    """
+    run_key = scope.run_key(model)
+    checkpoint = await session.get(ReducerCheckpoint, run_key)
+    resume = (
+        (checkpoint.site_id, checkpoint.kind, _as_window_start(checkpoint.window_start)) if checkpoint else None
+    )
+    site_ids = (
+        await session.execute(select(model.site_id).where(*scope.conditions(model)).distinct())
     ).scalars().all()
-    raw_buckets: dict[tuple[str, str, dt.datetime], list[RawReport]] = defaultdict(list)
-    epsilon_totals: dict[tuple[str, dt.date], float] = defaultdict(float)
+    plan_map = await site_plans.get_many(session, site_ids)
+    chunk_rows = max(1, settings.REDUCER_STREAM_CHUNK_ROWS)
+    coarsest = coarsest_resolution()
+    noise = reducer_noise()
+    scale = _laplace_scale(settings.AGGREGATE_DP_EPSILON)
+    writer = WindowWriter(session)
+    stats = WriteStats()
 
-    for report in raw_reports:
-        plan = plan_map.get(report.site_id, "free")
-        if plan == "pro":
-            continue
-        window_start = report.server_received_at.replace(second=0, microsecond=0)
-        raw_buckets[(report.site_id, report.kind, window_start)].append(report)
-        if plan == "standard":
-            epsilon_totals[(report.site_id, report.day)] += min(
-                settings.AGGREGATE_DP_EPSILON, max(0.0, report.epsilon_used)
-            )
+    def coarse_key(key: tuple[str, str, dt.datetime]) -> tuple[str, str, dt.datetime]:
+        return key[0], key[1], window_floor(key[2], coarsest)
+
+    while True:
+        publisher = _WindowPublisher(writer, plan_map)
+        rollup = publisher.raw if model is RawReport else publisher.pro
+
+        def close_minute(key: WindowKey, window) -> None:
+            if model is RawReport:
+                # Same keyed draw as ``_assign_minute_noise``, one window at a time.
+                window.noise = noise.draw_one(f"{key[0]}\x1f{key[1]}", int(key[2].timestamp()), scale)
+            rollup.add(*key, window)
 
-    for (site_id, metric, window_start), items in raw_buckets.items():
-        historical_bucket = any(
-            isinstance(item.payload, dict) and bool(item.payload.get("historical_import")) for item in items
+        stmt = (
+            select(*_report_columns(model))
+            .where(*scope.conditions(model))
+            .order_by(model.site_id, model.kind, model.server_received_at, model.id)
+            .execution_options(yield_per=_STREAM_YIELD_PER)
         )
-        if not historical_bucket and len(items) < settings.MIN_REPORTS_PER_WINDOW:
-            continue
-        plan = plan_map.get(site_id, "free")
-        window_end = window_start + dt.timedelta(minutes=3 if metric == "uniques" else 15)
-        base_value = sum(_raw_report_value(item) for item in items)
-        if base_value <= 0:
-            continue
-        if plan == "standard":
-            noise = 0.0
-            # deterministic-ish pseudonoise from timestamp/site to keep tests stable-ish
-            seed = abs(hash((site_id, metric, window_start.isoformat()))) % 1000
-            centered = (seed / 1000.0) - 0.5
-            noise = centered * 2.0 * _laplace_scale(settings.AGGREGATE_DP_EPSILON)
-            value = max(0.0, base_value + noise)
-            variance = _laplace_scale(settings.AGGREGATE_DP_EPSILON) ** 2
+        if resume is not None:
+            stmt = stmt.where(tuple_(model.site_id, model.kind, model.server_received_at) >= resume)
+        result = await session.stream(stmt)
+        current_key = window = None
+        rows_read = 0
+        resume = None
+        async for report in result:
+            key = (report.site_id, report.kind, _as_window_start(_floor_minute(report.server_received_at)))
+            if key != current_key:
+                if current_key is not None:
+                    close_minute(current_key, window)
+                    if rows_read >= chunk_rows and coarse_key(key) != coarse_key(current_key):
+                        resume = coarse_key(key)
+                        break
+                current_key = key
+                window = _RawBucket() if model is RawReport else defaultdict(_RrGroup)
+            rows_read += 1
+            if model is RawReport:
+                window.count += 1
+                window.value += report.value
+                window.historical = window.historical or report.is_historical
+            else:
+                group = window[(report.epsilon_used, report.sampling_rate)]
+                group.total += 1
+                group.ones += report.randomized_bit
         else:
-            value = base_value
-            variance = max(1.0, base_value)
+            if current_key is not None:
+                close_minute(current_key, window)
+        await result.close()
 
-        await _upsert_window(
-            session,
-            site_id=site_id,
-            plan=plan,
-            metric=metric,
-            window_start=window_start,
-            window_end=window_end,
-            value=value,
-            variance=variance,
+        publisher.finish()
+        stats += await writer.flush()
+        stats.reports_scanned += rows_read
+        if resume is None:
+            await session.execute(delete(ReducerCheckpoint).where(ReducerCheckpoint.run_key == run_key))
+            await session.commit()
+            return stats
+        stmt = dialect_insert(ReducerCheckpoint).values(
+            run_key=run_key, site_id=resume[0], kind=resume[1], window_start=resume[2]
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["run_key"],
+                set_={
+                    "site_id": stmt.excluded.site_id,
+                    "kind": stmt.excluded.kind,
+                    "window_start": stmt.excluded.window_start,
+                    "updated_at": func.current_timestamp(),
+                },
+            )
         )
+        await session.commit()
 
-    # Pro LDP path
-    ldp_reports = (
-        await session.execute(select(LdpReport).where(LdpReport.day >= start, LdpReport.day <= end))
-    ).scalars().all()
-    pro_buckets: dict[tuple[str, str, dt.datetime], list[LdpReport]] = defaultdict(list)
-    for report in ldp_reports:
-        plan = plan_map.get(report.site_id, "free")
-        if plan != "pro":
-            continue
-        window_start = report.server_received_at.replace(second=0, microsecond=0)
-        pro_buckets[(report.site_id, report.kind, window_start)].append(report)
 
-    for (site_id, metric, window_start), items in pro_buckets.items():
-        if len(items) < settings.MIN_REPORTS_PER_WINDOW:
-            continue
-        ones = sum(item.payload.get("randomized_bit", 0) for item in items)
-        total = len(items)
-        epsilon = items[0].epsilon_used
-        sampling = items[0].sampling_rate
-        estimate, variance = rr_unbiased_estimate(ones, total, epsilon, sampling)
-        se = standard_error(variance)
-        if se == 0:
-            continue
-        snr = estimate / se
-        if snr < 1.5:
-            continue
-        window_end = window_start + dt.timedelta(minutes=3 if metric == "uniques" else 15)
-        await _upsert_window(
-            session,
-            site_id=site_id,
-            plan="pro",
-            metric=metric,
-            window_start=window_start,
-            window_end=window_end,
-            value=estimate,
-            variance=variance,
-        )
+async def _reduce_streaming(session: AsyncSession, scope: _ReportScope) -> WriteStats:
+    stats = WriteStats()
+    for model in (RawReport, LdpReport):
+        stats += await _stream_table(session, model, scope)
+    # Epsilon totals are one row per (site, day); the database sums them without streaming.
+    aggregates = _ReportAggregates()
+    await _collect_epsilon(session, aggregates, scope.conditions(RawReport))
+    stats += await _publish(session, aggregates)
+    return stats
 
-    for (site_id, day), epsilon_total in epsilon_totals.items():
-        existing_eps = (
+
+async def _incremental_scan(
+    session: AsyncSession,
+    model,
+    source: str,
+    mark: ReducerWatermark | None,
+    cutoff: dt.datetime,
+    aggregates: _ReportAggregates,
+    touched_windows: set[tuple[int, WindowKey]],
+) -> dict:
+    """Re-aggregate the windows of ``model`` that gained reports since ``mark``; return the next mark.
+
+    Only the touched minutes are read from reports, and their statistics are recorded in
+    ``report_counters``; with ``REPORT_COUNTERS_ENABLED`` ingest keeps those counters and
+    reports are not read at all. The windows of every resolution containing a touched
+    minute are added to ``touched_windows`` and rebuilt in ``aggregates`` from the minute
+    counters, so a run reads the new reports once rather than every report of the day.
+    """
+    if mark is None:
+        # First run: treat yesterday and today as unreduced, like a default full reduce.
+        since = dt.datetime.combine(cutoff.date() - dt.timedelta(days=1), dt.time.min, tzinfo=dt.timezone.utc)
+        last_id = 0
+    else:
+        since, last_id = _as_window_start(mark.received_at), mark.last_id
+    # Reports can be stamped up to MAX_OUT_OF_ORDER_SECONDS behind the mark (shuffle releases,
+    # slow transactions); their id is still past ``last_id``, so rescan that margin by id.
+    margin = dt.timedelta(seconds=settings.MAX_OUT_OF_ORDER_SECONDS)
+    lookback = _floor_minute(since - margin)
+    # Late reports are dropped at ingest, so ``day`` cannot precede the scan by more than
+    # the same margin; this keeps partition pruning on the report tables.
+    if settings.REPORT_COUNTERS_ENABLED:
+        # Counters are updated in place, so every minute inside the margin counts as touched.
+        next_last_id = last_id
+        touched_rows = (
             await session.execute(
-                select(SiteEpsilonLog).where(
-                    SiteEpsilonLog.site_id == site_id,
-                    SiteEpsilonLog.day == day,
-                    SiteEpsilonLog.plan == "standard",
+                select(ReportCounter.site_id, ReportCounter.kind, ReportCounter.window_start, ReportCounter.day)
+                .where(
+                    ReportCounter.source == source,
+                    ReportCounter.window_start >= lookback,
+                    ReportCounter.window_start < cutoff,
+                    ReportCounter.day >= (lookback - margin).date(),
                 )
+                .distinct()
             )
-        ).scalar_one_or_none()
-        if existing_eps:
-            existing_eps.epsilon_total = epsilon_total
-        else:
-            session.add(SiteEpsilonLog(site_id=site_id, day=day, plan="standard", epsilon_total=epsilon_total))
+        ).all()
+    else:
+        next_last_id = max(last_id, (await session.execute(select(func.max(model.id)))).scalar() or 0)
+        received = model.server_received_at
+        touched_rows = (
+            await session.execute(
+                select(model.site_id, model.kind, _minute_bucket(received), model.day)
+                .where(
+                    received >= lookback,
+                    received < cutoff,
+                    model.day >= (lookback - margin).date(),
+                    or_(received >= since, model.id > last_id),
+                )
+                .distinct()
+            )
+        ).all()
+    next_mark = {"table_name": model.__tablename__, "received_at": max(since, cutoff), "last_id": next_last_id}
+    if not touched_rows:
+        return next_mark
 
-    await session.commit()
+    touched_minutes = {
+        (site_id, kind, _as_window_start(minute_start)) for site_id, kind, minute_start, _ in touched_rows
+    }
+    series = sorted({(site_id, kind) for site_id, kind, _ in touched_minutes})
+    first_minute = min(minute_start for _, _, minute_start in touched_minutes)
+    if not settings.REPORT_COUNTERS_ENABLED:
+        received = model.server_received_at
+        await _record_minute_counters(
+            session,
+            model,
+            source,
+            [
+                received >= first_minute,
+                received < cutoff,
+                model.day >= (first_minute - margin).date(),
+                tuple_(model.site_id, model.kind).in_(series),
+            ],
+        )
+
+    for site_id, kind, minute_start in touched_minutes:
+        for resolution in resolutions():
+            touched_windows.add((resolution, (site_id, kind, window_floor(minute_start, resolution))))
+    # Coarse windows are summed from the counters of all their minutes.
+    rebuild_from = window_floor(first_minute, coarsest_resolution())
+    await _collect_counters(
+        session,
+        aggregates,
+        [
+            ReportCounter.source == source,
+            ReportCounter.window_start >= rebuild_from,
+            ReportCounter.window_start < cutoff,
+            ReportCounter.day >= (rebuild_from - margin).date(),
+            tuple_(ReportCounter.site_id, ReportCounter.kind).in_(series),
+        ],
+        epsilon=False,
+    )
+    if source == SOURCE_RAW:
+        # Daily epsilon totals are recomputed in full so they stay exact alongside full reduces.
+        touched_days = sorted({(site_id, day) for site_id, _, _, day in touched_rows})
+        await _collect_counter_epsilon(
+            session, aggregates, [tuple_(ReportCounter.site_id, ReportCounter.day).in_(touched_days)]
+        )
+    return next_mark
+
+
+async def reduce_reports(
+    session: AsyncSession,
+    days: int = 1,
+    start_day: dt.date | None = None,
+    end_day: dt.date | None = None,
+    mode: str | None = None,
+    site_ids: Iterable[str] | None = None,
+) -> WriteStats:
+    """Rebuild every window and epsilon total for the day range, optionally for ``site_ids`` only.
+
+    Without ``REPORT_COUNTERS_ENABLED`` the minute counters of the range are recomputed
+    from the reports first, so ``reduce_incremental`` rebuilds coarse windows that also
+    hold reports reduced here, such as a historical import.
+    """
+    start, end = _resolve_day_window(days=days, start_day=start_day, end_day=end_day)
+    scope = _ReportScope(start, end, tuple(site_ids) if site_ids is not None else None)
+    mode = mode or settings.REDUCER_MODE
+    if mode != "counters" and not settings.STORE_REPORT_ROWS:
+        raise ValueError(f"Reducer mode {mode!r} reads report rows, which STORE_REPORT_ROWS=false does not keep")
+    if mode in REDUCER_MODES and mode != "counters" and not settings.REPORT_COUNTERS_ENABLED:
+        for model, source in ((RawReport, SOURCE_RAW), (LdpReport, SOURCE_LDP)):
+            await _record_minute_counters(session, model, source, scope.conditions(model))
+    if mode == "sql":
+        aggregates = await _aggregate_in_sql(session, scope)
+    elif mode == "python":
+        aggregates = await _aggregate_in_python(session, scope)
+    elif mode == "stream":
+        return await _reduce_streaming(session, scope)
+    elif mode == "counters":
+        aggregates = await _aggregate_from_counters(session, scope)
+    else:
+        raise ValueError(f"Unknown reducer mode {mode!r}; expected one of {', '.join(REDUCER_MODES)}")
+    return await _publish(session, aggregates)
+
+
+async def reduce_incremental(session: AsyncSession, now: dt.datetime | None = None) -> WriteStats:
+    """Reduce only the windows that received reports since the last run.
+
+    Each report table keeps a ``(server_received_at, id)`` high-water mark in
+    ``reducer_watermarks``. A run consumes reports stamped before ``now -
+    LIVE_WATERMARK_SECONDS`` (rounded down to the minute), so a window is published once
+    it is final, and re-aggregates every window, at every resolution, that gained a
+    report past the mark; coarse windows still open at the cutoff are republished as
+    they fill. Windows are rebuilt from the per-minute ``report_counters`` of all their
+    minutes, which ``reduce_reports`` also keeps current, so rerunning or mixing the two
+    is safe, and only the touched minutes are ever read from reports.
+    """
+    now = now or dt.datetime.now(dt.timezone.utc)
+    cutoff = _floor_minute(now - dt.timedelta(seconds=settings.LIVE_WATERMARK_SECONDS))
+    marks = {
+        mark.table_name: mark for mark in (await session.execute(select(ReducerWatermark))).scalars().all()
+    }
+    aggregates = _ReportAggregates()
+    touched_windows: set[tuple[int, WindowKey]] = set()
+    next_marks = [
+        await _incremental_scan(
+            session, model, source, marks.get(model.__tablename__), cutoff, aggregates, touched_windows
+        )
+        for model, source in ((RawReport, SOURCE_RAW), (LdpReport, SOURCE_LDP))
+    ]
+    stmt = dialect_insert(ReducerWatermark).values(next_marks)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["table_name"],
+            set_={
+                "received_at": stmt.excluded.received_at,
+                "last_id": stmt.excluded.last_id,
+                "updated_at": func.current_timestamp(),
+            },
+        )
+    )
+    # _publish commits the windows and the advanced marks together.
+    return await _publish(session, aggregates, only=touched_windows)
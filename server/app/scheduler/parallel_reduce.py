@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import multiprocessing
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ..config import get_settings
+from ..models import LdpReport, RawReport
+from .nightly_reduce import _resolve_day_window, reduce_reports
+from .window_writer import WriteStats
+
+settings = get_settings()
+
+
+def shard_of(site_id: str, shards: int) -> int:
+    """Stable shard for ``site_id``; unlike ``hash()`` it does not change between processes."""
+    return zlib.crc32(site_id.encode("utf-8")) % max(1, shards)
+
+
+@dataclass
+class ShardResult:
+    shard: int
+    sites: int
+    stats: WriteStats
+    seconds: float
+
+
+@dataclass
+class ReduceSummary:
+    stats: WriteStats = field(default_factory=WriteStats)
+    shards: list[ShardResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+async def _sites_in_range(session: AsyncSession, start: dt.date, end: dt.date) -> list[str]:
+    query = union(
+        select(RawReport.site_id).where(RawReport.day >= start, RawReport.day <= end),
+        select(LdpReport.site_id).where(LdpReport.day >= start, LdpReport.day <= end),
+    )
+    return list((await session.execute(query)).scalars().all())
+
+
+async def reduce_shard(
+    session: AsyncSession,
+    shard: int,
+    shards: int,
+    start: dt.date,
+    end: dt.date,
+    mode: str | None = None,
+) -> ShardResult:
+    """Reduce the sites of one shard; the reduce for all shards equals one ``reduce_reports``."""
+    started = time.perf_counter()
+    site_ids = [site_id for site_id in await _sites_in_range(session, start, end) if shard_of(site_id, shards) == shard]
+    stats = WriteStats()
+    if site_ids:
+        stats = await reduce_reports(session, start_day=start, end_day=end, mode=mode, site_ids=site_ids)
+    return ShardResult(shard=shard, sites=len(site_ids), stats=stats, seconds=time.perf_counter() - started)
+
+
+async def _reduce_shard_with_own_engine(
+    shard: int, shards: int, start: dt.date, end: dt.date, mode: str | None
+) -> ShardResult:
+    engine = create_async_engine(settings.DATABASE_URL, future=True)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            return await reduce_shard(session, shard, shards, start, end, mode)
+    finally:
+        await engine.dispose()
+
+
+def _shard_worker(shard: int, shards: int, start: dt.date, end: dt.date, mode: str | None) -> ShardResult:
+    return asyncio.run(_reduce_shard_with_own_engine(shard, shards, start, end, mode))
+
+
+async def reduce_reports_parallel(
+    workers: int,
+    days: int = 1,
+    start_day: dt.date | None = None,
+    end_day: dt.date | None = None,
+    mode: str | None = None,
+) -> ReduceSummary:
+    """Run ``reduce_reports`` split into ``workers`` site shards, one worker process per shard.
+
+    Workers are spawned rather than forked so none inherits the parent's engine or event
+    loop; each opens its own engine and session. Sites never span shards, so per-site
+    epsilon totals and windows are written by exactly one worker.
+    """
+    shards = max(1, workers)
+    start, end = _resolve_day_window(days=days, start_day=start_day, end_day=end_day)
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = await asyncio.gather(
+            *(loop.run_in_executor(pool, _shard_worker, shard, shards, start, end, mode) for shard in range(shards))
+        )
+    summary = ReduceSummary(shards=sorted(results, key=lambda result: result.shard))
+    for result in summary.shards:
+        summary.stats += result.stats
+    summary.seconds = time.perf_counter() - started
+    return summary
@@ -4,7 +4,6 @@ import datetime as dt
 import json
 import tempfile
 from pathlib import Path
-from typing import Iterable
 
 from prophet import Prophet
 from prophet.diagnostics import cross_validation, performance_metrics
@@ -13,26 +12,30 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import get_settings
 from ..models import DpWindow, Forecast, ModelStore, SitePlan
+from ..windows import daily_resolution
 
 settings = get_settings()
 
 
 async def train_prophet(session: AsyncSession, site_id: str, metric: str, plan: str = "free"):
     stmt = (
-        select(DpWindow)
-        .where(DpWindow.site_id == site_id, DpWindow.metric == metric, DpWindow.plan == plan)
+        select(DpWindow.window_start, DpWindow.value)
+        .where(
+            DpWindow.site_id == site_id,
+            DpWindow.metric == metric,
+            DpWindow.plan == plan,
+            DpWindow.resolution_seconds == daily_resolution(),
+        )
         .order_by(DpWindow.window_start.asc())
     )
-    rows = (await session.execute(stmt)).scalars().all()
+    rows = (await session.execute(stmt)).all()
+    # Daily windows are rolled up by the reducer, one row per day with its full-day total.
     if len(rows) < 60:
         return None
 
-    data = []
-    for row in rows:
-        data.append({"ds": row.window_start.date(), "y": row.value})
-    df = _distinct_by_day(data)
-    if len(df) < 60:
-        return None
+    import pandas as pd
+
+    df = pd.DataFrame([{"ds": window_start.date(), "y": value} for window_start, value in rows])
 
     model = Prophet(interval_width=0.8)
     model.fit(df)
@@ -101,14 +104,3 @@ async def train_prophet(session: AsyncSession, site_id: str, metric: str, plan:
         session.merge(forecast)
     await session.commit()
     return forecasts
-
-
-def _distinct_by_day(rows: Iterable[dict]):
-
-    seen = {}
-    for row in rows:
-        seen[row["ds"]] = row
-    import pandas as pd
-
-    data = list(seen.values())
-    return pd.DataFrame(data)
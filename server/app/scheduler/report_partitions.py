@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import re
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models import IS_POSTGRES
+from .report_retention import REPORT_TABLE_PLANS, purge_expired_reports, retention_cutoff
+
+settings = get_settings()
+logger = logging.getLogger("marketing-analytics.partitions")
+
+PARTITION_INTERVALS = {"day": 1, "week": 7}
+_RANGE_BOUND = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+@dataclass
+class PartitionSummary:
+    created: list[str] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
+    rows_deleted: int = 0
+
+
+@dataclass
+class _Partitions:
+    default: str | None = None
+    # partition name -> [start, end) day range
+    ranges: dict[str, tuple[dt.date, dt.date]] = field(default_factory=dict)
+
+
+def _interval_days() -> int:
+    try:
+        return PARTITION_INTERVALS[settings.REPORT_PARTITION_INTERVAL]
+    except KeyError:
+        raise ValueError(
+            f"Unknown REPORT_PARTITION_INTERVAL {settings.REPORT_PARTITION_INTERVAL!r}; "
+            f"expected one of {', '.join(PARTITION_INTERVALS)}"
+        ) from None
+
+
+def partition_start(day: dt.date, interval_days: int) -> dt.date:
+    """First day of the partition holding ``day``; weekly partitions start on Monday."""
+    return day - dt.timedelta(days=day.weekday()) if interval_days == 7 else day
+
+
+def partition_name(table_name: str, start: dt.date) -> str:
+    return f"{table_name}_p{start:%Y%m%d}"
+
+
+async def _partitions(session: AsyncSession, table_name: str) -> _Partitions:
+    rows = await session.execute(
+        text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table_name"
+        ),
+        {"table_name": table_name},
+    )
+    partitions = _Partitions()
+    for name, bound in rows:
+        if bound == "DEFAULT":
+            partitions.default = name
+            continue
+        match = _RANGE_BOUND.search(bound or "")
+        if match:
+            partitions.ranges[name] = (dt.date.fromisoformat(match[1]), dt.date.fromisoformat(match[2]))
+    return partitions
+
+
+async def _ensure_partitions(
+    session: AsyncSession,
+    table_name: str,
+    today: dt.date,
+    summary: PartitionSummary,
+) -> None:
+    """Create the default partition and the partitions for the next ``REPORT_PARTITIONS_AHEAD`` intervals."""
+    partitions = await _partitions(session, table_name)
+    if partitions.default is None:
+        partitions.default = f"{table_name}_default"
+        await session.execute(text(f"CREATE TABLE {partitions.default} PARTITION OF {table_name} DEFAULT"))
+        await session.commit()
+        summary.created.append(partitions.default)
+
+    interval_days = _interval_days()
+    first = partition_start(today, interval_days)
+    for index in range(max(0, settings.REPORT_PARTITIONS_AHEAD) + 1):
+        start = first + dt.timedelta(days=index * interval_days)
+        end = start + dt.timedelta(days=interval_days)
+        if any(low < end and start < high for low, high in partitions.ranges.values()):
+            continue
+        # Postgres refuses a new range while the default partition holds rows in it. The
+        # default only catches days no partition covered, so this probe stays small.
+        stray = await session.execute(
+            text(f"SELECT 1 FROM {partitions.default} WHERE day >= :start AND day < :end LIMIT 1"),
+            {"start": start, "end": end},
+        )
+        if stray.first() is not None:
+            logger.warning(
+                "Default partition holds rows for a new range; leaving them there",
+                extra={"table": table_name, "start": start.isoformat()},
+            )
+            continue
+        name = partition_name(table_name, start)
+        await session.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF {table_name} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+        await session.commit()
+        partitions.ranges[name] = (start, end)
+        summary.created.append(name)
+
+
+async def _drop_expired_partitions(
+    session: AsyncSession,
+    table_name: str,
+    plans: tuple[str, ...],
+    today: dt.date,
+    summary: PartitionSummary,
+) -> None:
+    """Detach and drop partitions whose every day is past the retention of every plan in them."""
+    cutoffs = [retention_cutoff(plan, today) for plan in plans]
+    if not cutoffs or any(cutoff is None for cutoff in cutoffs):
+        return
+    cutoff = min(cutoffs)
+    partitions = await _partitions(session, table_name)
+    for name, (_, end) in sorted(partitions.ranges.items(), key=lambda item: item[1]):
+        if end > cutoff:
+            continue
+        await session.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {name}"))
+        await session.execute(text(f"DROP TABLE {name}"))
+        await session.commit()
+        summary.dropped.append(name)
+
+
+async def manage_report_partitions(session: AsyncSession, today: dt.date | None = None) -> PartitionSummary:
+    """Keep ``raw_reports``/``ldp_reports`` partitioned ahead of ingest and within retention.
+
+    On Postgres this pre-creates daily or weekly partitions (``REPORT_PARTITION_INTERVAL``)
+    for the next ``REPORT_PARTITIONS_AHEAD`` intervals, makes sure each table has a default
+    partition, and drops partitions past the longest retention of the plans stored in the
+    table. Whatever is left past its plan's retention is then removed with batched deletes,
+    which is all that runs on SQLite.
+    """
+    today = today or dt.datetime.now(dt.timezone.utc).date()
+    summary = PartitionSummary()
+    if IS_POSTGRES:
+        for model, plans in REPORT_TABLE_PLANS:
+            await _ensure_partitions(session, model.__tablename__, today, summary)
+            await _drop_expired_partitions(session, model.__tablename__, plans, today, summary)
+    summary.rows_deleted = await purge_expired_reports(session, today=today)
+    return summary
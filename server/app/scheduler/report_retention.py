@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import ColumnElement, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models import LdpReport, RawReport, SitePlan
+
+settings = get_settings()
+
+# Which plans write to each report table; the first one is the default for unknown sites.
+REPORT_TABLE_PLANS = ((RawReport, ("free", "standard")), (LdpReport, ("pro",)))
+
+
+def retention_days_for(plan: str) -> int:
+    """Days of report rows kept for ``plan``; 0 keeps everything."""
+    return settings.REPORT_RETENTION_DAYS_BY_PLAN.get(plan, settings.REPORT_RETENTION_DAYS)
+
+
+def retention_cutoff(plan: str, today: dt.date | None = None) -> dt.date | None:
+    """First ``day`` still retained for ``plan``, or ``None`` when the plan keeps everything."""
+    retention = retention_days_for(plan)
+    if retention <= 0:
+        return None
+    today = today or dt.datetime.now(dt.timezone.utc).date()
+    return today - dt.timedelta(days=retention)
+
+
+def _plan_condition(model, plan: str, plans: tuple[str, ...]) -> ColumnElement[bool] | None:
+    if len(plans) == 1:
+        return None
+    others = [other for other in plans if other != plan]
+    if plan == plans[0]:
+        return model.site_id.not_in(select(SitePlan.site_id).where(SitePlan.plan.in_(others)))
+    return model.site_id.in_(select(SitePlan.site_id).where(SitePlan.plan == plan))
+
+
+async def _delete_in_batches(
+    session: AsyncSession,
+    model,
+    conditions: list[ColumnElement[bool]],
+    batch_size: int,
+) -> int:
+    deleted = 0
+    while True:
+        ids = (
+            await session.execute(select(model.id).where(*conditions).order_by(model.id).limit(batch_size))
+        ).scalars().all()
+        if not ids:
+            break
+        await session.execute(delete(model).where(*conditions, model.id.in_(ids)))
+        await session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+async def purge_expired_reports(
+    session: AsyncSession,
+    retention_days: int | None = None,
+    batch_size: int | None = None,
+    today: dt.date | None = None,
+) -> int:
+    """Delete stored reports whose ``day`` is past their plan's retention.
+
+    Retention comes from ``REPORT_RETENTION_DAYS_BY_PLAN``, falling back to
+    ``REPORT_RETENTION_DAYS``; ``retention_days`` overrides both for every plan. Deletes
+    run in id-ordered batches with a commit per batch. On Postgres whole expired
+    partitions are dropped first (see ``report_partitions``), so this only clears what
+    remains in default partitions and plans with a shorter retention. Returns rows deleted.
+    """
+    batch_size = max(1, batch_size or settings.REPORT_RETENTION_BATCH_SIZE)
+    today = today or dt.datetime.now(dt.timezone.utc).date()
+
+    deleted = 0
+    for model, plans in REPORT_TABLE_PLANS:
+        if retention_days is not None:
+            if retention_days > 0:
+                cutoff = today - dt.timedelta(days=retention_days)
+                deleted += await _delete_in_batches(session, model, [model.day < cutoff], batch_size)
+            continue
+        for plan in plans:
+            cutoff = retention_cutoff(plan, today)
+            if cutoff is None:
+                continue
+            conditions = [model.day < cutoff]
+            plan_condition = _plan_condition(model, plan, plans)
+            if plan_condition is not None:
+                conditions.append(plan_condition)
+            deleted += await _delete_in_batches(session, model, conditions, batch_size)
+    return deleted
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import get_settings
+from ..models import UploadToken
+
+settings = get_settings()
+
+
+async def sweep_expired_tokens(
+    session: AsyncSession,
+    batch_size: int | None = None,
+    grace_seconds: int | None = None,
+) -> int:
+    """Delete upload tokens whose ``exp`` passed more than ``grace_seconds`` ago.
+
+    Rows are removed in id-ordered batches with a commit per batch so the sweep never
+    holds a long lock on ``upload_tokens``. Returns the number of rows deleted.
+    """
+    batch_size = max(1, batch_size or settings.TOKEN_SWEEP_BATCH_SIZE)
+    grace = settings.TOKEN_SWEEP_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    cutoff = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=max(0, grace))
+
+    deleted = 0
+    while True:
+        ids = (
+            await session.execute(
+                select(UploadToken.id)
+                .where(UploadToken.exp < cutoff)
+                .order_by(UploadToken.id)
+                .limit(batch_size)
+            )
+        ).scalars().all()
+        if not ids:
+            break
+        await session.execute(delete(UploadToken).where(UploadToken.id.in_(ids)))
+        await session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    return deleted
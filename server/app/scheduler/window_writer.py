@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import datetime as dt
+import sqlite3
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import numpy as np
+
+from ..ldp.rr_decoder import interval_arrays
+from ..models import IS_POSTGRES, DpWindow, SiteEpsilonLog, dialect_insert
+
+# Bound parameters per statement: Postgres/asyncpg allow 32767, SQLite >= 3.32 allows 32766.
+MAX_BIND_PARAMS = 32000 if IS_POSTGRES or sqlite3.sqlite_version_info >= (3, 32) else 999
+
+_WINDOW_KEY = ("site_id", "window_start", "metric", "plan", "resolution_seconds")
+_EPSILON_KEY = ("site_id", "day", "plan")
+
+
+@dataclass
+class WriteStats:
+    windows_inserted: int = 0
+    windows_updated: int = 0
+    epsilon_inserted: int = 0
+    epsilon_updated: int = 0
+    reports_scanned: int = 0
+
+    def __iadd__(self, other: WriteStats) -> WriteStats:
+        self.windows_inserted += other.windows_inserted
+        self.windows_updated += other.windows_updated
+        self.epsilon_inserted += other.epsilon_inserted
+        self.epsilon_updated += other.epsilon_updated
+        self.reports_scanned += other.reports_scanned
+        return self
+
+
+class WindowWriter:
+    """Collects reduced windows and epsilon totals and writes them with chunked UPSERTs.
+
+    Rows are keyed by their unique constraint, so adding the same window twice keeps the
+    last value. ``flush`` issues one existence probe and one ``INSERT ... ON CONFLICT DO
+    UPDATE`` per chunk, sized to stay under the backend's bind-parameter limit.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._windows: dict[tuple, dict[str, Any]] = {}
+        self._epsilon: dict[tuple, dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._windows) + len(self._epsilon)
+
+    def add_window(
+        self,
+        *,
+        site_id: str,
+        plan: str,
+        metric: str,
+        window_start: dt.datetime,
+        resolution_seconds: int,
+        value: float,
+        variance: float,
+    ) -> None:
+        # Intervals are filled in for all windows at once by ``flush``.
+        row = {
+            "site_id": site_id,
+            "plan": plan,
+            "metric": metric,
+            "window_start": window_start,
+            "window_end": window_start + dt.timedelta(seconds=resolution_seconds),
+            "resolution_seconds": resolution_seconds,
+            "value": value,
+            "variance": variance,
+        }
+        self._windows[tuple(row[column] for column in _WINDOW_KEY)] = row
+
+    def add_epsilon(self, *, site_id: str, day: dt.date, plan: str, epsilon_total: float) -> None:
+        row = {"site_id": site_id, "day": day, "plan": plan, "epsilon_total": epsilon_total}
+        self._epsilon[tuple(row[column] for column in _EPSILON_KEY)] = row
+
+    async def flush(self) -> WriteStats:
+        stats = WriteStats()
+        windows = list(self._windows.values())
+        if windows:
+            decoded = interval_arrays(
+                np.fromiter((row["value"] for row in windows), dtype=np.float64, count=len(windows)),
+                np.fromiter((row["variance"] for row in windows), dtype=np.float64, count=len(windows)),
+            )
+            columns = {
+                "value": np.maximum(decoded.estimate, 0.0),
+                "variance": np.maximum(decoded.variance, 0.0),
+                "ci80_low": np.maximum(decoded.ci80_low, 0.0),
+                "ci80_high": np.maximum(decoded.ci80_high, 0.0),
+                "ci95_low": np.maximum(decoded.ci95_low, 0.0),
+                "ci95_high": np.maximum(decoded.ci95_high, 0.0),
+            }
+            lists = {name: values.tolist() for name, values in columns.items()}
+            # The read endpoints' ETags are versioned by max(published_at). CURRENT_TIMESTAMP
+            # is the transaction start on Postgres and whole seconds on SQLite, so two flushes
+            # could share a version; stamp the statement time with sub-second precision.
+            published_at = func.clock_timestamp() if IS_POSTGRES else dt.datetime.now(dt.timezone.utc)
+            for index, row in enumerate(windows):
+                for name, values in lists.items():
+                    row[name] = values[index]
+                row["published_at"] = published_at
+        inserted, updated = await self._upsert(DpWindow, _WINDOW_KEY, windows)
+        stats.windows_inserted, stats.windows_updated = inserted, updated
+        inserted, updated = await self._upsert(SiteEpsilonLog, _EPSILON_KEY, list(self._epsilon.values()))
+        stats.epsilon_inserted, stats.epsilon_updated = inserted, updated
+        self._windows.clear()
+        self._epsilon.clear()
+        return stats
+
+    async def _upsert(
+        self,
+        model,
+        key_columns: tuple[str, ...],
+        rows: list[dict[str, Any]],
+    ) -> tuple[int, int]:
+        if not rows:
+            return 0, 0
+        columns = list(rows[0].keys())
+        chunk_size = max(1, MAX_BIND_PARAMS // len(columns))
+        key = tuple_(*(getattr(model, column) for column in key_columns))
+        inserted = updated = 0
+        for offset in range(0, len(rows), chunk_size):
+            chunk = rows[offset : offset + chunk_size]
+            existing = (
+                await self.session.execute(
+                    select(func.count()).where(key.in_([tuple(row[c] for c in key_columns) for row in chunk]))
+                )
+            ).scalar_one()
+            stmt = dialect_insert(model).values(chunk)
+            set_ = {column: stmt.excluded[column] for column in columns if column not in key_columns}
+            await self.session.execute(stmt.on_conflict_do_update(index_elements=list(key_columns), set_=set_))
+            updated += existing
+            inserted += len(chunk) - existing
+        return inserted, updated
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import datetime as dt
-from typing import Any, Literal
+from typing import Any, Literal, get_args
 
 from pydantic import BaseModel, Field, validator
 
+EventKind = Literal["uniques", "pageviews", "sessions", "conversions", "revenue"]
+# The binary batch format encodes a kind as its index here, so only ever append.
+EVENT_KINDS: tuple[str, ...] = get_args(EventKind)
 
 class UploadTokenRequest(BaseModel):
     site_id: str
@@ -48,7 +51,7 @@ class CheckoutSessionResponse(BaseModel):
 
 class PrivatizedEvent(BaseModel):
     site_id: str
-    kind: Literal["uniques", "pageviews", "sessions", "conversions", "revenue"]
+    kind: EventKind
     payload: dict[str, Any]
     epsilon_used: float
     sampling_rate: float
@@ -69,7 +72,7 @@ class CollectRequest(BaseModel):
 
 class HistoricalImportRow(BaseModel):
     day: dt.date
-    metric: Literal["uniques", "pageviews", "sessions", "conversions", "revenue"]
+    metric: EventKind
     value: float = Field(ge=0)
 
 
@@ -124,6 +127,8 @@ class AggregateResponse(BaseModel):
     site_id: str
     metric: str
     windows: list[WindowAggregate]
+    # Opaque cursor for the next page; None on the last page and for downsampled ranges.
+    next_cursor: str | None = None
 
 
 class ForecastPoint(BaseModel):
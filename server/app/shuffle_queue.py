@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import datetime as dt
+import heapq
+import itertools
+import json
+import logging
+import secrets
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from prometheus_client import Counter, Gauge
+
+from .config import get_settings
+from .batch_codec import DecodedBatch, decode_batch, encode_batch
+from .schemas import PrivatizedEvent
+
+settings = get_settings()
+logger = logging.getLogger("marketing-analytics.shuffle")
+
+shuffle_queue_depth = Gauge("shuffle_queue_depth", "Batches parked in the shuffle delay queue")
+shuffle_queue_oldest_age_seconds = Gauge(
+    "shuffle_queue_oldest_age_seconds", "Age of the oldest batch parked in the shuffle delay queue"
+)
+
+shuffle_events_dropped_total = Counter(
+    "shuffle_events_dropped_total", "Events the shuffle queue lost before writing them", ["reason"]
+)
+
+ParkedReports = list[PrivatizedEvent] | DecodedBatch
+# (site_id, plan, reports, server_received_at, accepted_at): late events are dropped against
+# accepted_at, while server_received_at is the stamp the reducer reads.
+ReleaseCallback = Callable[[str, str, ParkedReports, dt.datetime, dt.datetime], Awaitable[None]]
+_rng = secrets.SystemRandom()
+
+
+class ShuffleQueueFull(Exception):
+    pass
+
+
+@dataclass(order=True)
+class _ParkedBatch:
+    release_at: float
+    seq: int
+    site_id: str = field(compare=False)
+    plan: str = field(compare=False)
+    reports: ParkedReports = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    spool_path: Path | None = field(compare=False, default=None)
+    restored: bool = field(compare=False, default=False)
+
+
+class ShuffleQueue:
+    """Delay queue that mixes accepted batches before they are written.
+
+    Each batch is parked until a random release time within ``max_delay_seconds``. Writer
+    tasks pop every due batch, shuffle them and hand them to the release callback, so the
+    order and timing of writes is decoupled from the order of requests. With ``spool_dir``
+    set, parked batches are mirrored to disk and reloaded on the next start.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_delay_seconds: int,
+        max_batches: int,
+        writer_tasks: int,
+        spool_dir: str | None = None,
+    ):
+        self.max_delay_seconds = max(0, max_delay_seconds)
+        self.max_batches = max(1, max_batches)
+        self.writer_tasks = max(1, writer_tasks)
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self._heap: list[_ParkedBatch] = []
+        self._seq = itertools.count()
+        self._cond: asyncio.Condition | None = None
+        self._writers: list[asyncio.Task] = []
+        self._release: ReleaseCallback | None = None
+        self._draining = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._writers) and not self._draining
+
+    def full(self) -> bool:
+        return len(self._heap) >= self.max_batches
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    async def start(self, release: ReleaseCallback) -> None:
+        self._release = release
+        self._cond = asyncio.Condition()
+        self._draining = False
+        if self.spool_dir:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self._load_spool()
+        self._writers = [asyncio.create_task(self._writer()) for _ in range(self.writer_tasks)]
+
+    async def put(self, site_id: str, plan: str, reports: ParkedReports) -> None:
+        if not self.running or self._cond is None:
+            raise RuntimeError("Shuffle queue is not running")
+        if self.full():
+            raise ShuffleQueueFull()
+        now = time.time()
+        batch = _ParkedBatch(
+            release_at=now + secrets.randbelow(self.max_delay_seconds + 1),
+            seq=next(self._seq),
+            site_id=site_id,
+            plan=plan,
+            reports=reports,
+            enqueued_at=now,
+        )
+        if self.spool_dir:
+            batch.spool_path = self._spool(batch)
+        async with self._cond:
+            heapq.heappush(self._heap, batch)
+            self._cond.notify()
+
+    async def drain(self) -> None:
+        """Stop accepting batches, release everything still parked and wait for the writers."""
+        if self._cond is None:
+            return
+        async with self._cond:
+            self._draining = True
+            self._cond.notify_all()
+        if self._writers:
+            await asyncio.gather(*self._writers, return_exceptions=True)
+        self._writers = []
+
+    async def _writer(self) -> None:
+        while True:
+            due = await self._take_due()
+            if due is None:
+                return
+            for batch in due:
+                await self._write(batch)
+
+    async def _take_due(self) -> list[_ParkedBatch] | None:
+        assert self._cond is not None
+        async with self._cond:
+            while True:
+                timeout = None
+                if self._heap:
+                    now = time.time()
+                    due: list[_ParkedBatch] = []
+                    while self._heap and (self._draining or self._heap[0].release_at <= now):
+                        due.append(heapq.heappop(self._heap))
+                    if due:
+                        _rng.shuffle(due)
+                        return due
+                    timeout = self._heap[0].release_at - now
+                elif self._draining:
+                    return None
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _write(self, batch: _ParkedBatch) -> None:
+        assert self._release is not None
+        now = time.time()
+        accepted_at = dt.datetime.fromtimestamp(min(batch.release_at, now), dt.timezone.utc)
+        # A batch restored from the spool keeps its old release time for the late-event check,
+        # but that time can sit further behind the reducer watermark than MAX_OUT_OF_ORDER;
+        # stamp the rows when they are written so the incremental reducer still picks them up.
+        server_received_at = dt.datetime.fromtimestamp(now, dt.timezone.utc) if batch.restored else accepted_at
+        try:
+            await self._release(batch.site_id, batch.plan, batch.reports, server_received_at, accepted_at)
+        except Exception:
+            # With a spool the file stays in place and the batch is retried on the next start.
+            logger.exception("Failed to release shuffled batch", extra={"site_id": batch.site_id})
+            if batch.spool_path is None:
+                shuffle_events_dropped_total.labels(reason="write_failed").inc(len(batch.reports))
+            return
+        if batch.spool_path:
+            batch.spool_path.unlink(missing_ok=True)
+
+    def _spool(self, batch: _ParkedBatch) -> Path:
+        assert self.spool_dir is not None
+        path = self.spool_dir / f"{uuid.uuid4().hex}.json"
+        document = {
+            "release_at": batch.release_at,
+            "enqueued_at": batch.enqueued_at,
+            "site_id": batch.site_id,
+            "plan": batch.plan,
+        }
+        if isinstance(batch.reports, DecodedBatch):
+            document["encoded"] = base64.b64encode(encode_batch(batch.reports)).decode("ascii")
+        else:
+            document["reports"] = [report.model_dump(mode="json") for report in batch.reports]
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(document), encoding="utf-8")
+        tmp_path.replace(path)
+        return path
+
+    def _load_spool(self) -> None:
+        assert self.spool_dir is not None
+        for path in sorted(self.spool_dir.glob("*.json")):
+            try:
+                document = json.loads(path.read_text(encoding="utf-8"))
+                if "encoded" in document:
+                    reports: ParkedReports = decode_batch(base64.b64decode(document["encoded"]))
+                else:
+                    reports = [PrivatizedEvent(**report) for report in document["reports"]]
+                batch = _ParkedBatch(
+                    release_at=float(document["release_at"]),
+                    seq=next(self._seq),
+                    site_id=document["site_id"],
+                    plan=document["plan"],
+                    reports=reports,
+                    enqueued_at=float(document["enqueued_at"]),
+                    spool_path=path,
+                    restored=True,
+                )
+            except Exception:
+                logger.exception("Skipping unreadable shuffle spool file", extra={"path": str(path)})
+                shuffle_events_dropped_total.labels(reason="unreadable_spool").inc()
+                continue
+            heapq.heappush(self._heap, batch)
+        if self._heap:
+            logger.info("Recovered spooled shuffle batches", extra={"batches": len(self._heap)})
+
+    def oldest_age_seconds(self) -> float:
+        oldest = min((batch.enqueued_at for batch in self._heap), default=None)
+        return 0.0 if oldest is None else max(0.0, time.time() - oldest)
+
+
+shuffle_queue = ShuffleQueue(
+    max_delay_seconds=settings.SHUFFLE_MAX_DELAY_SECONDS,
+    max_batches=settings.SHUFFLE_QUEUE_MAX_BATCHES,
+    writer_tasks=settings.SHUFFLE_WRITER_TASKS,
+    spool_dir=settings.SHUFFLE_SPOOL_DIR,
+)
+shuffle_queue_depth.set_function(lambda: len(shuffle_queue))
+shuffle_queue_oldest_age_seconds.set_function(shuffle_queue.oldest_age_seconds)
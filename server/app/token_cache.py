@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from prometheus_client import Counter
+
+from .config import get_settings
+
+settings = get_settings()
+
+token_cache_hits_total = Counter(
+    "token_cache_hits_total", "Upload token validations served from the verified-token cache"
+)
+token_cache_misses_total = Counter(
+    "token_cache_misses_total", "Upload token validations that required an argon2 verify"
+)
+
+
+@dataclass(frozen=True)
+class _CachedToken:
+    site_id: str
+    jti: str
+    expires_at: float
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of tokens that already passed argon2 verification.
+
+    Entries live for at most ``ttl_seconds`` and never beyond the token's own ``exp``.
+    Revocation in this process evicts immediately; other workers converge within the TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = max(0, ttl_seconds)
+        self._entries: OrderedDict[str, _CachedToken] = OrderedDict()
+        self._by_jti: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> _CachedToken | None:
+        if self.ttl_seconds == 0:
+            return None
+        digest = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                token_cache_misses_total.inc()
+                return None
+            if entry.expires_at <= time.time():
+                self._evict(digest)
+                token_cache_misses_total.inc()
+                return None
+            self._entries.move_to_end(digest)
+        token_cache_hits_total.inc()
+        return entry
+
+    def put(self, token: str, *, site_id: str, jti: str, exp: float) -> None:
+        if self.ttl_seconds == 0:
+            return
+        digest = token_digest(token)
+        entry = _CachedToken(site_id=site_id, jti=jti, expires_at=min(exp, time.time() + self.ttl_seconds))
+        with self._lock:
+            self._evict(digest)
+            self._entries[digest] = entry
+            self._by_jti[jti] = digest
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._evict(oldest)
+
+    def invalidate_jti(self, jti: str) -> None:
+        with self._lock:
+            digest = self._by_jti.get(jti)
+            if digest:
+                self._evict(digest)
+
+    def invalidate_site(self, site_id: str) -> None:
+        with self._lock:
+            for digest in [d for d, entry in self._entries.items() if entry.site_id == site_id]:
+                self._evict(digest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_jti.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, digest: str) -> None:
+        entry = self._entries.pop(digest, None)
+        if entry and self._by_jti.get(entry.jti) == digest:
+            del self._by_jti[entry.jti]
+
+
+verified_tokens = VerifiedTokenCache(
+    max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TOKEN_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from .config import get_settings
+
+settings = get_settings()
+
+DAY_SECONDS = 86400
+
+
+def resolutions() -> list[int]:
+    """Configured tumbling-window lengths in seconds, finest first."""
+    return sorted(settings.WINDOW_RESOLUTIONS_SECONDS)
+
+
+def finest_resolution() -> int:
+    return resolutions()[0]
+
+
+def coarsest_resolution() -> int:
+    return resolutions()[-1]
+
+
+def daily_resolution() -> int:
+    """The daily resolution if configured, otherwise the coarsest one available."""
+    configured = resolutions()
+    return DAY_SECONDS if DAY_SECONDS in configured else configured[-1]
+
+
+def window_floor(value: dt.datetime, resolution_seconds: int) -> dt.datetime:
+    """Start of the UTC-aligned tumbling window of ``resolution_seconds`` containing ``value``."""
+    epoch = int(value.timestamp())
+    return dt.datetime.fromtimestamp(epoch - epoch % resolution_seconds, dt.timezone.utc)
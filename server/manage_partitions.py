@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Script to pre-create report partitions and apply report retention
+"""
+import asyncio
+import datetime as dt
+import sys
+import os
+import argparse
+
+# Add the current directory to Python path so we can import app modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.scheduler.report_partitions import manage_report_partitions
+from app.models import async_session_factory
+
+async def main():
+    """Run one partition maintenance pass"""
+    parser = argparse.ArgumentParser(description="Manage report table partitions and retention")
+    parser.add_argument(
+        "--today",
+        type=dt.date.fromisoformat,
+        default=None,
+        help="Run as of this UTC day (YYYY-MM-DD) instead of today",
+    )
+    args = parser.parse_args()
+    print("Managing report partitions...")
+
+    async with async_session_factory() as session:
+        summary = await manage_report_partitions(session, today=args.today)
+
+    for name in summary.created:
+        print(f"  created {name}")
+    for name in summary.dropped:
+        print(f"  dropped {name}")
+    print(
+        "Partition maintenance completed successfully! "
+        f"partitions created={len(summary.created)} dropped={len(summary.dropped)}, "
+        f"rows deleted={summary.rows_deleted}"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
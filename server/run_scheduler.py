@@ -10,21 +10,56 @@ import argparse
 # Add the current directory to Python path so we can import app modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.scheduler.nightly_reduce import reduce_reports
+from app.scheduler.nightly_reduce import REDUCER_MODES, reduce_incremental, reduce_reports
+from app.scheduler.parallel_reduce import reduce_reports_parallel
 from app.models import async_session_factory
 
 async def main():
     """Run the nightly reduce process"""
     parser = argparse.ArgumentParser(description="Run nightly reducer")
     parser.add_argument("--days", type=int, default=1, help="Reprocess last N days")
+    parser.add_argument(
+        "--mode",
+        choices=REDUCER_MODES,
+        default=None,
+        help="Aggregate in Python, push bucketing into SQL, or stream window by window (default: REDUCER_MODE)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only reduce windows that received reports since the last run (ignores --days/--mode)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Split the reduce into N site shards run in parallel worker processes",
+    )
     args = parser.parse_args()
     print("Running nightly reduce scheduler...")
 
-    # Create a session and run the reduce process
-    async with async_session_factory() as session:
-        await reduce_reports(session, days=max(1, args.days))
+    if args.workers > 1 and not args.incremental:
+        summary = await reduce_reports_parallel(args.workers, days=max(1, args.days), mode=args.mode)
+        for shard in summary.shards:
+            print(
+                f"  shard {shard.shard}: sites={shard.sites} reports={shard.stats.reports_scanned} "
+                f"windows={shard.stats.windows_inserted + shard.stats.windows_updated} in {shard.seconds:.1f}s"
+            )
+        stats = summary.stats
+    else:
+        # Create a session and run the reduce process
+        async with async_session_factory() as session:
+            if args.incremental:
+                stats = await reduce_incremental(session)
+            else:
+                stats = await reduce_reports(session, days=max(1, args.days), mode=args.mode)
 
-    print("Nightly reduce completed successfully!")
+    print(
+        "Nightly reduce completed successfully! "
+        f"reports scanned={stats.reports_scanned}, "
+        f"windows inserted={stats.windows_inserted} updated={stats.windows_updated}, "
+        f"epsilon rows inserted={stats.epsilon_inserted} updated={stats.epsilon_updated}"
+    )
 
 if __name__ == "__main__":
     asyncio.run(main())
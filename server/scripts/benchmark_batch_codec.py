@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Compare binary batch decoding with JSON + pydantic parsing of the same events."""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.batch_codec import BatchSegment, DecodedBatch, decode_batch, encode_batch  # noqa: E402
+from app.schemas import ShuffleRequest  # noqa: E402
+
+
+def build_batch(events: int) -> tuple[bytes, bytes]:
+    rng = random.Random(7)
+    now = dt.datetime.now(dt.timezone.utc)
+    base_ms = int(now.timestamp() * 1000)
+    offsets = tuple(sorted(rng.randrange(0, 60_000) for _ in range(events)))
+    bits = [rng.randint(0, 1) for _ in range(events)]
+    binary = encode_batch(
+        DecodedBatch(
+            site_id="bench-site",
+            token="t" * 180,
+            nonce="n" * 32,
+            segments=[
+                BatchSegment(
+                    kind="pageviews",
+                    epsilon_used=1.0,
+                    sampling_rate=0.5,
+                    base_timestamp_ms=base_ms,
+                    offsets_ms=offsets,
+                    bits=bits,
+                )
+            ],
+        )
+    )
+    document = {
+        "token": "t" * 180,
+        "nonce": "n" * 32,
+        "batch": [
+            {
+                "site_id": "bench-site",
+                "kind": "pageviews",
+                "payload": {
+                    "randomized_bit": bit,
+                    "probability_true": 0.6,
+                    "probability_false": 0.4,
+                    "variance": 0.24,
+                },
+                "epsilon_used": 1.0,
+                "sampling_rate": 0.5,
+                "client_timestamp": dt.datetime.fromtimestamp((base_ms + offset) / 1000, dt.timezone.utc).isoformat(),
+            }
+            for offset, bit in zip(offsets, bits)
+        ],
+    }
+    return binary, json.dumps(document).encode("utf-8")
+
+
+def measure(label: str, fn, payload: bytes, events: int, repeat: int) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(payload)
+    elapsed = time.perf_counter() - start
+    rate = events * repeat / elapsed
+    print(f"{label:<8} {len(payload):>10,d} bytes  {rate:>14,.0f} events/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark shuffle batch decoding")
+    parser.add_argument("--events", type=int, default=200, help="Events per batch")
+    parser.add_argument("--repeat", type=int, default=500, help="Batches decoded per format")
+    args = parser.parse_args()
+
+    binary, json_body = build_batch(args.events)
+    measure("binary", decode_batch, binary, args.events, args.repeat)
+    measure("json", ShuffleRequest.model_validate_json, json_body, args.events, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
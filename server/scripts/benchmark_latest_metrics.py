@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Time the /api/metrics latest-window query against the full-series scan it replaced.
+
+Seeds a throwaway SQLite database with a year of minute windows for one site (every
+event kind), then runs both queries and checks they pick the same windows.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ldp.rr_decoder import standard_error  # noqa: E402
+from app.models import Base, DpWindow  # noqa: E402
+from app.routers.metrics import MIN_SNR, latest_windows_stmt  # noqa: E402
+from app.schemas import EVENT_KINDS  # noqa: E402
+from app.windows import finest_resolution  # noqa: E402
+
+SITE_ID = "site-benchmark"
+CHUNK_ROWS = 50_000
+
+
+def seed(session: Session, days: int) -> int:
+    rng = random.Random(7)
+    start = dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc)
+    resolution = dt.timedelta(seconds=finest_resolution())
+    rows = []
+    count = 0
+    for minute in range(days * 24 * 60):
+        window_start = start + minute * resolution
+        for metric in EVENT_KINDS:
+            value = max(0.0, rng.gauss(20.0, 15.0))
+            rows.append(
+                {
+                    "site_id": SITE_ID,
+                    "plan": "free",
+                    "metric": metric,
+                    "window_start": window_start,
+                    "window_end": window_start + resolution,
+                    "resolution_seconds": finest_resolution(),
+                    "value": value,
+                    "variance": 25.0,
+                    "ci80_low": 0.0,
+                    "ci80_high": 0.0,
+                    "ci95_low": 0.0,
+                    "ci95_high": 0.0,
+                }
+            )
+        if len(rows) >= CHUNK_ROWS:
+            session.execute(insert(DpWindow), rows)
+            count += len(rows)
+            rows = []
+    if rows:
+        session.execute(insert(DpWindow), rows)
+        count += len(rows)
+    session.commit()
+    return count
+
+
+def scan_all(session: Session) -> dict[str, int]:
+    """The previous query: every window of the site, last qualifying row wins."""
+    stmt = select(DpWindow).where(
+        DpWindow.site_id == SITE_ID,
+        DpWindow.plan == "free",
+        DpWindow.resolution_seconds == finest_resolution(),
+    )
+    latest: dict[str, DpWindow] = {}
+    for row in session.execute(stmt).scalars():
+        se = standard_error(row.variance)
+        if se <= 0 or row.value <= 0 or row.value / se < MIN_SNR:
+            continue
+        if row.metric not in latest or row.window_start > latest[row.metric].window_start:
+            latest[row.metric] = row
+    return {metric: row.id for metric, row in latest.items()}
+
+
+def latest_per_metric(session: Session) -> dict[str, int]:
+    rows = session.execute(latest_windows_stmt(SITE_ID, "free", EVENT_KINDS)).scalars()
+    return {row.metric: row.id for row in rows}
+
+
+def timed(session: Session, query, repeat: int) -> tuple[float, dict[str, int]]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        session.expunge_all()
+        result = query(session)
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'benchmark.db')}")
+        Base.metadata.create_all(engine, tables=[DpWindow.__table__])
+        with Session(engine) as session:
+            started = time.perf_counter()
+            rows = seed(session, args.days)
+            print(f"windows:  {rows} ({time.perf_counter() - started:.1f}s to seed)")
+
+            scan_seconds, scanned = timed(session, scan_all, args.repeat)
+            latest_seconds, latest = timed(session, latest_per_metric, args.repeat)
+        engine.dispose()
+
+    print(f"scan all: {scan_seconds * 1000:.1f}ms")
+    print(f"latest:   {latest_seconds * 1000:.2f}ms ({scan_seconds / latest_seconds:.0f}x)")
+    print(f"same windows: {scanned == latest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Compare the scalar randomized-response decoder with the vectorized one over many windows."""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ldp.rr_decoder import (  # noqa: E402
+    confidence_interval,
+    rr_decode_arrays,
+    rr_unbiased_estimate,
+    standard_error,
+)
+
+
+def build_windows(count: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(7)
+    total = rng.integers(1, 5_000, count).astype(np.float64)
+    ones = np.floor(total * rng.uniform(0.3, 0.9, count))
+    epsilon = rng.choice([0.5, 1.0, 2.0, 4.0], count)
+    sampling = rng.choice([0.25, 0.5, 1.0], count)
+    return ones, total, epsilon, sampling
+
+
+def decode_scalar(ones, total, epsilon, sampling) -> list[tuple[float, ...]]:
+    rows = []
+    for args in zip(ones.tolist(), total.tolist(), epsilon.tolist(), sampling.tolist()):
+        estimate, variance = rr_unbiased_estimate(*args)
+        se = standard_error(variance)
+        rows.append(
+            (estimate, variance, se, *confidence_interval(estimate, se, 1.2816), *confidence_interval(estimate, se, 1.9599))
+        )
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--windows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    ones, total, epsilon, sampling = build_windows(args.windows)
+
+    started = time.perf_counter()
+    scalar = decode_scalar(ones, total, epsilon, sampling)
+    scalar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    decoded = rr_decode_arrays(ones, total, epsilon, sampling)
+    vector_seconds = time.perf_counter() - started
+
+    vector = np.column_stack(decoded)
+    mismatches = int(np.count_nonzero(np.any(vector != np.array(scalar), axis=1)))
+    print(f"windows:    {args.windows}")
+    print(f"scalar:     {scalar_seconds:.3f}s")
+    print(f"vectorized: {vector_seconds:.3f}s ({scalar_seconds / vector_seconds:.1f}x)")
+    print(f"mismatched windows: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
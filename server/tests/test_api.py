@@ -1,4 +1,5 @@
 import asyncio
+import json
 import os
 import sys
 from datetime import datetime, timedelta, timezone
@@ -14,8 +15,9 @@ TEST_DB_PATH = Path(__file__).parent / "test.db"
 os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
 
 from app.main import app  # noqa: E402
-from sqlalchemy import select
+from sqlalchemy import func, select
 
+from app.plan_cache import site_plans  # noqa: E402
 from app.models import Base, DpWindow, IS_POSTGRES, LdpReport, RawReport, SitePlan, async_engine, async_session_factory  # noqa: E402
 
 
@@ -38,6 +40,7 @@ async def _set_site_plan(site_id: str, plan: str) -> None:
         else:
             session.add(SitePlan(site_id=site_id, plan=plan))
         await session.commit()
+    site_plans.invalidate(site_id)
 
 
 async def _count_reports(site_id: str) -> tuple[int, int]:
@@ -266,3 +269,977 @@ async def test_historical_import_requires_token_and_uses_row_value(client):
         ).scalars().all()
         assert rows, "Expected at least one reduced window for imported historical data"
         assert any(abs(row.value - 42.0) < 1e-6 for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_collect_bulk_insert_filters_batch(client):
+    now = datetime.now(timezone.utc)
+    report = {
+        "site_id": "site-bulk",
+        "kind": "pageviews",
+        "payload": {"randomized_bit": 1},
+        "epsilon_used": 0.1,
+        "sampling_rate": 1.0,
+        "client_timestamp": now.isoformat(),
+    }
+    late = {**report, "client_timestamp": (now - timedelta(minutes=10)).isoformat()}
+    foreign = {**report, "site_id": "site-other"}
+    resp = client.post(
+        "/api/collect",
+        json={
+            "site_id": "site-bulk",
+            "server_received_at": now.isoformat(),
+            "reports": [report] * 5 + [late, foreign],
+        },
+    )
+    assert resp.status_code == 202
+
+    raw_count, ldp_count = await _count_reports("site-bulk")
+    assert raw_count == 5 and ldp_count == 0
+
+
+@pytest.mark.asyncio
+async def test_revoke_invalidates_cached_token(client):
+    token_resp = client.post(
+        "/api/upload-token",
+        json={
+            "site_id": "site-cache",
+            "allowed_origin": "https://example.com",
+            "epsilon_budget": 1.0,
+            "sampling_rate": 1.0,
+        },
+    )
+    token = token_resp.json()["token"]
+    headers = {"Origin": "https://example.com", "X-Bypass-Delay": "true"}
+
+    first = client.post("/api/shuffle", json={"token": token, "nonce": "cache-1", "batch": []}, headers=headers)
+    assert first.status_code == 202
+
+    revoke = client.post("/api/admin/revoke-token", json={"jti": token_resp.json()["jti"]})
+    assert revoke.status_code == 204
+
+    second = client.post("/api/shuffle", json={"token": token, "nonce": "cache-2", "batch": []}, headers=headers)
+    assert second.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_token_sweeper_removes_expired_rows(client):
+    from app.models import UploadToken
+    from app.scheduler.token_sweeper import sweep_expired_tokens
+
+    now = datetime.now(timezone.utc)
+    async with async_session_factory() as session:
+        for idx, exp in enumerate((now - timedelta(days=3), now - timedelta(days=2), now + timedelta(hours=1))):
+            session.add(
+                UploadToken(
+                    site_id="site-sweep",
+                    jti=f"sweep-{idx}",
+                    token_hash=f"hash-sweep-{idx}",
+                    iat=exp - timedelta(minutes=15),
+                    exp=exp,
+                    allowed_origin="https://example.com",
+                    sampling_rate=1.0,
+                    epsilon_budget=1.0,
+                )
+            )
+        await session.commit()
+
+        deleted = await sweep_expired_tokens(session, batch_size=1, grace_seconds=3600)
+        assert deleted == 2
+        remaining = (
+            await session.execute(select(UploadToken.jti).where(UploadToken.site_id == "site-sweep"))
+        ).scalars().all()
+        assert remaining == ["sweep-2"]
+
+
+@pytest.mark.asyncio
+async def test_local_rate_limiter_window_and_eviction():
+    from app.rate_limit import LocalRateLimitBackend
+
+    now = [0.0]
+    limiter = LocalRateLimitBackend(clock=lambda: now[0])
+    assert all([await limiter.hit("a", 1, 3, 60.0) for _ in range(3)])
+    assert not await limiter.hit("a", 1, 3, 60.0)
+
+    # Halfway through the next window only half of the previous count still weighs in.
+    now[0] = 90.0
+    assert await limiter.hit("a", 1, 3, 60.0)
+    assert not await limiter.hit("a", 1, 3, 60.0)
+
+    now[0] = 300.0
+    assert await limiter.hit("b", 1, 3, 60.0)
+    assert len(limiter) == 1
+
+
+@pytest.mark.asyncio
+async def test_shuffle_queue_releases_shuffled_batches_on_drain():
+    from prometheus_client import REGISTRY
+
+    from app.schemas import PrivatizedEvent
+    from app.shuffle_queue import ShuffleQueue
+
+    released: list[tuple[str, int]] = []
+
+    async def release(site_id, plan, reports, server_received_at, accepted_at):
+        released.append((site_id, len(reports)))
+
+    queue = ShuffleQueue(max_delay_seconds=3600, max_batches=2, writer_tasks=2)
+    await queue.start(release)
+    event = PrivatizedEvent(
+        site_id="site-queue",
+        kind="pageviews",
+        payload={"randomized_bit": 1},
+        epsilon_used=0.1,
+        sampling_rate=1.0,
+        client_timestamp=datetime.now(timezone.utc),
+    )
+    await queue.put("site-queue", "free", [event])
+    await queue.put("site-queue", "free", [event, event])
+    assert queue.full() and not released
+
+    await queue.drain()
+    assert sorted(released) == [("site-queue", 1), ("site-queue", 2)]
+    assert len(queue) == 0
+
+    async def fail(site_id, plan, reports, server_received_at, accepted_at):
+        raise RuntimeError("database down")
+
+    lost = REGISTRY.get_sample_value("shuffle_events_dropped_total", {"reason": "write_failed"}) or 0.0
+    queue = ShuffleQueue(max_delay_seconds=0, max_batches=2, writer_tasks=1)
+    await queue.start(fail)
+    await queue.put("site-queue", "free", [event, event])
+    await queue.drain()
+    assert REGISTRY.get_sample_value("shuffle_events_dropped_total", {"reason": "write_failed"}) == lost + 2
+
+
+@pytest.mark.asyncio
+async def test_shuffle_queue_writes_spooled_batches_after_restart(client, tmp_path):
+    from app.main import release_shuffled_batch
+    from app.schemas import PrivatizedEvent
+    from app.shuffle_queue import ShuffleQueue
+
+    async def park(site_id, plan, reports, server_received_at, accepted_at):
+        raise AssertionError("the batch should stay parked")
+
+    received: list[datetime] = []
+
+    async def release(site_id, plan, reports, server_received_at, accepted_at):
+        received.append(server_received_at)
+        await release_shuffled_batch(site_id, plan, reports, server_received_at, accepted_at)
+
+    accepted = datetime.now(timezone.utc) - timedelta(minutes=6)
+    event = PrivatizedEvent(
+        site_id="site-spool",
+        kind="pageviews",
+        payload={"randomized_bit": 1},
+        epsilon_used=0.1,
+        sampling_rate=1.0,
+        client_timestamp=accepted,
+    )
+    queue = ShuffleQueue(max_delay_seconds=3600, max_batches=2, writer_tasks=1, spool_dir=str(tmp_path))
+    await queue.start(park)
+    await queue.put("site-spool", "free", [event])
+    # The process dies before the write and only comes back six minutes after the batch was due.
+    for task in queue._writers:
+        task.cancel()
+    spooled = next(tmp_path.glob("*.json"))
+    document = json.loads(spooled.read_text(encoding="utf-8"))
+    document["release_at"] = accepted.timestamp() + 1
+    spooled.write_text(json.dumps(document), encoding="utf-8")
+
+    restarted = ShuffleQueue(max_delay_seconds=0, max_batches=2, writer_tasks=1, spool_dir=str(tmp_path))
+    started = datetime.now(timezone.utc)
+    await restarted.start(release)
+    await restarted.drain()
+    assert len(received) == 1 and received[0] >= started.replace(microsecond=0)
+    assert not list(tmp_path.glob("*.json"))
+    # The event is late against the restart but not against when the batch was accepted.
+    assert await _count_reports("site-spool") == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_nonce_store_rotation_and_sync(client):
+    from app.nonce_store import NonceStore
+
+    def make_store() -> NonceStore:
+        return NonceStore(retention_seconds=900, bucket_seconds=60, sync_interval_seconds=5, purge_interval_seconds=60)
+
+    store = make_store()
+    now = datetime.now(timezone.utc).timestamp()
+    assert store.check_and_add("site-nonce", "rotating-nonce", now=now)
+    assert not store.check_and_add("site-nonce", "rotating-nonce", now=now + 60)
+    assert store.check_and_add("site-nonce", "rotating-nonce", now=now + 1000)
+
+    assert store.check_and_add("site-nonce", "shared-nonce")
+    async with async_session_factory() as session:
+        await store.sync(session)
+        other_worker = make_store()
+        await other_worker.sync(session)
+    assert not other_worker.check_and_add("site-nonce", "shared-nonce")
+
+
+@pytest.mark.asyncio
+async def test_site_quota_checked_before_ip_bucket(client):
+    from types import SimpleNamespace
+
+    from fastapi import HTTPException
+
+    from app.models import SiteConfig
+    from app.config import get_settings
+    from app.plan_cache import site_quotas
+    from app.rate_limit import rate_limit_backend
+    from app.routers.shuffle import apply_rate_limit
+
+    async with async_session_factory() as session:
+        session.add(SiteConfig(site_id="site-quota", max_events_per_minute=3))
+        await session.commit()
+        assert await site_quotas.get(session, "site-quota") == 3
+        await session.delete(await session.get(SiteConfig, "site-quota"))
+        await session.commit()
+        # Served from the cache until the TTL runs out.
+        assert await site_quotas.get(session, "site-quota") == 3
+
+    request = SimpleNamespace(app=app)
+    with pytest.raises(HTTPException) as rejected:
+        await apply_rate_limit("site-quota", "198.51.100.7", request, "free", events=5, site_quota=3)
+    assert rejected.value.status_code == 429
+    # The rejected request left the IP bucket untouched.
+    bucket = get_settings().FREE_RATE_LIMIT_BUCKET_PER_MIN
+    assert await rate_limit_backend.hit("req:site-quota:198.51.100.7", bucket, bucket, 60.0)
+
+
+@pytest.mark.asyncio
+async def test_site_plan_cache_invalidated_by_billing_upsert(client):
+    from app.routers.stripe_billing import _upsert_site_plan
+
+    async with async_session_factory() as session:
+        assert await site_plans.get(session, "site-billing") == "free"
+        await _upsert_site_plan(session, site_id="site-billing", plan="standard")
+        assert await site_plans.get(session, "site-billing") == "standard"
+
+
+@pytest.mark.asyncio
+async def test_binary_batch_roundtrip_and_collect(client):
+    from app.batch_codec import MEDIA_TYPE, BatchSegment, DecodedBatch, decode_batch, encode_batch
+
+    now = datetime.now(timezone.utc)
+    base_ms = int(now.timestamp() * 1000)
+    bits = [1, 0, 1, 1, 0, 0, 1, 0, 1]
+    batch = DecodedBatch(
+        site_id="site-binary",
+        server_received_at=now,
+        segments=[
+            BatchSegment(
+                kind="pageviews",
+                epsilon_used=0.1,
+                sampling_rate=1.0,
+                base_timestamp_ms=base_ms,
+                offsets_ms=tuple(range(len(bits))),
+                bits=bits,
+            ),
+            BatchSegment(
+                kind="sessions",
+                epsilon_used=0.1,
+                sampling_rate=1.0,
+                base_timestamp_ms=base_ms - 10 * 60 * 1000,
+                offsets_ms=(0,),
+                bits=[1],
+            ),
+        ],
+    )
+    encoded = encode_batch(batch)
+    decoded = decode_batch(encoded)
+    assert decoded.segments[0].bits == bits
+    assert decoded.segments[0].offsets_ms == tuple(range(len(bits)))
+    assert decoded.site_id == "site-binary" and len(decoded) == 10
+
+    rejected = client.post("/api/collect/batch", content=encoded, headers={"Content-Type": "application/json"})
+    assert rejected.status_code == 415
+    malformed = client.post("/api/collect/batch", content=encoded[:-1], headers={"Content-Type": MEDIA_TYPE})
+    assert malformed.status_code == 400
+
+    resp = client.post("/api/collect/batch", content=encoded, headers={"Content-Type": MEDIA_TYPE})
+    assert resp.status_code == 202
+    raw_count, _ = await _count_reports("site-binary")
+    assert raw_count == len(bits)
+
+    # /shuffle/batch stamps server time, so a backdated header cannot rescue stale events.
+    token = client.post(
+        "/api/upload-token",
+        json={
+            "site_id": "site-binary-shuffle",
+            "allowed_origin": "https://example.com",
+            "epsilon_budget": 1.0,
+            "sampling_rate": 1.0,
+        },
+    ).json()["token"]
+    stale_ms = base_ms - 3600 * 1000
+    shuffled = DecodedBatch(
+        site_id="site-binary-shuffle",
+        server_received_at=now - timedelta(hours=1),
+        token=token,
+        nonce="binary-shuffle-1",
+        segments=[
+            BatchSegment(
+                kind="pageviews",
+                epsilon_used=0.1,
+                sampling_rate=1.0,
+                base_timestamp_ms=stale_ms,
+                offsets_ms=(0, 1),
+                bits=[1, 0],
+            ),
+            BatchSegment(
+                kind="pageviews",
+                epsilon_used=0.1,
+                sampling_rate=1.0,
+                base_timestamp_ms=base_ms,
+                offsets_ms=(0,),
+                bits=[1],
+            ),
+        ],
+    )
+    resp = client.post(
+        "/api/shuffle/batch",
+        content=encode_batch(shuffled),
+        headers={"Content-Type": MEDIA_TYPE, "Origin": "https://example.com", "X-Bypass-Delay": "true"},
+    )
+    assert resp.status_code == 202
+    assert await _count_reports("site-binary-shuffle") == (1, 0)
+
+
+async def _seed_reducer_reports(site_id: str, plan: str, window_start: datetime, count: int) -> None:
+    await _set_site_plan(site_id, plan)
+    model = LdpReport if plan == "pro" else RawReport
+    async with async_session_factory() as session:
+        for idx in range(count):
+            session.add(
+                model(
+                    site_id=site_id,
+                    kind="pageviews",
+                    day=window_start.date(),
+                    payload={"randomized_bit": 1 if idx % 4 else 0},
+                    randomized_bit=1 if idx % 4 else 0,
+                    epsilon_used=2.0 if idx % 3 else 1.0,
+                    sampling_rate=1.0,
+                    server_received_at=window_start + timedelta(seconds=idx % 60),
+                )
+            )
+        await session.commit()
+
+
+async def _reduced_windows(site_ids: list[str], resolution: int | None = None) -> dict[tuple, tuple]:
+    stmt = select(DpWindow).where(DpWindow.site_id.in_(site_ids))
+    if resolution is not None:
+        stmt = stmt.where(DpWindow.resolution_seconds == resolution)
+    async with async_session_factory() as session:
+        rows = (await session.execute(stmt)).scalars().all()
+        return {
+            (row.site_id, row.plan, row.metric, row.window_start.replace(tzinfo=None), row.resolution_seconds): (
+                round(row.value, 6),
+                round(row.variance, 6),
+            )
+            for row in rows
+        }
+
+
+@pytest.mark.asyncio
+async def test_sql_pushdown_and_streaming_reducers_match_python(client, monkeypatch):
+    from sqlalchemy import delete
+
+    from app.models import ReducerCheckpoint
+    from app.scheduler import nightly_reduce
+
+    monkeypatch.setattr(nightly_reduce.settings, "ENABLE_PRO_INGEST", True)
+    # Small chunks make the streaming reducer checkpoint and reopen its cursor between windows.
+    monkeypatch.setattr(nightly_reduce.settings, "REDUCER_STREAM_CHUNK_ROWS", 50)
+    window_start = (datetime.now(timezone.utc) - timedelta(hours=2)).replace(second=0, microsecond=0)
+    sites = {"site-reduce-free": "free", "site-reduce-standard": "standard", "site-reduce-pro": "pro"}
+    for site_id, plan in sites.items():
+        await _seed_reducer_reports(site_id, plan, window_start, 120)
+        await _seed_reducer_reports(site_id, plan, window_start + timedelta(minutes=1), 90)
+
+    async with async_session_factory() as session:
+        await nightly_reduce.reduce_reports(session, days=1, mode="python")
+    python_windows = await _reduced_windows(list(sites))
+    assert {key[1] for key in python_windows} == {"free", "standard", "pro"}
+
+    for mode in ("sql", "stream"):
+        async with async_session_factory() as session:
+            await session.execute(delete(DpWindow).where(DpWindow.site_id.in_(list(sites))))
+            await session.commit()
+            await nightly_reduce.reduce_reports(session, days=1, mode=mode)
+            assert (await session.execute(select(ReducerCheckpoint))).first() is None
+        assert await _reduced_windows(list(sites)) == python_windows, mode
+
+
+@pytest.mark.asyncio
+async def test_window_writer_reports_inserted_and_updated(client):
+    from app.scheduler.window_writer import WindowWriter
+
+    window_start = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    async with async_session_factory() as session:
+        for expected_inserted, expected_updated, value in ((2, 0, 10.0), (1, 2, 20.0)):
+            writer = WindowWriter(session)
+            for offset in range(expected_inserted + expected_updated):
+                writer.add_window(
+                    site_id="site-writer",
+                    plan="free",
+                    metric="pageviews",
+                    window_start=window_start + timedelta(minutes=offset),
+                    resolution_seconds=60,
+                    value=value,
+                    variance=value,
+                )
+            writer.add_epsilon(site_id="site-writer", day=window_start.date(), plan="standard", epsilon_total=value)
+            stats = await writer.flush()
+            await session.commit()
+            assert (stats.windows_inserted, stats.windows_updated) == (expected_inserted, expected_updated)
+
+        rows = (await session.execute(select(DpWindow).where(DpWindow.site_id == "site-writer"))).scalars().all()
+        assert len(rows) == 3 and all(row.value == 20.0 for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_incremental_reducer_only_touches_new_windows(client):
+    from app.config import get_settings
+    from app.models import ReducerWatermark, ReportCounter
+    from app.scheduler.nightly_reduce import reduce_incremental
+
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    first_window = now - timedelta(minutes=6)
+    second_window = now - timedelta(minutes=4)
+    await _seed_reducer_reports("site-incremental", "free", first_window, 60)
+    await _seed_reducer_reports("site-incremental", "free", second_window, 60)
+    # Still inside LIVE_WATERMARK_SECONDS: not final, so not reduced yet.
+    await _seed_reducer_reports("site-incremental", "free", now - timedelta(minutes=1), 60)
+
+    async with async_session_factory() as session:
+        await reduce_incremental(session, now=now)
+    assert len(await _reduced_windows(["site-incremental"], resolution=60)) == 2
+
+    async with async_session_factory() as session:
+        session.add(
+            RawReport(
+                site_id="site-incremental",
+                kind="pageviews",
+                day=second_window.date(),
+                payload={},
+                epsilon_used=1.0,
+                sampling_rate=1.0,
+                server_received_at=second_window + timedelta(seconds=30),
+            )
+        )
+        await session.commit()
+        stats = await reduce_incremental(session, now=now)
+        # The straggler's minute window and the window containing it at every coarser resolution.
+        resolutions = get_settings().WINDOW_RESOLUTIONS_SECONDS
+        assert (stats.windows_inserted, stats.windows_updated) == (0, len(resolutions))
+        mark = await session.get(ReducerWatermark, "raw_reports")
+        assert mark.received_at.replace(tzinfo=timezone.utc) == now - timedelta(minutes=2)
+
+    windows = await _reduced_windows(["site-incremental"], resolution=60)
+    assert windows[("site-incremental", "free", "pageviews", second_window.replace(tzinfo=None), 60)][0] == 61.0
+    # Minutes the reducer has seen are kept as counters; coarse windows are summed from them.
+    async with async_session_factory() as session:
+        counters = (
+            await session.execute(
+                select(ReportCounter.window_start, func.sum(ReportCounter.count))
+                .where(ReportCounter.site_id == "site-incremental")
+                .group_by(ReportCounter.window_start)
+            )
+        ).all()
+    assert sorted((start.replace(tzinfo=None), count) for start, count in counters) == [
+        (first_window.replace(tzinfo=None), 60),
+        (second_window.replace(tzinfo=None), 61),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_incremental_reduce_keeps_reports_of_full_reduce(client):
+    from app.models import ReducerWatermark
+    from app.scheduler.nightly_reduce import reduce_incremental, reduce_reports
+    from app.windows import coarsest_resolution, window_floor
+
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    coarsest = coarsest_resolution()
+    # Imported earlier today, before the incremental marks, and reduced by a full reduce.
+    imported_at = max(window_floor(now, coarsest), now - timedelta(hours=2))
+    await _seed_reducer_reports("site-mixed", "free", imported_at, 100)
+    async with async_session_factory() as session:
+        await reduce_reports(session, start_day=now.date(), end_day=now.date(), site_ids=["site-mixed"])
+        saved = {
+            mark.table_name: (mark.received_at, mark.last_id)
+            for mark in (await session.execute(select(ReducerWatermark))).scalars()
+        }
+        last_ids = {
+            "raw_reports": (await session.execute(select(func.max(RawReport.id)))).scalar() or 0,
+            "ldp_reports": (await session.execute(select(func.max(LdpReport.id)))).scalar() or 0,
+        }
+        for table_name, last_id in last_ids.items():
+            await session.merge(ReducerWatermark(table_name=table_name, received_at=now, last_id=last_id))
+        await session.commit()
+
+    await _seed_reducer_reports("site-mixed", "free", now, 60)
+    async with async_session_factory() as session:
+        await reduce_incremental(session, now=now + timedelta(minutes=5))
+        for table_name, last_id in last_ids.items():
+            received_at, last_id = saved.get(table_name, (now, last_id))
+            await session.merge(ReducerWatermark(table_name=table_name, received_at=received_at, last_id=last_id))
+        await session.commit()
+
+    windows = await _reduced_windows(["site-mixed"], resolution=coarsest)
+    coarse = {key[3]: value for key, (value, _) in windows.items()}
+    expected = {window_floor(imported_at, coarsest): 100.0}
+    expected[window_floor(now, coarsest)] = expected.get(window_floor(now, coarsest), 0.0) + 60.0
+    assert coarse == {start.replace(tzinfo=None): value for start, value in expected.items()}
+
+
+@pytest.mark.asyncio
+async def test_reduce_publishes_every_window_resolution(client):
+    from app.config import get_settings
+    from app.scheduler.nightly_reduce import reduce_reports
+    from app.windows import window_floor
+
+    window_start = (datetime.now(timezone.utc) - timedelta(hours=2)).replace(minute=1, second=0, microsecond=0)
+    for offset, count in ((0, 40), (1, 45), (7, 50)):
+        await _seed_reducer_reports("site-resolutions", "free", window_start + timedelta(minutes=offset), count)
+
+    for mode in ("sql", "stream"):
+        async with async_session_factory() as session:
+            await reduce_reports(session, days=1, mode=mode, site_ids=["site-resolutions"])
+        windows = await _reduced_windows(["site-resolutions"])
+        for resolution in get_settings().WINDOW_RESOLUTIONS_SECONDS:
+            by_start = {
+                key[3]: value[0] for key, value in windows.items() if key[2] == "pageviews" and key[4] == resolution
+            }
+            expected: dict = {}
+            for offset, count in ((0, 40), (1, 45), (7, 50)):
+                start = window_floor(window_start + timedelta(minutes=offset), resolution).replace(tzinfo=None)
+                expected[start] = expected.get(start, 0.0) + count
+            assert by_start == expected, (mode, resolution)
+
+    params = {"site_id": "site-resolutions", "metric": "pageviews", "resolution": 86400}
+    daily = client.get("/api/aggregate", params=params).json()["windows"]
+    assert [window["value"] for window in daily] == [135.0]
+    assert client.get("/api/aggregate", params={**params, "resolution": 120}).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_parallel_reduce_shards_match_single_reduce(client):
+    from sqlalchemy import delete
+
+    from app.scheduler.nightly_reduce import reduce_reports
+    from app.scheduler.parallel_reduce import reduce_reports_parallel, shard_of
+
+    window_start = (datetime.now(timezone.utc) - timedelta(hours=3)).replace(second=0, microsecond=0)
+    sites = [f"site-shard-{idx}" for idx in range(6)]
+    for site_id in sites:
+        await _seed_reducer_reports(site_id, "free", window_start, 40)
+    assert len({shard_of(site_id, 3) for site_id in sites}) > 1
+
+    async with async_session_factory() as session:
+        await reduce_reports(session, days=1, mode="sql", site_ids=sites)
+        expected = await _reduced_windows(sites)
+        await session.execute(delete(DpWindow).where(DpWindow.site_id.in_(sites)))
+        await session.commit()
+
+    summary = await reduce_reports_parallel(3, days=1, mode="sql")
+    assert [shard.shard for shard in summary.shards] == [0, 1, 2]
+    assert summary.stats.reports_scanned >= 6 * 40
+    assert await _reduced_windows(sites) == expected
+
+
+def test_vectorized_rr_decoder_matches_scalar():
+    import math
+
+    import numpy as np
+
+    from app.ldp.rr_decoder import confidence_interval, rr_decode_arrays, rr_unbiased_estimate, standard_error
+
+    ones = np.array([0.0, 40.0, 75.0, 300.0, 12.0])
+    total = np.array([0.0, 100.0, 100.0, 400.0, 20.0])
+    epsilon = np.array([1.0, 0.5, 2.0, math.log(3), 4.0])
+    sampling = np.array([1.0, 0.5, 1.0, 0.25, 0.0])
+    decoded = rr_decode_arrays(ones, total, epsilon, sampling)
+    for index in range(len(ones)):
+        estimate, variance = rr_unbiased_estimate(ones[index], total[index], epsilon[index], sampling[index])
+        se = standard_error(variance)
+        expected = (estimate, variance, se, *confidence_interval(estimate, se, 1.2816), *confidence_interval(estimate, se, 1.9599))
+        assert tuple(float(column[index]) for column in decoded) == expected
+
+
+def test_keyed_laplace_noise_is_philox_and_reproducible():
+    import numpy as np
+
+    from app.ldp.noise import LaplaceNoise, philox4x32
+
+    # Random123 known-answer vectors for Philox4x32-10.
+    assert philox4x32(np.zeros((1, 4), dtype=np.uint32), (0, 0)).tolist() == [
+        [0x6627E8D5, 0xE169C58D, 0xBC57AC4C, 0x9B00DBD8]
+    ]
+    counters = np.array([[0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344]], dtype=np.uint32)
+    assert philox4x32(counters, (0xA4093822, 0x299F31D0)).tolist() == [[0xD16CFE09, 0x94FDCCEB, 0x5001E420, 0x24126EA1]]
+
+    labels = [f"site-{index % 7}\x1fpageviews" for index in range(200_000)]
+    minutes = 60 * np.arange(200_000, dtype=np.int64)
+    noise = LaplaceNoise("secret").draw(labels, minutes, 2.0)
+    assert np.array_equal(noise, LaplaceNoise("secret").draw(labels, minutes, 2.0))
+    assert not np.array_equal(noise, LaplaceNoise("other-secret").draw(labels, minutes, 2.0))
+    assert abs(noise.mean()) < 0.05 and abs(noise.var() - 8.0) < 0.2
+    # The streaming reducer draws one window at a time; it must match the vectorized draw.
+    single = LaplaceNoise("secret")
+    assert [single.draw_one(labels[index], int(minutes[index]), 2.0) for index in range(1000)] == noise[:1000].tolist()
+
+
+def test_pro_groups_combined_by_inverse_variance():
+    import math
+
+    import numpy as np
+
+    from app.ldp.rr_decoder import adjusted_probability, rr_unbiased_estimate
+    from app.ldp.rr_decoder import combine_rr_groups
+
+    def expected_ones(total, epsilon, sampling, rate=0.4):
+        p_adj, q_adj = adjusted_probability(epsilon, sampling)
+        return total * (rate * p_adj + (1 - rate) * q_adj)
+
+    groups = [(1000.0, 1.0, 1.0), (1000.0, math.log(20), 0.5)]
+    estimate, variance = combine_rr_groups(
+        np.array([0, 0, 1]),
+        2,
+        np.array([expected_ones(*groups[0]), expected_ones(*groups[1]), expected_ones(*groups[0])]),
+        np.array([groups[0][0], groups[1][0], groups[0][0]]),
+        np.array([groups[0][1], groups[1][1], groups[0][1]]),
+        np.array([groups[0][2], groups[1][2], groups[0][2]]),
+    )
+    # Both groups see a 40% rate over 1000 reports each; the sharper group dominates the pool.
+    assert estimate[0] == pytest.approx(0.4 * 2000, rel=0.01)
+    assert variance[0] < 4 * rr_unbiased_estimate(expected_ones(*groups[0]), *groups[0])[1]
+    single = rr_unbiased_estimate(expected_ones(*groups[0]), *groups[0])
+    assert (estimate[1], variance[1]) == pytest.approx(single)
+
+
+@pytest.mark.asyncio
+async def test_report_counter_increments_are_chunked(client, monkeypatch):
+    from app import report_counters
+    from app.models import ReportCounter
+
+    # Two counters per statement.
+    monkeypatch.setattr(report_counters, "MAX_BIND_PARAMS", 2 * 11)
+    minute = datetime(2026, 6, 1, tzinfo=timezone.utc)
+    rows = [
+        {
+            "site_id": "site-chunked",
+            "kind": "pageviews",
+            "day": minute.date(),
+            "epsilon_used": 1.0,
+            "sampling_rate": 1.0,
+            "server_received_at": minute + timedelta(minutes=offset),
+            **report_counters.report_columns({"randomized_bit": 1}),
+        }
+        for offset in range(5)
+    ]
+    async with async_session_factory() as session:
+        for _ in range(2):
+            await report_counters.increment_report_counters(session, report_counters.SOURCE_RAW, rows)
+        await session.commit()
+        counts = (
+            await session.execute(select(ReportCounter.count).where(ReportCounter.site_id == "site-chunked"))
+        ).scalars().all()
+    assert counts == [2] * 5
+
+
+@pytest.mark.asyncio
+async def test_report_counters_replace_report_rows(client, monkeypatch):
+    from pydantic import ValidationError
+    from sqlalchemy import delete
+
+    from app.config import Settings, get_settings
+    from app.models import ReportCounter
+    from app.scheduler.nightly_reduce import reduce_incremental, reduce_reports
+
+    monkeypatch.setattr(get_settings(), "REPORT_COUNTERS_ENABLED", True)
+    monkeypatch.setattr(get_settings(), "STORE_REPORT_ROWS", False)
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(minutes=5)
+    report = {
+        "site_id": "site-counters",
+        "kind": "pageviews",
+        "payload": {"randomized_bit": 1},
+        "epsilon_used": 0.1,
+        "sampling_rate": 1.0,
+        "client_timestamp": now.isoformat(),
+    }
+    for _ in range(2):
+        resp = client.post(
+            "/api/collect",
+            json={"site_id": "site-counters", "server_received_at": now.isoformat(), "reports": [report] * 25},
+        )
+        assert resp.status_code == 202
+
+    assert await _count_reports("site-counters") == (0, 0)
+    async with async_session_factory() as session:
+        counters = (
+            await session.execute(select(ReportCounter).where(ReportCounter.site_id == "site-counters"))
+        ).scalars().all()
+        assert [(row.source, row.count, row.sum_value, row.sum_randomized_bit) for row in counters] == [
+            ("raw", 50, 50.0, 50)
+        ]
+        await reduce_reports(session, days=1, mode="counters", site_ids=["site-counters"])
+    windows = await _reduced_windows(["site-counters"], resolution=60)
+    assert windows == {("site-counters", "free", "pageviews", now.replace(tzinfo=None), 60): (50.0, 50.0)}
+
+    # The incremental reducer reads the same counters; report-row modes refuse to run.
+    async with async_session_factory() as session:
+        await session.execute(delete(DpWindow).where(DpWindow.site_id == "site-counters"))
+        await session.commit()
+        await reduce_incremental(session, now=now + timedelta(minutes=5))
+        with pytest.raises(ValueError):
+            await reduce_reports(session, days=1, mode="sql", site_ids=["site-counters"])
+    assert await _reduced_windows(["site-counters"], resolution=60) == windows
+    with pytest.raises(ValidationError):
+        Settings(STORE_REPORT_ROWS=False, REPORT_COUNTERS_ENABLED=True, REDUCER_MODE="sql")
+
+
+@pytest.mark.asyncio
+async def test_report_retention_applies_per_plan(client, monkeypatch):
+    from app.config import get_settings
+    from app.scheduler.report_partitions import manage_report_partitions
+
+    monkeypatch.setattr(get_settings(), "REPORT_RETENTION_DAYS_BY_PLAN", {"free": 10, "standard": 30})
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    for site_id, plan in (("site-retention-free", "free"), ("site-retention-standard", "standard")):
+        for age_days in (0, 20, 40):
+            await _seed_reducer_reports(site_id, plan, now - timedelta(days=age_days), 2)
+
+    async with async_session_factory() as session:
+        summary = await manage_report_partitions(session)
+    assert summary.rows_deleted >= 6
+    assert await _count_reports("site-retention-free") == (2, 0)
+    assert await _count_reports("site-retention-standard") == (4, 0)
+
+
+def test_live_aggregate_served_from_ingest_counters(client):
+    from app.live_aggregator import live_aggregator
+
+    now = datetime.now(timezone.utc)
+    report = {
+        "site_id": "site-live",
+        "kind": "pageviews",
+        "payload": {"randomized_bit": 1},
+        "epsilon_used": 0.1,
+        "sampling_rate": 1.0,
+        "client_timestamp": now.isoformat(),
+    }
+    params = {"site_id": "site-live", "metric": "pageviews", "window": "live"}
+    collect = {"site_id": "site-live", "server_received_at": now.isoformat(), "reports": [report] * 30}
+    assert client.post("/api/collect", json=collect).status_code == 202
+    # Below MIN_REPORTS_PER_WINDOW nothing is released.
+    assert client.get("/api/aggregate", params=params).json()["windows"] == []
+
+    assert client.post("/api/collect", json=collect).status_code == 202
+    windows = client.get("/api/aggregate", params=params).json()["windows"]
+    assert [window["value"] for window in windows] == [60.0]
+    assert live_aggregator.windows("site-live", "standard", "pageviews") == []
+
+
+@pytest.mark.asyncio
+async def test_live_standard_minutes_released_once_and_charged(client, monkeypatch):
+    from app.config import get_settings
+    from app.ldp.noise import live_noise, reducer_noise
+    from app.live_aggregator import LIVE_EPSILON_PLAN, LiveAggregator
+    from app.models import SiteEpsilonLog
+
+    settings = get_settings()
+    aggregator = LiveAggregator(window_minutes=3, max_series=10)
+    minute = int(datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc).timestamp()) // 60
+    received = datetime.fromtimestamp(minute * 60 + 5, timezone.utc)
+    row = {"kind": "pageviews", "is_historical": False, "server_received_at": received, "value": 1.0}
+    aggregator.record("site-live-standard", "standard", [row] * 50)
+    now = (minute + 2) * 60 + settings.LIVE_WATERMARK_SECONDS + 1
+
+    scale = 1.0 / settings.AGGREGATE_DP_EPSILON
+    label = ["site-live-standard\x1fpageviews"]
+    expected = 50 + float(live_noise().draw(label, [minute * 60], scale)[0])
+    assert expected != 50 + float(reducer_noise().draw(label, [minute * 60], scale)[0])
+    assert [window.value for window in aggregator.windows("site-live-standard", "standard", "pageviews", now)] == [
+        pytest.approx(expected)
+    ]
+    # A released minute is frozen: late reports do not produce a second release under the same noise.
+    aggregator.record("site-live-standard", "standard", [row] * 10)
+    assert [window.value for window in aggregator.windows("site-live-standard", "standard", "pageviews", now)] == [
+        pytest.approx(expected)
+    ]
+
+    async with async_session_factory() as session:
+        await aggregator.flush_epsilon(session)
+        spent = (
+            await session.execute(
+                select(SiteEpsilonLog.epsilon_total).where(
+                    SiteEpsilonLog.site_id == "site-live-standard", SiteEpsilonLog.plan == LIVE_EPSILON_PLAN
+                )
+            )
+        ).scalar_one()
+    assert spent == pytest.approx(settings.AGGREGATE_DP_EPSILON)
+
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+    assert not aggregator.serves("standard") and aggregator.serves("free")
+
+
+@pytest.mark.asyncio
+async def test_aggregate_range_pages_and_downsamples(client):
+    from app.scheduler.window_writer import WindowWriter
+
+    first = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    async with async_session_factory() as session:
+        writer = WindowWriter(session)
+        for offset in range(10):
+            writer.add_window(
+                site_id="site-range",
+                plan="free",
+                metric="pageviews",
+                window_start=first + timedelta(minutes=offset),
+                resolution_seconds=60,
+                value=float(offset),
+                variance=4.0,
+            )
+        await writer.flush()
+        await session.commit()
+
+    params = {
+        "site_id": "site-range",
+        "metric": "pageviews",
+        "start": (first + timedelta(minutes=2)).isoformat(),
+        "end": (first + timedelta(minutes=9)).isoformat(),
+        "limit": 3,
+    }
+    values, cursor = [], None
+    while True:
+        page = client.get("/api/aggregate", params={**params, "cursor": cursor} if cursor else params).json()
+        values.extend(window["value"] for window in page["windows"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert values == [2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0]
+    assert client.get("/api/aggregate", params={**params, "cursor": "not-a-cursor"}).status_code == 400
+
+    downsampled = client.get(
+        "/api/aggregate", params={"site_id": "site-range", "metric": "pageviews", "max_points": 5}
+    ).json()
+    assert downsampled["next_cursor"] is None
+    assert [window["value"] for window in downsampled["windows"]] == [0.5, 2.5, 4.5, 6.5, 8.5]
+    # Means of two independent windows: variance 4 / 2.
+    assert {window["variance"] for window in downsampled["windows"]} == {2.0}
+    assert downsampled["windows"][0]["window_end"].startswith("2026-02-01T00:02:00")
+
+
+@pytest.mark.asyncio
+async def test_metrics_return_latest_window_clearing_snr(client):
+    from app.scheduler.window_writer import WindowWriter
+
+    first = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    # (metric, minute offset, value, variance); the newest pageviews window is below SNR 1.5.
+    windows = [
+        ("pageviews", 0, 100.0, 25.0),
+        ("pageviews", 2, 80.0, 25.0),
+        ("pageviews", 1, 90.0, 25.0),
+        ("pageviews", 3, 5.0, 25.0),
+        ("sessions", 3, 2.0, 25.0),
+    ]
+    async with async_session_factory() as session:
+        writer = WindowWriter(session)
+        for metric, offset, value, variance in windows:
+            writer.add_window(
+                site_id="site-latest",
+                plan="free",
+                metric=metric,
+                window_start=first + timedelta(minutes=offset),
+                resolution_seconds=60,
+                value=value,
+                variance=variance,
+            )
+        await writer.flush()
+        await session.commit()
+
+    metrics = client.get("/api/metrics", params={"site_id": "site-latest"}).json()["metrics"]
+    assert [(metric["metric"], metric["value"], metric["snr"]) for metric in metrics] == [("pageviews", 80.0, 16.0)]
+    until = client.get(
+        "/api/metrics", params={"site_id": "site-latest", "end": (first + timedelta(minutes=2)).isoformat()}
+    ).json()["metrics"]
+    assert [metric["value"] for metric in until] == [90.0]
+
+
+@pytest.mark.asyncio
+async def test_read_endpoints_answer_conditional_requests(client):
+    from datetime import date
+
+    from app.models import Forecast, ModelStore
+    from app.scheduler.window_writer import WindowWriter
+
+    async with async_session_factory() as session:
+        writer = WindowWriter(session)
+        writer.add_window(
+            site_id="site-etag",
+            plan="free",
+            metric="pageviews",
+            window_start=datetime(2026, 4, 1, tzinfo=timezone.utc),
+            resolution_seconds=60,
+            value=100.0,
+            variance=25.0,
+        )
+        await writer.flush()
+        model = ModelStore(
+            site_id="site-etag", plan="free", engine="prophet", metric="pageviews", uri="memory://", mape_cv=0.1
+        )
+        session.add(model)
+        await session.flush()
+        session.add(
+            Forecast(
+                site_id="site-etag",
+                plan="free",
+                metric="pageviews",
+                day=date(2026, 4, 2),
+                yhat=100.0,
+                yhat_lower=90.0,
+                yhat_upper=110.0,
+                mape=0.1,
+                model_id=model.id,
+            )
+        )
+        await session.commit()
+
+    for path, params in (
+        ("/api/aggregate", {"site_id": "site-etag", "metric": "pageviews"}),
+        ("/api/metrics", {"site_id": "site-etag"}),
+        ("/api/forecast/pageviews", {"site_id": "site-etag"}),
+    ):
+        first = client.get(path, params=params)
+        assert first.status_code == 200
+        assert first.headers["cache-control"].startswith("private, max-age=")
+        etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+        cached = client.get(path, params=params, headers={"If-None-Match": etag})
+        assert cached.status_code == 304 and cached.content == b""
+        assert cached.headers["etag"] == etag
+        assert client.get(path, params=params, headers={"If-Modified-Since": last_modified}).status_code == 304
+        assert client.get(path, params=params, headers={"If-None-Match": 'W/"stale"'}).status_code == 200
+
+    # Republishing within the same second still moves the version.
+    params = {"site_id": "site-etag", "metric": "pageviews"}
+    etag = client.get("/api/aggregate", params=params).headers["etag"]
+    async with async_session_factory() as session:
+        writer = WindowWriter(session)
+        writer.add_window(
+            site_id="site-etag",
+            plan="free",
+            metric="pageviews",
+            window_start=datetime(2026, 4, 1, tzinfo=timezone.utc),
+            resolution_seconds=60,
+            value=120.0,
+            variance=25.0,
+        )
+        await writer.flush()
+        await session.commit()
+    assert client.get("/api/aggregate", params=params, headers={"If-None-Match": etag}).status_code == 200
+
+    live = client.get("/api/aggregate", params={"site_id": "site-etag", "metric": "pageviews", "window": "live"})
+    assert live.headers["cache-control"] == "no-store" and "etag" not in live.headers